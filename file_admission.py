@@ -0,0 +1,221 @@
+import time
+import json
+import socket
+import logging
+import threading
+import selectors
+from file_frame import SocketReader, is_frame_prefix, encode_header
+
+"""
+* file_admission berisi kontrol penerimaan (admission control) server:
+  - batas total byte request yang sedang diproses di seluruh server
+  - batas ukuran per request
+  - respons cepat status BUSY (dengan retry_after) bagi client yang
+    ditolak, alih-alih antrian yang tidak terbatas
+"""
+
+# Saran jeda (detik) sebelum client mencoba lagi
+BUSY_RETRY_AFTER = 1
+# Batas panjang request teks protokol v1 (LIST/GET/DELETE/HELLO)
+MAX_COMMAND_SIZE = 64 * 1024
+# Lama maksimum membuang sisa request sebelum koneksi yang ditolak ditutup
+LINGER_TIMEOUT = 2.0
+# Lama menunggu byte pertama dari koneksi yang ditolak untuk mengenali protokolnya
+BUSY_DETECT_TIMEOUT = 2.0
+MAX_PENDING_REJECTS = 1024
+
+
+class AdmissionError(Exception):
+    """Request ditolak; response berisi dict respons yang harus dikirim ke client"""
+    def __init__(self, response):
+        Exception.__init__(self, response['data'])
+        self.response = response
+
+
+class AdmissionControl:
+    """
+    Anggaran byte request server
+    - max_inflight_bytes: total byte request yang boleh diproses bersamaan (0 = tanpa batas)
+    - max_request_bytes: ukuran maksimum satu request (0 = tanpa batas)
+    - retry_after: saran jeda (detik) pada respons BUSY
+    """
+    def __init__(self, max_inflight_bytes=0, max_request_bytes=0, retry_after=BUSY_RETRY_AFTER):
+        self.max_inflight_bytes = max_inflight_bytes
+        self.max_request_bytes = max_request_bytes
+        self.retry_after = retry_after
+        self.inflight_bytes = 0
+        self.lock = threading.Lock()
+
+    def busy_response(self):
+        return dict(status='BUSY', data='Server sedang sibuk, silakan coba lagi', retry_after=self.retry_after)
+
+    def too_large_response(self, size, limit):
+        return dict(status='ERROR', data=f'Ukuran request {size} bytes melebihi batas {limit} bytes')
+
+    def check_size(self, size):
+        """
+        AdmissionError jika satu request berukuran size melebihi batas.
+        Request yang lebih besar dari seluruh anggaran server juga ditolak
+        permanen, karena tidak akan pernah muat walaupun dicoba lagi.
+        """
+        for limit in (self.max_request_bytes, self.max_inflight_bytes):
+            if limit and size > limit:
+                raise AdmissionError(self.too_large_response(size, limit))
+
+    def admit(self, size):
+        """Memesan size byte dari anggaran server, AdmissionError (BUSY) jika penuh"""
+        if not size:
+            return
+        with self.lock:
+            if self.max_inflight_bytes and self.inflight_bytes + size > self.max_inflight_bytes:
+                raise AdmissionError(self.busy_response())
+            self.inflight_bytes += size
+
+    def release(self, size):
+        if not size:
+            return
+        with self.lock:
+            self.inflight_bytes -= size
+
+
+def rejection_kind(response):
+    """Jenis error metrik untuk respons penolakan admission control"""
+    return 'busy' if response.get('status') == 'BUSY' else 'too_large'
+
+
+class AdmittedSocketReader(SocketReader):
+    """
+    SocketReader yang memperhitungkan setiap byte yang diterima terhadap
+    AdmissionControl, untuk request yang panjangnya tidak diketahui di awal
+    (upload JSON protokol v1). Jika ditolak, respons penolakan disimpan
+    di atribut rejection.
+    """
+    def __init__(self, sock, admission, initial=b''):
+        SocketReader.__init__(self, sock, initial)
+        self.admission = admission
+        self.received = 0
+        self.reserved = 0
+        self.rejection = None
+        self.account(len(initial))
+
+    def account(self, size):
+        try:
+            self.received += size
+            self.admission.check_size(self.received)
+            self.admission.admit(size)
+            self.reserved += size
+        except AdmissionError as e:
+            self.rejection = e.response
+            raise
+
+    def fill(self):
+        before = len(self.buffer)
+        if not SocketReader.fill(self):
+            return False
+        self.account(len(self.buffer) - before)
+        return True
+
+    def release(self):
+        self.admission.release(self.reserved)
+        self.reserved = 0
+
+
+def linger_close(connection, timeout=LINGER_TIMEOUT):
+    """
+    Menutup koneksi setelah respons penolakan dikirim. Sisa request yang
+    masih dikirim client dibuang dulu agar respons tidak hilang karena RST.
+    """
+    try:
+        connection.shutdown(socket.SHUT_WR)
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            connection.settimeout(remaining)
+            if not connection.recv(65536):
+                break
+    except OSError:
+        pass
+    finally:
+        connection.close()
+
+
+def encode_busy(response, first_bytes):
+    """Respons BUSY dalam format protokol yang dipakai client"""
+    if len(first_bytes) >= 4 and is_frame_prefix(first_bytes):
+        return encode_header(response)
+    return (json.dumps(response) + "\r\n\r\n").encode()
+
+
+class BusyResponder(threading.Thread):
+    """
+    Mengirim respons BUSY ke koneksi yang tidak mendapat tempat di pool
+    handler. Satu thread melayani semua koneksi yang ditolak dengan
+    selector: byte pertama request dibaca untuk mengenali protokolnya
+    (v1 atau v2), respons dikirim, sisa request dibuang, lalu koneksi ditutup.
+    """
+    def __init__(self, admission):
+        threading.Thread.__init__(self, name='busy-responder', daemon=True)
+        self.admission = admission
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.Lock()
+        self.incoming = []
+        self.pending = 0
+
+    def reject(self, connection, address):
+        with self.lock:
+            if self.pending >= MAX_PENDING_REJECTS:
+                connection.close()
+                return
+            self.pending += 1
+            self.incoming.append((connection, address))
+
+    def respond(self, connection, address, first_bytes):
+        """Mengirim BUSY lalu beralih ke tahap membuang sisa request"""
+        logging.warning(f"Server sibuk, menolak koneksi dari {address}")
+        try:
+            # Respons kecil, muat di buffer kirim socket
+            connection.send(encode_busy(self.admission.busy_response(), first_bytes))
+            connection.shutdown(socket.SHUT_WR)
+        except OSError:
+            self.close(connection)
+            return
+        self.selector.modify(connection, selectors.EVENT_READ,
+                             (address, time.monotonic() + LINGER_TIMEOUT, 'drain'))
+
+    def close(self, connection):
+        self.selector.unregister(connection)
+        connection.close()
+        with self.lock:
+            self.pending -= 1
+
+    def run(self):
+        while True:
+            with self.lock:
+                incoming, self.incoming = self.incoming, []
+            for connection, address in incoming:
+                connection.setblocking(False)
+                deadline = time.monotonic() + BUSY_DETECT_TIMEOUT
+                self.selector.register(connection, selectors.EVENT_READ, (address, deadline, 'detect'))
+
+            for key, _ in self.selector.select(timeout=0.1):
+                address, _, state = key.data
+                try:
+                    data = key.fileobj.recv(65536 if state == 'drain' else 16)
+                except OSError:
+                    data = b''
+                if state == 'detect' and data:
+                    self.respond(key.fileobj, address, data)
+                elif not data or state == 'detect':
+                    self.close(key.fileobj)
+
+            now = time.monotonic()
+            for key in list(self.selector.get_map().values()):
+                address, deadline, state = key.data
+                if deadline < now:
+                    if state == 'detect':
+                        # Client belum mengirim apa pun, anggap protokol v1
+                        self.respond(key.fileobj, address, b'')
+                    else:
+                        self.close(key.fileobj)
@@ -0,0 +1,717 @@
+import os
+import re
+import sys
+import json
+import time
+import shlex
+import base64
+import random
+import socket
+import shutil
+import signal
+import logging
+import argparse
+import hashlib
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from file_frame import SocketReader, encode_header, decode_header, send_frame
+from file_request import classify, MarkerScanner, split_command
+
+"""
+* file_benchmark menjalankan file_server secara lokal lalu membebaninya
+  dengan N client sintetis yang berjalan bersamaan
+* campuran command (LIST, GET, UPLOAD, DELETE) dan distribusi ukuran file
+  (dari byte sampai GB) dapat diatur; isi upload dibangkitkan sambil
+  dikirim sehingga file besar tidak perlu dimuat ke memori
+* hasil: request/detik, MB/detik, latensi p50/p95/p99 per command, CPU dan
+  RSS puncak server, ditulis juga sebagai JSON agar beberapa run (misalnya
+  mode thread vs async) bisa dibandingkan dan regresi terdeteksi
+* --micro mengukur overhead per request kecil (LIST/DELETE) di dalam satu
+  proses tanpa jaringan: pengenalan dan parse request, dispatch, handler
+  dan serialize respons, dalam mikrodetik per request
+"""
+
+DEFAULT_CLIENTS = 8
+DEFAULT_DURATION = 10.0
+DEFAULT_MIX = 'list=1,get=6,upload=2,delete=1'
+DEFAULT_SIZES = '1K:60,64K:25,1M:10,16M:5'
+COMMANDS = ('list', 'get', 'upload', 'delete')
+# Kelipatan 3 agar base64 per blok pada upload v1 tidak menghasilkan padding di tengah
+BLOCK_SIZE = 768 * 1024
+LIST_LIMIT = 100
+STARTUP_TIMEOUT = 15.0
+SHUTDOWN_TIMEOUT = 10.0
+SAMPLE_INTERVAL = 0.2
+# Batas default perubahan (persen) yang dianggap regresi saat membandingkan hasil
+DEFAULT_THRESHOLD = 10.0
+SIZE_UNITS = {'': 1, 'B': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+V1_OK_PATTERN = re.compile(rb'"status":\s*"OK"')
+# Micro-benchmark: jumlah request per pengukuran dan jumlah file di indeks
+MICRO_ITERATIONS = 20000
+MICRO_FILES = 1000
+MICRO_CONTENT = b'x' * 100
+
+# Konfigurasi logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+
+def parse_size(text):
+    """Ukuran seperti 512, 64K, 1M atau 2G (kelipatan 1024)"""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)\s*([KMG]?)B?', text.strip().upper())
+    if not match:
+        raise ValueError(f'Ukuran tidak valid: {text}')
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+def parse_mix(text):
+    """Campuran command 'get=6,upload=2' menjadi list (command, bobot)"""
+    mix = []
+    for item in text.split(','):
+        command, _, weight = item.partition('=')
+        command = command.strip().lower()
+        if command not in COMMANDS:
+            raise ValueError(f'Command {command} tidak dikenali, gunakan {", ".join(COMMANDS)}')
+        mix.append((command, float(weight or 1)))
+    return mix
+
+
+def parse_sizes(text):
+    """Distribusi ukuran '1K:60,1M:5' menjadi list (ukuran, bobot)"""
+    sizes = []
+    for item in text.split(','):
+        size, _, weight = item.partition(':')
+        sizes.append((parse_size(size), float(weight or 1)))
+    return sizes
+
+
+def format_size(size):
+    for unit in ('G', 'M', 'K'):
+        if size >= SIZE_UNITS[unit] and size % SIZE_UNITS[unit] == 0:
+            return f'{size // SIZE_UNITS[unit]}{unit}'
+    return f'{size}B'
+
+
+def percentile(values, p):
+    """Persentil (nearest rank) dari list yang sudah terurut"""
+    if not values:
+        return None
+    rank = max(1, int(round(p / 100.0 * len(values) + 0.5)))
+    return values[min(rank, len(values)) - 1]
+
+
+def summarize(latencies, count_bytes, errors, elapsed):
+    """Ringkasan metrik satu command (atau seluruh run)"""
+    latencies = sorted(latencies)
+    requests = len(latencies)
+    to_ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return dict(requests=requests, errors=errors,
+                requests_per_sec=round(requests / elapsed, 2) if elapsed else 0,
+                mb_per_sec=round(count_bytes / elapsed / 1024 ** 2, 2) if elapsed else 0,
+                bytes=count_bytes,
+                latency_ms=dict(p50=to_ms(percentile(latencies, 50)), p95=to_ms(percentile(latencies, 95)),
+                                p99=to_ms(percentile(latencies, 99)), max=to_ms(latencies[-1] if latencies else None),
+                                mean=to_ms(sum(latencies) / requests if requests else None)))
+
+
+class SyntheticClient:
+    """
+    Client sintetis untuk benchmark, berbicara langsung dengan protokol
+    v1 (teks/JSON, satu koneksi per request) atau v2 (frame, satu koneksi
+    keep-alive). Setiap method mengembalikan jumlah byte isi file yang
+    dikirim/diterima dan melempar RuntimeError jika server menjawab selain OK.
+    """
+    def __init__(self, address, protocol_version=2, block=None):
+        self.address = address
+        self.protocol_version = protocol_version
+        self.block = block or os.urandom(BLOCK_SIZE)
+        self.connection = None
+        self.reader = None
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def connect(self):
+        connection = socket.create_connection(self.address)
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return connection
+
+    def iter_content(self, size):
+        """Isi file sintetis: 16 byte acak (agar tidak terdeduplikasi) lalu blok berulang"""
+        remaining = size
+        prefix = os.urandom(min(16, size))
+        if prefix:
+            yield prefix
+            remaining -= len(prefix)
+        while remaining > 0:
+            chunk = self.block[:min(remaining, len(self.block))]
+            remaining -= len(chunk)
+            yield chunk
+
+    # Protokol v2
+    def frame(self, header, size=0, content=None):
+        """Mengirim satu frame dan membuang payload respons, mengembalikan (respons, panjang payload)"""
+        if self.connection is None:
+            self.connection = self.connect()
+            self.reader = SocketReader(self.connection)
+        try:
+            if content is None:
+                send_frame(self.connection, header)
+            else:
+                self.connection.sendall(encode_header(header, size))
+                for chunk in content:
+                    self.connection.sendall(chunk)
+            response, payload_length = self.reader.read_header()
+            if response is None:
+                raise ConnectionError('Server menutup koneksi tanpa respons')
+            for _ in self.reader.iter_payload(payload_length):
+                pass
+        except Exception:
+            # Koneksi tidak lagi sinkron, request berikutnya memakai koneksi baru
+            self.close()
+            raise
+        if response.get('status') != 'OK':
+            raise RuntimeError(f"{header['command']}: {response.get('status')} {response.get('data')}")
+        return response, payload_length
+
+    # Protokol v1
+    def text_request(self, request, content=()):
+        """Mengirim request v1 dan membaca respons sampai marker tanpa menampungnya, mengembalikan panjangnya"""
+        connection = self.connect()
+        try:
+            connection.sendall(request)
+            for chunk in content:
+                connection.sendall(chunk)
+            connection.sendall(b"\r\n\r\n")
+            head = b''
+            tail = b''
+            length = 0
+            while True:
+                chunk = connection.recv(256 * 1024)
+                if not chunk:
+                    raise ConnectionError('Server menutup koneksi sebelum respons lengkap')
+                if len(head) < 64:
+                    head += chunk[:64]
+                length += len(chunk)
+                window = tail + chunk
+                if b"\r\n\r\n" in window:
+                    break
+                tail = window[-3:]
+        finally:
+            connection.close()
+        if not V1_OK_PATTERN.search(head):
+            raise RuntimeError(f"{request[:40]!r}: {head[:64]!r}")
+        return length
+
+    def list(self):
+        if self.protocol_version == 2:
+            self.frame(dict(command='LIST', params=[f'limit={LIST_LIMIT}']))
+        else:
+            self.text_request(f'LIST limit={LIST_LIMIT}'.encode())
+        return 0
+
+    def get(self, name):
+        if self.protocol_version == 2:
+            return self.frame(dict(command='GET', params=[name]))[1]
+        # Panjang respons v1 berupa base64 dalam JSON, dikonversi ke ukuran isi file
+        return self.text_request(shlex.join(['GET', name]).encode()) * 3 // 4
+
+    def upload(self, name, size):
+        if self.protocol_version == 2:
+            self.frame(dict(command='UPLOAD', params=[name]), size, self.iter_content(size))
+            return size
+        prefix = json.dumps(dict(command='upload', filename=name))[:-1] + ', "filedata": "'
+        encoded = (base64.b64encode(chunk) for chunk in self.iter_content_v1(size))
+        self.text_request(prefix.encode(), self.joined(encoded, b'"}'))
+        return size
+
+    def iter_content_v1(self, size):
+        """Seperti iter_content, tapi setiap potongan kelipatan 3 byte kecuali yang terakhir (base64 bersambung)"""
+        pending = b''
+        for chunk in self.iter_content(size):
+            data = pending + chunk
+            cut = len(data) - len(data) % 3
+            pending = data[cut:]
+            if cut:
+                yield data[:cut]
+        if pending:
+            yield pending
+
+    def joined(self, chunks, suffix):
+        yield from chunks
+        yield suffix
+
+    def delete(self, name):
+        if self.protocol_version == 2:
+            self.frame(dict(command='DELETE', params=[name]))
+        else:
+            self.text_request(shlex.join(['DELETE', name]).encode())
+        return 0
+
+
+def run_client(address, protocol_version, mix, sizes, deadline, client_id, seed, stats, lock):
+    """Loop satu client sintetis sampai deadline, hasil per command digabung ke stats"""
+    rng = random.Random(seed * 1000003 + client_id)
+    client = SyntheticClient(address, protocol_version)
+    commands = [command for command, _ in mix]
+    command_weights = [weight for _, weight in mix]
+    size_values = [size for size, _ in sizes]
+    size_weights = [weight for _, weight in sizes]
+    uploaded = []
+    local = {}
+    sequence = 0
+
+    while time.monotonic() < deadline:
+        command = rng.choices(commands, command_weights)[0]
+        if command == 'delete' and not uploaded:
+            # Belum ada file milik client ini yang bisa dihapus, unggah dulu
+            command = 'upload'
+        metrics = local.setdefault(command, dict(latencies=[], bytes=0, errors=0))
+        size = rng.choices(size_values, size_weights)[0]
+        started = time.perf_counter()
+        try:
+            if command == 'list':
+                count_bytes = client.list()
+            elif command == 'get':
+                count_bytes = client.get(f'bench-get-{format_size(size)}')
+            elif command == 'upload':
+                sequence += 1
+                name = f'bench-{os.getpid()}-{client_id}-{sequence}'
+                count_bytes = client.upload(name, size)
+                uploaded.append(name)
+            else:
+                count_bytes = client.delete(uploaded.pop(0))
+        except Exception as e:
+            metrics['errors'] += 1
+            logging.debug(f"Client {client_id}: {command} gagal: {e}")
+            continue
+        metrics['latencies'].append(time.perf_counter() - started)
+        metrics['bytes'] += count_bytes
+
+    # File yang tersisa dibersihkan di luar pengukuran
+    for name in uploaded:
+        try:
+            client.delete(name)
+        except Exception:
+            pass
+    client.close()
+    with lock:
+        for command, values in local.items():
+            target = stats.setdefault(command, dict(latencies=[], bytes=0, errors=0))
+            target['latencies'].extend(values['latencies'])
+            target['bytes'] += values['bytes']
+            target['errors'] += values['errors']
+
+
+def run_load_process(address, protocol_version, mix, sizes, deadline_in, client_ids, seed):
+    """Menjalankan sekelompok client sebagai thread dalam satu proses, mengembalikan stats"""
+    deadline = time.monotonic() + deadline_in
+    stats = {}
+    lock = threading.Lock()
+    threads = [threading.Thread(target=run_client, daemon=True,
+                                args=(address, protocol_version, mix, sizes, deadline, client_id, seed, stats, lock))
+               for client_id in client_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats
+
+
+class ProcessSampler(threading.Thread):
+    """
+    Mengambil sampel CPU dan RSS proses server beserta turunannya (worker)
+    dari /proc secara berkala. Tanpa /proc (bukan Linux) sampler tidak aktif
+    dan metrik server bernilai None.
+    """
+    def __init__(self, pid, interval=SAMPLE_INTERVAL):
+        threading.Thread.__init__(self, name='server-sampler', daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.enabled = os.path.isdir(f'/proc/{pid}')
+        self.peak_rss = 0
+        self.running = True
+        self.page_size = os.sysconf('SC_PAGE_SIZE') if self.enabled else 0
+        self.clock_ticks = os.sysconf('SC_CLK_TCK') if self.enabled else 0
+
+    def process_tree(self):
+        pids = [self.pid]
+        for pid in pids:
+            for task in os.listdir(f'/proc/{pid}/task') if os.path.isdir(f'/proc/{pid}/task') else ():
+                try:
+                    with open(f'/proc/{pid}/task/{task}/children') as children:
+                        pids.extend(int(child) for child in children.read().split())
+                except OSError:
+                    pass
+        return pids
+
+    def sample(self):
+        """(detik CPU, RSS byte) seluruh pohon proses server saat ini"""
+        ticks = 0
+        rss = 0
+        for pid in self.process_tree():
+            try:
+                with open(f'/proc/{pid}/stat') as stat:
+                    # Field setelah nama proses (dalam kurung): utime, stime, cutime, cstime di indeks 11..14
+                    fields = stat.read().rsplit(')', 1)[1].split()
+                with open(f'/proc/{pid}/statm') as statm:
+                    resident = int(statm.read().split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            ticks += sum(int(value) for value in fields[11:15])
+            rss += resident * self.page_size
+        return ticks / self.clock_ticks, rss
+
+    def cpu_seconds(self):
+        return self.sample()[0] if self.enabled else None
+
+    def run(self):
+        while self.enabled and self.running:
+            self.peak_rss = max(self.peak_rss, self.sample()[1])
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.running = False
+
+
+class LocalServer:
+    """Menjalankan file_server.py di direktori sementara untuk satu run benchmark"""
+    def __init__(self, mode='thread', workers=1, server_args=''):
+        self.mode = mode
+        self.workers = workers
+        self.server_args = shlex.split(server_args)
+        self.directory = tempfile.mkdtemp(prefix='file-benchmark-')
+        self.port = self.free_port()
+        self.process = None
+        self.log = None
+
+    def free_port(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            return sock.getsockname()[1]
+
+    def start(self):
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'file_server.py')
+        command = [sys.executable, script, str(self.port), '--mode', self.mode,
+                   '--workers', str(self.workers)] + self.server_args
+        self.log = open(os.path.join(self.directory, 'server.log'), 'wb')
+        logging.info(f"Menjalankan server: {shlex.join(command)}")
+        self.process = subprocess.Popen(command, cwd=self.directory, stdout=self.log, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'Server berhenti saat start, lihat {self.log.name}')
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError('Server tidak siap dalam batas waktu start')
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            # SIGTERM: mode --workers menghentikan seluruh worker dengan rapi
+            self.process.send_signal(signal.SIGTERM)
+            try:
+                self.process.wait(SHUTDOWN_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self.log is not None:
+            self.log.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def preload(address, protocol_version, sizes):
+    """Mengunggah satu file per kelas ukuran untuk dipakai GET"""
+    client = SyntheticClient(address, protocol_version)
+    try:
+        for size, _ in sizes:
+            client.upload(f'bench-get-{format_size(size)}', size)
+    finally:
+        client.close()
+
+
+def run_benchmark(args, mode, address=None):
+    """Satu run benchmark, mengembalikan dict hasil"""
+    mix = parse_mix(args.mix)
+    sizes = parse_sizes(args.sizes)
+    server = None
+    sampler = None
+    if address is None:
+        server = LocalServer(mode, args.workers, args.server_args)
+        server.start()
+        address = ('127.0.0.1', server.port)
+    try:
+        logging.info(f"Menyiapkan file GET: {', '.join(format_size(size) for size, _ in sizes)}")
+        preload(address, args.protocol, sizes)
+
+        if server is not None:
+            sampler = ProcessSampler(server.process.pid)
+            sampler.start()
+        cpu_before = sampler.cpu_seconds() if sampler else None
+
+        logging.info(f"Benchmark {mode}: {args.clients} client, {args.processes} proses, {args.duration} detik")
+        client_ids = list(range(args.clients))
+        groups = [client_ids[index::args.processes] for index in range(args.processes)]
+        started = time.monotonic()
+        if args.processes == 1:
+            results = [run_load_process(address, args.protocol, mix, sizes, args.duration, groups[0], args.seed)]
+        else:
+            with multiprocessing.Pool(args.processes) as pool:
+                results = pool.starmap(run_load_process, [(address, args.protocol, mix, sizes, args.duration,
+                                                           group, args.seed) for group in groups])
+        elapsed = time.monotonic() - started
+
+        server_metrics = None
+        if sampler is not None and sampler.enabled:
+            cpu_seconds = sampler.cpu_seconds() - cpu_before
+            sampler.stop()
+            server_metrics = dict(cpu_seconds=round(cpu_seconds, 3),
+                                  cpu_percent=round(cpu_seconds / elapsed * 100, 1),
+                                  peak_rss_bytes=sampler.peak_rss)
+    finally:
+        if sampler is not None:
+            sampler.stop()
+        if server is not None:
+            server.stop()
+
+    merged = {}
+    for stats in results:
+        for command, values in stats.items():
+            target = merged.setdefault(command, dict(latencies=[], bytes=0, errors=0))
+            target['latencies'].extend(values['latencies'])
+            target['bytes'] += values['bytes']
+            target['errors'] += values['errors']
+    commands = {command: summarize(values['latencies'], values['bytes'], values['errors'], elapsed)
+                for command, values in sorted(merged.items())}
+    total = summarize([value for values in merged.values() for value in values['latencies']],
+                      sum(values['bytes'] for values in merged.values()),
+                      sum(values['errors'] for values in merged.values()), elapsed)
+
+    return dict(mode=mode, workers=args.workers, protocol=args.protocol, clients=args.clients,
+                processes=args.processes, duration=round(elapsed, 3), mix=args.mix, sizes=args.sizes,
+                server_args=args.server_args, summary=total, commands=commands, server=server_metrics)
+
+
+def measure(function, iterations):
+    """Rata-rata mikrodetik per panggilan function(index), setelah satu panggilan pemanasan"""
+    function(iterations)
+    started = time.perf_counter()
+    for index in range(iterations):
+        function(index)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def run_micro(iterations):
+    """
+    Micro-benchmark overhead per request kecil di dalam proses, memakai
+    FileProtocol di direktori sementara berisi MICRO_FILES file. Log per
+    request (INFO) dimatikan selama pengukuran. Setiap request DELETE
+    menghapus file yang disiapkan (hard link ke blob yang sama) di luar
+    pengukuran. Mengembalikan dict nama pengukuran -> mikrodetik per request.
+    """
+    from file_protocol import FileProtocol
+    directory = tempfile.mkdtemp(prefix='file-micro-')
+    cwd = os.getcwd()
+    os.chdir(directory)
+    logging.disable(logging.INFO)
+    try:
+        fp = FileProtocol()
+        checksum = hashlib.sha256(MICRO_CONTENT).hexdigest()
+        fp.file.upload(['micro-content', MICRO_CONTENT])
+        for index in range(MICRO_FILES):
+            fp.file.upload_hash([f'micro-{index:05d}', checksum])
+        # File untuk DELETE: iterasi + 1 (pemanasan) per protokol
+        for index in range(iterations + 1):
+            fp.file.upload_hash([f'delete-v1-{index}', checksum])
+            fp.file.upload_hash([f'delete-v2-{index}', checksum])
+
+        def parse_v1(index):
+            buffer = bytearray(b'DELETE micro-00001\r\n\r\n')
+            classify(buffer)
+            split_command(MarkerScanner().take(buffer))
+
+        def frame_request(header):
+            # Header request v2 di-decode dari JSON dan header respons di-encode, seperti di server
+            raw = json.dumps(header).encode()
+            return lambda index: encode_header(fp.proses_frame(decode_header(raw))[0])
+
+        results = dict(
+            parse_v1=measure(parse_v1, iterations),
+            list_v1=measure(lambda index: fp.proses_string('LIST limit=10').encode(), iterations),
+            list_v2=measure(frame_request(dict(command='LIST', params=['limit=10'])), iterations),
+            delete_v1=measure(lambda index: fp.proses_string(f'DELETE delete-v1-{index}').encode(), iterations),
+            delete_v2=measure(lambda index: encode_header(fp.proses_frame(
+                dict(command='DELETE', params=[f'delete-v2-{index}']))[0]), iterations),
+            delete_missing_v1=measure(lambda index: fp.proses_string('DELETE missing-file').encode(), iterations),
+            unknown_v1=measure(lambda index: fp.proses_string('NOOP').encode(), iterations),
+        )
+    finally:
+        logging.disable(logging.NOTSET)
+        os.chdir(cwd)
+        shutil.rmtree(directory, ignore_errors=True)
+    return {name: round(value, 2) for name, value in results.items()}
+
+
+def print_micro(micro, baseline=None):
+    print("\n=== Micro-benchmark overhead per request ===")
+    print(f"{'request':<20} {'us/req':>10} {'req/s':>12}" + (f" {'baseline':>10} {'perubahan':>10}" if baseline else ''))
+    for name, value in micro.items():
+        line = f"{name:<20} {value:>10.2f} {1e6 / value:>12.0f}"
+        if baseline and baseline.get(name):
+            line += f" {baseline[name]:>10.2f} {(value - baseline[name]) / baseline[name] * 100:>+9.1f}%"
+        print(line)
+
+
+def run_key(run):
+    return f"{run['mode']} workers={run['workers']} v{run['protocol']}"
+
+
+def print_run(run):
+    print(f"\n=== {run_key(run)}: {run['clients']} client, {run['duration']} detik ===")
+    print(f"{'command':<8} {'req':>8} {'err':>6} {'req/s':>10} {'MB/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, metrics in list(run['commands'].items()) + [('TOTAL', run['summary'])]:
+        latency = metrics['latency_ms']
+        cells = [f"{latency[key]:>9.2f}" if latency[key] is not None else f"{'-':>9}" for key in ('p50', 'p95', 'p99')]
+        print(f"{name:<8} {metrics['requests']:>8} {metrics['errors']:>6} {metrics['requests_per_sec']:>10.1f} "
+              f"{metrics['mb_per_sec']:>9.2f} {' '.join(cells)}")
+    if run['server']:
+        server = run['server']
+        print(f"Server: CPU {server['cpu_seconds']} detik ({server['cpu_percent']}%), "
+              f"RSS puncak {server['peak_rss_bytes'] / 1024 ** 2:.1f} MB")
+
+
+def compare_runs(runs, baseline_runs, threshold):
+    """
+    Membandingkan hasil dengan baseline (run dengan mode/workers/protokol
+    yang sama). Regresi: req/s turun atau p99 naik lebih dari threshold persen.
+    Mengembalikan jumlah regresi yang ditemukan.
+    """
+    baseline = {run_key(run): run for run in baseline_runs}
+    regressions = 0
+    for run in runs:
+        base = baseline.get(run_key(run))
+        if base is None:
+            print(f"\n{run_key(run)}: tidak ada di baseline")
+            continue
+        print(f"\n=== Perbandingan {run_key(run)} dengan baseline ===")
+        for name in ['TOTAL'] + sorted(run['commands']):
+            current = run['summary'] if name == 'TOTAL' else run['commands'][name]
+            previous = base['summary'] if name == 'TOTAL' else base['commands'].get(name)
+            if not previous:
+                continue
+            checks = [('req/s', current['requests_per_sec'], previous['requests_per_sec'], -1),
+                      ('p99 ms', current['latency_ms']['p99'], previous['latency_ms']['p99'], 1)]
+            cells = []
+            for label, value, old, worse in checks:
+                if not value or not old:
+                    continue
+                change = (value - old) / old * 100
+                flag = ''
+                if change * worse > threshold:
+                    flag = ' REGRESI'
+                    regressions += 1
+                cells.append(f"{label} {old:.2f} -> {value:.2f} ({change:+.1f}%){flag}")
+            print(f"{name:<8} " + ', '.join(cells))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark beban untuk file_server')
+    parser.add_argument('--mode', default='thread',
+                        help='mode server, boleh beberapa dipisah koma untuk dibandingkan (default thread)')
+    parser.add_argument('--workers', type=int, default=1, help='jumlah proses worker server (default 1)')
+    parser.add_argument('--server-args', default='', help='argumen tambahan untuk file_server.py')
+    parser.add_argument('--connect', metavar='HOST:PORT',
+                        help='pakai server yang sudah berjalan (tanpa metrik CPU/RSS server)')
+    parser.add_argument('--protocol', type=int, choices=[1, 2], default=2, help='versi protokol (default 2)')
+    parser.add_argument('--clients', type=int, default=DEFAULT_CLIENTS,
+                        help=f'jumlah client bersamaan (default {DEFAULT_CLIENTS})')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='jumlah proses pembangkit beban, client dibagi rata (default 1)')
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION,
+                        help=f'lama pengukuran dalam detik (default {DEFAULT_DURATION})')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'bobot command (default {DEFAULT_MIX})')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help=f'distribusi ukuran file GET/upload, ukuran:bobot (default {DEFAULT_SIZES})')
+    parser.add_argument('--seed', type=int, default=1, help='seed pilihan command dan ukuran (default 1)')
+    parser.add_argument('--output', help='tulis hasil ke file JSON')
+    parser.add_argument('--compare', metavar='BASELINE', help='bandingkan dengan file JSON hasil sebelumnya')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'persen perubahan yang dianggap regresi (default {DEFAULT_THRESHOLD})')
+    parser.add_argument('--micro', action='store_true',
+                        help='micro-benchmark overhead per request LIST/DELETE di dalam proses, tanpa server')
+    parser.add_argument('--iterations', type=int, default=MICRO_ITERATIONS,
+                        help=f'jumlah request per pengukuran --micro (default {MICRO_ITERATIONS})')
+    args = parser.parse_args(argv)
+    try:
+        parse_mix(args.mix)
+        parse_sizes(args.sizes)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.clients < 1 or args.processes < 1:
+        parser.error('--clients dan --processes minimal 1')
+    if args.iterations < 1:
+        parser.error('--iterations minimal 1')
+    args.processes = min(args.processes, args.clients)
+    return args
+
+
+def main_micro(args):
+    micro = run_micro(args.iterations)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file).get('micro')
+    print_micro(micro, baseline)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(dict(timestamp=time.strftime('%Y-%m-%dT%H:%M:%S'), micro=micro), output, indent=2)
+        print(f"\nHasil disimpan di {args.output}")
+    if baseline:
+        # Regresi: overhead per request naik lebih dari threshold persen
+        regressions = [name for name, value in micro.items()
+                       if baseline.get(name) and (value - baseline[name]) / baseline[name] * 100 > args.threshold]
+        if regressions:
+            print(f"\n{len(regressions)} regresi melebihi {args.threshold}%: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+def main():
+    args = parse_args()
+    if args.micro:
+        main_micro(args)
+        return
+    runs = []
+    if args.connect:
+        host, _, port = args.connect.rpartition(':')
+        runs.append(run_benchmark(args, 'external', (host or '127.0.0.1', int(port))))
+    else:
+        for mode in args.mode.split(','):
+            runs.append(run_benchmark(args, mode.strip()))
+    for run in runs:
+        print_run(run)
+
+    result = dict(timestamp=time.strftime('%Y-%m-%dT%H:%M:%S'), runs=runs)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(result, output, indent=2)
+        print(f"\nHasil disimpan di {args.output}")
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare_runs(runs, json.load(baseline)['runs'], args.threshold)
+        if regressions:
+            print(f"\n{regressions} regresi melebihi {args.threshold}%")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
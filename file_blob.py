@@ -0,0 +1,225 @@
+import os
+import re
+import errno
+import logging
+import threading
+from file_lock import NamedLocks
+from file_index import file_checksum
+from file_storage import ShardedStorage
+
+"""
+* file_blob menyimpan isi file sekali saja berdasarkan SHA-256-nya
+  (content-addressed) di direktori tersembunyi .blobs/
+* setiap nama file di files/ adalah hard link ke blob-nya, sehingga GET,
+  sendfile dan indeks tetap bekerja per nama file tanpa perubahan, dan
+  jumlah link (st_nlink) sekaligus menjadi reference count blob
+* blob yang tidak lagi dirujuk nama file mana pun (st_nlink == 1) dihapus
+* penyimpanan, link dan penghapusan blob memakai lock per blob dari
+  file_lock (fcntl), sehingga aman antar proses worker (--workers)
+* blob (dan semua nama yang merujuknya) read-only; sebelum dipakai untuk
+  deduplikasi isi blob diverifikasi, sehingga blob yang diubah dari luar
+  server tidak dirujuk nama file baru dan diganti isi upload berikutnya
+* semua nama dengan isi yang sama berbagi satu inode dan mtime-nya; waktu
+  upload nama yang dibuat sebagai link ke blob yang sudah ada dicatat
+  terpisah di .link-times/ (lihat LinkTimes)
+"""
+
+BLOB_DIR = '.blobs'
+LINK_TIME_DIR = '.link-times'
+# Mode blob: isi blob dipakai bersama banyak nama file sehingga tidak boleh ditulis
+BLOB_MODE = 0o444
+# Jumlah blob yang hasil verifikasinya diingat per proses (lihat BlobStore.verify)
+VERIFIED_CACHE_SIZE = 65536
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+# errno jika filesystem tidak mendukung hard link
+LINK_UNSUPPORTED = (errno.EPERM, errno.EXDEV, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP)
+
+
+def is_digest(digest):
+    return isinstance(digest, str) and DIGEST_PATTERN.match(digest) is not None
+
+
+class BlobStore:
+    """
+    Penyimpanan blob content-addressed di root (relatif terhadap files/)
+    Blob disimpan di root/<2 karakter awal>/<sha256> agar satu direktori
+    tidak berisi terlalu banyak entri.
+    - locks: NamedLocks yang dipakai bersama antar proses; lock setiap blob
+      memakai path blob sebagai nama, sehingga tidak bentrok dengan nama file
+    """
+    def __init__(self, root=BLOB_DIR, locks=None):
+        self.root = root
+        self.enabled = True
+        self.locks = locks or NamedLocks()
+        # digest -> (inode, size, mtime) blob saat terakhir diverifikasi
+        self.verified = {}
+        self.lock = threading.Lock()
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def exists(self, digest):
+        return is_digest(digest) and os.path.isfile(self.path(digest))
+
+    def store(self, temp_name, digest):
+        """
+        Mendaftarkan file sementara hasil upload sebagai isi dengan digest ini.
+        Jika blob sudah ada, file sementara diganti menjadi link ke blob
+        tersebut sehingga isinya tidak tersimpan dua kali.
+        Mengembalikan True jika isi yang sama sudah ada sebelumnya.
+        """
+        if not self.enabled:
+            return False
+        path = self.path(digest)
+        with self.locks.hold(path):
+            try:
+                if self.verify(path, digest):
+                    self.link_blob(path, temp_name)
+                    return True
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.chmod(temp_name, BLOB_MODE)
+                if os.path.lexists(path):
+                    # Blob rusak diganti isi upload ini; nama lama tetap merujuk inode lamanya
+                    os.remove(path)
+                try:
+                    os.link(temp_name, path)
+                except FileExistsError:
+                    # Blob dengan isi yang sama baru saja disimpan penulis lain: blob itu yang dipakai
+                    if self.verify(path, digest):
+                        self.link_blob(path, temp_name)
+                        return True
+                    raise
+                self.remember(digest, os.stat(path))
+            except OSError as e:
+                if e.errno not in LINK_UNSUPPORTED:
+                    raise
+                # Tanpa hard link file tetap disimpan utuh, hanya tanpa deduplikasi
+                logging.warning(f"BlobStore: Hard link tidak didukung, deduplikasi dinonaktifkan ({str(e)})")
+                self.enabled = False
+        return False
+
+    def link_blob(self, path, temp_name):
+        """Dipanggil dengan lock blob: mengganti temp_name menjadi link ke blob path secara atomik"""
+        os.link(path, temp_name + '.link')
+        os.replace(temp_name + '.link', temp_name)
+
+    def verify(self, path, digest):
+        """
+        Dipanggil dengan lock blob: True jika blob path ada dan isinya masih
+        sesuai digest. Hasilnya diingat bersama (inode, size, mtime) blob,
+        sehingga selama blob tidak diubah pemeriksaan berikutnya cukup satu
+        stat; selain itu isi blob di-hash ulang.
+        """
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return False
+        with self.lock:
+            if self.verified.get(digest) == (st.st_ino, st.st_size, st.st_mtime_ns):
+                return True
+        if file_checksum(path) != digest:
+            logging.warning(f"BlobStore: Blob {digest} berubah dari luar server, tidak dipakai lagi")
+            return False
+        if st.st_mode & 0o222:
+            # Blob dari versi lama yang masih bisa ditulis
+            os.chmod(path, BLOB_MODE)
+        self.remember(digest, st)
+        return True
+
+    def remember(self, digest, st):
+        with self.lock:
+            self.verified[digest] = (st.st_ino, st.st_size, st.st_mtime_ns)
+            if len(self.verified) > VERIFIED_CACHE_SIZE:
+                del self.verified[next(iter(self.verified))]
+
+    def link(self, digest, target):
+        """Membuat target sebagai link ke blob digest, False jika blob tidak ada atau tidak utuh"""
+        if not self.enabled or not is_digest(digest):
+            return False
+        path = self.path(digest)
+        with self.locks.hold(path):
+            if not self.verify(path, digest):
+                return False
+            os.link(path, target)
+            return True
+
+    def release(self, digest):
+        """Menghapus blob digest jika sudah tidak dirujuk nama file mana pun"""
+        if not is_digest(digest):
+            return
+        path = self.path(digest)
+        with self.locks.hold(path):
+            try:
+                if os.stat(path).st_nlink == 1:
+                    os.remove(path)
+                    with self.lock:
+                        self.verified.pop(digest, None)
+                    logging.info(f"BlobStore: Released blob {digest}")
+            except FileNotFoundError:
+                pass
+
+    def refcount(self, digest):
+        """Jumlah nama file yang merujuk blob digest"""
+        try:
+            return os.stat(self.path(digest)).st_nlink - 1
+        except (OSError, ValueError):
+            return 0
+
+    def collect_garbage(self):
+        """Menghapus blob yatim, misalnya karena file dihapus dari luar server"""
+        removed = 0
+        if not os.path.isdir(self.root):
+            return removed
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for blob in os.scandir(shard.path):
+                if not is_digest(blob.name):
+                    continue
+                path = self.path(blob.name)
+                # Lock blob: proses worker lain mungkin sedang membuat link ke blob ini
+                with self.locks.hold(path):
+                    try:
+                        if os.stat(path).st_nlink == 1:
+                            os.remove(path)
+                            removed += 1
+                    except OSError:
+                        pass
+        if removed:
+            logging.info(f"BlobStore: Removed {removed} unreferenced blobs")
+        return removed
+
+
+class LinkTimes:
+    """
+    Waktu upload nama file yang dibuat sebagai link ke blob yang sudah ada.
+    Nama tersebut berbagi inode dengan nama lain berisi sama, sehingga waktu
+    uploadnya dicatat sebagai mtime file kosong root/<shard>/<nama>.
+    mtime nama file adalah yang terbaru dari mtime inode dan catatan ini,
+    sehingga perubahan isi dari luar server tetap terlihat.
+    """
+    def __init__(self, root=LINK_TIME_DIR):
+        self.storage = ShardedStorage(root)
+
+    def mark(self, name):
+        """Mencatat sekarang sebagai waktu upload name"""
+        path = self.storage.prepare(name)
+        os.close(os.open(path, os.O_WRONLY | os.O_CREAT, 0o644))
+        os.utime(path)
+
+    def clear(self, name):
+        try:
+            os.remove(self.storage.path(name))
+        except FileNotFoundError:
+            pass
+
+    def mtime(self, name, st):
+        """mtime name dengan st hasil stat/fstat file tersebut"""
+        try:
+            return max(st.st_mtime, os.stat(self.storage.path(name)).st_mtime)
+        except FileNotFoundError:
+            return st.st_mtime
+
+    def scan(self):
+        """Waktu upload semua nama yang tercatat, {nama: mtime}"""
+        return {name: st.st_mtime for name, st in self.storage.scan()}
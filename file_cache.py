@@ -0,0 +1,95 @@
+import threading
+from collections import OrderedDict
+
+"""
+* file_cache menyimpan respons GET yang sudah siap kirim di memori untuk
+  file yang sering diminta, sehingga GET berikutnya tidak perlu membaca
+  disk dan meng-encode ulang isi file
+* kunci cache memuat nama, ukuran dan mtime file: file yang berubah dari
+  luar server otomatis tidak cocok lagi dengan entri lamanya
+* total ukuran entri dibatasi anggaran byte, entri yang paling lama tidak
+  dipakai dibuang lebih dulu (LRU)
+"""
+
+# Anggaran memori cache default
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Satu entri paling besar 1/CACHE_ENTRY_FRACTION dari anggaran,
+# agar satu file besar tidak menyapu bersih seluruh cache
+CACHE_ENTRY_FRACTION = 8
+
+
+class ResponseCache:
+    """
+    Cache LRU berbatas byte untuk respons GET
+    - max_bytes: total ukuran entri yang boleh disimpan (0 = cache nonaktif)
+    Kunci berupa tuple yang diawali nama file, agar semua entri milik satu
+    file bisa dibuang sekaligus dengan invalidate(nama).
+    """
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.keys_by_name = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def max_entry_bytes(self):
+        return self.max_bytes // CACHE_ENTRY_FRACTION
+
+    def get(self, key):
+        """Nilai yang tersimpan untuk key, None jika tidak ada (miss)"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        """Menyimpan value berukuran size byte, diabaikan jika terlalu besar"""
+        if size > self.max_entry_bytes():
+            return
+        with self.lock:
+            self.discard(key)
+            self.entries[key] = (value, size)
+            self.keys_by_name.setdefault(key[0], set()).add(key)
+            self.size += size
+            while self.size > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self.discard(oldest)
+                self.evictions += 1
+
+    def discard(self, key):
+        """Dipanggil dengan lock: membuang satu entri jika ada"""
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= entry[1]
+        keys = self.keys_by_name[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self.keys_by_name[key[0]]
+
+    def invalidate(self, name):
+        """Membuang semua entri milik file name (setelah upload/delete)"""
+        with self.lock:
+            for key in list(self.keys_by_name.get(name, ())):
+                self.discard(key)
+
+    def resize(self, max_bytes):
+        """Mengubah anggaran cache, entri lama dibuang jika melebihi anggaran baru"""
+        with self.lock:
+            self.max_bytes = max_bytes
+            while self.size > self.max_bytes:
+                self.discard(next(iter(self.entries)))
+                self.evictions += 1
+
+    def stats(self):
+        """Penghitung cache: hit, miss, eviction, jumlah dan ukuran entri"""
+        with self.lock:
+            return dict(hits=self.hits, misses=self.misses, evictions=self.evictions,
+                        entries=len(self.entries), bytes=self.size, max_bytes=self.max_bytes)
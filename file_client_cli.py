@@ -5,7 +5,22 @@ import logging
 import os
 import sys
 import time
-from threading import Thread
+import re
+import glob
+import shlex
+import select
+import fnmatch
+import argparse
+import hashlib
+import tempfile
+from threading import Thread, Lock, local
+from file_frame import SocketReader, FrameError, send_frame, send_file_frame, set_nodelay, PROTOCOL_VERSION
+from file_compress import (DEFAULT_COMPRESS_LEVEL, DecompressingWriter, worth_compressing, read_sample,
+                           compress_file, iter_compress, iter_decompress)
+from file_delta import (DeltaError, DELTA_CHUNK_SIZE, DELTA_MAX_LITERAL_FRACTION, file_signature,
+                        encode_signature, decode_signature, generate_delta, apply_delta)
+from file_replication import parse_address
+from file_transfer import Transfer, TransferEngine, TRANSFER_WORKERS, TRANSFER_RETRIES, UNCHANGED
 
 # Konfigurasi logging
 logging.basicConfig(
@@ -17,35 +32,318 @@ logging.basicConfig(
 # Konfigurasi server
 SERVER_HOST = '172.16.16.101'
 SERVER_PORT = 7777
+# Berapa kali request diulang saat server menjawab BUSY
+MAX_BUSY_RETRIES = 3
+# Command baca yang boleh dilayani replica; command lain selalu ke server primary
+READ_COMMANDS = frozenset(['LIST', 'GET', 'MGET', 'DELTA'])
+# Lama replica yang gagal dihubungi dilewati sebelum dicoba lagi (detik)
+REPLICA_RETRY_INTERVAL = 10
+# Jumlah koneksi idle yang disimpan untuk dipakai ulang
+MAX_IDLE_CONNECTIONS = 4
+# Jumlah request pipelined yang boleh belum dijawab pada satu koneksi
+PIPELINE_WINDOW = 16
+# Jumlah koneksi paralel dan ukuran tiap rentang pada download protokol v2
+DOWNLOAD_CONNECTIONS = 4
+DOWNLOAD_RANGE_SIZE = 8 * 1024 * 1024
+# File v2 sebesar ini atau lebih diunggah per part (upload multipart) lewat
+# beberapa koneksi sekaligus; part yang gagal dicoba ulang sendiri-sendiri
+MULTIPART_MIN_SIZE = 32 * 1024 * 1024
+UPLOAD_PART_SIZE = 8 * 1024 * 1024
+UPLOAD_CONNECTIONS = 4
+UPLOAD_PART_RETRIES = 3
+# Codec kompresi yang dipakai jika didukung server (None = tanpa kompresi)
+DEFAULT_COMPRESSION = 'zlib'
+# File yang lebih kecil dari ini selalu dikirim utuh, tanpa sinkronisasi delta
+DELTA_MIN_SIZE = 1024 * 1024
+# Jumlah file per halaman saat menampilkan daftar file
+LIST_PAGE_SIZE = 50
+# Batas satu request batch (MGET/MUPLOAD/MDELETE): jumlah file dan total ukuran isi
+BATCH_MAX_FILES = 100
+BATCH_MAX_BYTES = 16 * 1024 * 1024
+# Jumlah file per halaman LIST saat sinkronisasi direktori; entri LIST
+# dikirim di header frame v2 yang dibatasi 64 KB
+SYNC_LIST_PAGE_SIZE = 100
+# Catatan ETag file yang sudah diunduh, satu per direktori tujuan (tersembunyi, tidak ikut disinkronkan)
+MANIFEST_FILE = '.manifest.json'
+# Direktori catatan sesi upload multipart, di luar direktori file yang diunggah
+# (yang bisa saja read-only); satu catatan per path absolut file
+UPLOAD_STATE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+                                'file-client', 'uploads')
+# File sementara unduhan di direktori lokal, tidak ikut disinkronkan
+LOCAL_TEMP_SUFFIXES = ('.part', '.part.json', '.delta')
+# Subcommand client non-interaktif dan exit code-nya
+CLI_COMMANDS = ('ls', 'get', 'put', 'rm', 'sync')
+EXIT_OK = 0
+EXIT_FAILED = 1       # sebagian file gagal diproses
+EXIT_USAGE = 2        # argumen tidak valid
+EXIT_NO_MATCH = 3     # tidak ada file yang cocok dengan pola/path
+EXIT_UNAVAILABLE = 4  # server tidak bisa dihubungi
+EXIT_INTERRUPTED = 130
+
+
+def is_transient(response):
+    """Cek apakah kegagalan request bersifat sementara (tanpa respons atau BUSY) dan layak dicoba lagi"""
+    return response is None or response.get('status') == 'BUSY'
+
+
+def iter_batches(entries):
+    """Membagi list (nama, ukuran) menjadi batch sesuai BATCH_MAX_FILES dan BATCH_MAX_BYTES"""
+    batch, batch_bytes = [], 0
+    for name, size in entries:
+        if batch and (len(batch) == BATCH_MAX_FILES or batch_bytes + size > BATCH_MAX_BYTES):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(name)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+class ConnectionPool:
+    """
+    Menyimpan koneksi protokol v2 yang masih terbuka agar bisa dipakai
+    ulang oleh request berikutnya (keep-alive), sehingga request kecil
+    tidak perlu membayar connect/teardown setiap kali
+    """
+    def __init__(self, max_idle=MAX_IDLE_CONNECTIONS):
+        self.max_idle = max_idle
+        self.idle = []
+        self.lock = Lock()
+
+    def is_usable(self, connection):
+        """Koneksi idle yang bisa dibaca berarti sudah ditutup server (EOF) atau rusak"""
+        try:
+            readable, _, _ = select.select([connection], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def acquire(self):
+        """Mengambil koneksi idle yang masih sehat, None jika tidak ada"""
+        with self.lock:
+            while self.idle:
+                connection = self.idle.pop()
+                if self.is_usable(connection):
+                    return connection
+                connection.close()
+        return None
+
+    def release(self, connection):
+        """Mengembalikan koneksi yang sudah selesai dipakai ke pool"""
+        with self.lock:
+            if len(self.idle) < self.max_idle:
+                self.idle.append(connection)
+                return
+        connection.close()
+
+    def close_all(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for connection in idle:
+            connection.close()
+
+class DownloadManifest:
+    """
+    Catatan file yang sudah diunduh ke satu direktori: ETag dari server
+    serta size dan mtime salinan lokal saat diunduh. Salinan yang size dan
+    mtime-nya belum berubah dianggap masih sama isinya, sehingga ETag-nya
+    bisa dipakai untuk GET bersyarat tanpa menghitung ulang SHA-256.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, MANIFEST_FILE)
+        self.lock = Lock()
+        self.entries = None
+
+    def load(self):
+        """Dipanggil dengan lock: isi manifest, dibaca dari disk saat pertama dipakai"""
+        if self.entries is None:
+            try:
+                with open(self.path) as file:
+                    self.entries = json.load(file)
+            except (OSError, ValueError):
+                self.entries = {}
+        return self.entries
+
+    def etag(self, name):
+        """ETag salinan lokal name, None jika belum tercatat atau file lokal sudah berubah"""
+        with self.lock:
+            entry = self.load().get(name)
+        if entry is None:
+            return None
+        try:
+            st = os.stat(os.path.join(self.directory, name))
+        except OSError:
+            return None
+        if st.st_size != entry['size'] or st.st_mtime_ns != entry['mtime_ns']:
+            return None
+        return entry['etag']
+
+    def update(self, etags):
+        """Mencatat dict nama -> ETag file yang baru diunduh (ETag None: catatan dibuang)"""
+        with self.lock:
+            entries = self.load()
+            for name, etag in etags.items():
+                try:
+                    st = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    etag = None
+                if etag:
+                    entries[name] = dict(etag=etag, size=st.st_size, mtime_ns=st.st_mtime_ns)
+                else:
+                    entries.pop(name, None)
+            try:
+                with open(self.path + '.tmp', 'w') as file:
+                    json.dump(entries, file)
+                os.replace(self.path + '.tmp', self.path)
+            except OSError as e:
+                logging.warning(f"Manifest unduhan tidak bisa disimpan: {e}")
 
 class FileClientApplication:
     """Kelas utama aplikasi client file server"""
     
-    def __init__(self, server_host=SERVER_HOST, server_port=SERVER_PORT):
+    def __init__(self, server_host=SERVER_HOST, server_port=SERVER_PORT, protocol_version=None,
+                 compression=DEFAULT_COMPRESSION, compress_level=DEFAULT_COMPRESS_LEVEL, replicas=None):
+        # Server primary menerima semua request; request baca dibagi ke replica jika ada
         self.server_address = (server_host, server_port)
-        self.ensure_dirs_exist()
+        self.replicas = [tuple(address) for address in replicas or []]
+        # Replica yang gagal dihubungi: alamat -> waktu boleh dicoba lagi
+        self.replica_down = {}
+        self.replica_turn = 0
+        self.replica_lock = Lock()
+        # None berarti versi protokol belum dinegosiasikan dengan server
+        self.protocol_version = protocol_version
+        # Codec kompresi yang diinginkan dan yang didukung server (diketahui dari HELLO)
+        self.compression = compression
+        self.compress_level = compress_level
+        self.server_codecs = None
+        self.pool = ConnectionPool()
+        self.replica_pools = {}
+        self.manifests = {}
+        # quiet: pesan proses transfer tidak ditampilkan (client non-interaktif)
+        self.quiet = False
+        # Pesan error terakhir per thread, dilaporkan TransferEngine untuk file yang gagal
+        self.messages = local()
         
     def ensure_dirs_exist(self):
         """Memastikan direktori yang dibutuhkan sudah ada"""
         if not os.path.exists('files'):
             os.makedirs('files')
             logging.info("Direktori files/ dibuat")
-    
-    def establish_connection(self):
-        """Membuat koneksi ke server"""
+
+    def notify(self, message):
+        """Pesan proses transfer untuk pengguna, tidak ditampilkan jika quiet"""
+        if not self.quiet:
+            print(message)
+
+    def notify_error(self, message, always=False, transient=False):
+        """
+        Seperti notify, dan dicatat sebagai error terakhir thread ini (lihat last_error).
+        always: tetap ditampilkan (ke stderr) walaupun quiet, untuk kegagalan
+        yang tidak dilaporkan TransferEngine
+        transient: gangguan sementara (koneksi, BUSY) yang layak dicoba lagi
+        """
+        self.messages.error = (message, transient)
+        if always and self.quiet:
+            print(message, file=sys.stderr)
+        self.notify(message)
+
+    def last_error(self):
+        """Mengambil lalu menghapus (pesan error, sementara) terakhir thread ini, None jika tidak ada"""
+        message = getattr(self.messages, 'error', None)
+        self.messages.error = None
+        return message
+
+    def establish_connection(self, address=None):
+        """Membuat koneksi ke server (default primary)"""
+        address = address or self.server_address
         connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         try:
-            connection.connect(self.server_address)
-            logging.info(f"Terhubung ke server {self.server_address[0]}:{self.server_address[1]}")
+            connection.connect(address)
+            set_nodelay(connection)
+            logging.info(f"Terhubung ke server {address[0]}:{address[1]}")
             return connection
         except Exception as e:
-            logging.error(f"Gagal terhubung ke server: {e}")
-            print(f"Error koneksi: {e}")
+            connection.close()
+            logging.error(f"Gagal terhubung ke server {address[0]}:{address[1]}: {e}")
+            if address == self.server_address:
+                self.notify_error(f"Error koneksi: {e}", transient=True)
+            return None
+
+    def read_address(self):
+        """
+        Alamat untuk request baca: replica yang sehat secara bergiliran, None
+        (server primary) jika tidak ada replica atau semuanya sedang gagal
+        """
+        if not self.replicas:
             return None
+        now = time.monotonic()
+        with self.replica_lock:
+            for _ in range(len(self.replicas)):
+                address = self.replicas[self.replica_turn % len(self.replicas)]
+                self.replica_turn += 1
+                if self.replica_down.get(address, 0) <= now:
+                    return address
+        return None
+
+    def replica_failed(self, address, reason):
+        """Replica dilewati selama REPLICA_RETRY_INTERVAL detik, request diulang ke primary"""
+        logging.warning(f"Replica {address[0]}:{address[1]} gagal ({reason}), request dikirim ke primary")
+        with self.replica_lock:
+            self.replica_down[address] = time.monotonic() + REPLICA_RETRY_INTERVAL
+
+    def replica_fallback(self, address, response):
+        """
+        True jika request baca yang dijawab replica harus diulang ke primary.
+        Hanya gagal transport (tidak terhubung, koneksi putus, timeout) yang
+        membuat replica dilewati; jawaban selain OK (misalnya file belum
+        tersalin) cukup diulang ke primary tanpa menandai replica gagal.
+        """
+        if response is None:
+            self.replica_failed(address, 'tanpa respons')
+            return True
+        if response.get('status') in ('OK', 'NOT_MODIFIED'):
+            return False
+        logging.info(f"Replica {address[0]}:{address[1]} menjawab {response.get('status')} "
+                     f"({response.get('data')}), request diulang ke primary")
+        return True
+
+    def pool_for(self, address):
+        if not address:
+            return self.pool
+        with self.replica_lock:
+            return self.replica_pools.setdefault(address, ConnectionPool())
     
+    def should_retry(self, response, attempt):
+        """Cek apakah request perlu diulang karena server sibuk, sekaligus menunggu retry_after"""
+        if not response or response.get('status') != 'BUSY' or attempt >= MAX_BUSY_RETRIES:
+            return False
+        delay = float(response.get('retry_after', 1))
+        logging.warning(f"Server sibuk, mencoba lagi dalam {delay} detik ({attempt + 1}/{MAX_BUSY_RETRIES})")
+        time.sleep(delay)
+        return True
+
     def transmit_request(self, request_content):
-        """Mengirim request ke server dan mendapatkan respons"""
-        connection = self.establish_connection()
+        """
+        Mengirim request ke server dan mendapatkan respons, diulang jika server sibuk.
+        Request baca (READ_COMMANDS) dikirim ke replica; jika replica gagal
+        atau tidak menjawab OK, request diulang ke primary (lihat replica_fallback).
+        """
+        words = request_content.split(None, 1)
+        address = self.read_address() if words and words[0].upper() in READ_COMMANDS else None
+        if address is not None:
+            response = self.transmit_request_once(request_content, address)
+            if not self.replica_fallback(address, response):
+                return response
+        attempt = 0
+        while True:
+            response = self.transmit_request_once(request_content)
+            if not self.should_retry(response, attempt):
+                return response
+            attempt += 1
+
+    def transmit_request_once(self, request_content, address=None):
+        """Mengirim request ke server (default primary) dan mendapatkan respons"""
+        connection = self.establish_connection(address)
         if not connection:
             return None
             
@@ -61,12 +359,15 @@ class FileClientApplication:
             # Terima respons
             buffer = bytearray()
             while True:
-                chunk = connection.recv(1024)
+                chunk = connection.recv(65536)
                 if not chunk:
                     break
                     
+                # Marker cukup dicari di potongan baru (plus 3 byte sebelumnya),
+                # bukan di seluruh buffer yang bisa berukuran puluhan MB
+                start = max(0, len(buffer) - 3)
                 buffer.extend(chunk)
-                if b"\r\n\r\n" in buffer:
+                if buffer.find(b"\r\n\r\n", start) != -1:
                     break
             
             # Proses respons
@@ -80,33 +381,334 @@ class FileClientApplication:
             
         except Exception as e:
             logging.error(f"Error selama komunikasi: {e}")
-            print(f"Terjadi kesalahan: {e}")
+            self.notify_error(f"Terjadi kesalahan: {e}", transient=True)
             return None
         finally:
             connection.close()
+
+    def negotiate_protocol(self):
+        """
+        Menanyakan versi protokol yang didukung server dengan HELLO.
+        Server lama akan menolak HELLO sehingga client kembali ke protokol v1.
+        Hasil negosiasi disimpan agar hanya dilakukan sekali.
+        """
+        if self.protocol_version is not None:
+            return self.protocol_version
+
+        response = self.transmit_request(f"HELLO {PROTOCOL_VERSION}")
+        if response is None or response.get('status') == 'BUSY':
+            # Server tidak bisa dihubungi atau sibuk, jangan simpan hasilnya
+            return 1
+
+        version = 1
+        self.server_codecs = []
+        if response.get('status') == 'OK' and isinstance(response.get('data'), dict):
+            version = response['data'].get('version', 1)
+            self.server_codecs = response['data'].get('codecs', [])
+        self.protocol_version = version
+        logging.info(f"Menggunakan protokol versi {version}")
+        return version
+
+    def transfer_codec(self):
+        """Codec kompresi yang disepakati dengan server, None jika tidak ada"""
+        if not self.compression:
+            return None
+        self.negotiate_protocol()
+        if self.server_codecs is None:
+            # Versi protokol ditentukan tanpa negosiasi, codec server ditanyakan dengan HELLO versi tersebut
+            response = self.transmit_request(f"HELLO {self.protocol_version}")
+            if response is None or response.get('status') == 'BUSY':
+                return None
+            data = response.get('data') if response.get('status') == 'OK' else None
+            self.server_codecs = data.get('codecs', []) if isinstance(data, dict) else []
+        if self.compression in self.server_codecs:
+            return self.compression
+        return None
+
+    def upload_codec(self, file_path):
+        """Codec untuk mengunggah file ini, None jika kompresi tidak layak"""
+        codec = self.transfer_codec()
+        if codec is None:
+            return None
+        with open(file_path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if not worth_compressing(file_path, read_sample(file), size, codec):
+                return None
+        return codec
+
+    def uses_frames(self):
+        """Cek apakah komunikasi dengan server memakai protokol v2"""
+        return self.negotiate_protocol() == PROTOCOL_VERSION
+
+    def transmit_frame(self, header, payload=b'', source=None, sink=None):
+        """
+        Mengirim request protokol v2 dan mendapatkan respons, diulang jika server sibuk
+        - source: file terbuka yang isinya dikirim sebagai payload (upload)
+        - sink: file terbuka tujuan payload respons (download)
+        Request baca (READ_COMMANDS) dikirim ke replica; jika replica gagal
+        atau tidak menjawab OK (misalnya file belum tersalin), request diulang
+        ke primary (lihat replica_fallback).
+        Mengembalikan tuple (respons, payload_respons)
+        """
+        address = self.read_address() if header.get('command') in READ_COMMANDS else None
+        if address is not None:
+            sink_start = sink.tell() if sink is not None else 0
+            response, response_payload = self.transmit_frame_once(header, payload, source, sink, address)
+            if not self.replica_fallback(address, response):
+                return response, response_payload
+            if sink is not None:
+                sink.seek(sink_start)
+        attempt = 0
+        while True:
+            response, response_payload = self.transmit_frame_once(header, payload, source, sink)
+            if not self.should_retry(response, attempt):
+                return response, response_payload
+            attempt += 1
+
+    def transmit_frame_once(self, header, payload=b'', source=None, sink=None, address=None):
+        """Satu kali kirim request protokol v2 ke server (default primary), lihat transmit_frame"""
+        sink_start = sink.tell() if sink is not None else 0
+        pool = self.pool_for(address)
+        connection = pool.acquire()
+        if connection is not None:
+            try:
+                return self.exchange_frame(connection, header, payload, source, sink, pool)
+            except (ConnectionError, FrameError) as e:
+                # Koneksi lama sudah ditutup server (idle timeout), ulangi dengan koneksi baru
+                logging.info(f"Koneksi keep-alive tidak bisa dipakai lagi ({e}), membuat koneksi baru")
+                if sink is not None:
+                    # Tulis ulang dari posisi awal; sink bisa berupa rentang di tengah file
+                    sink.seek(sink_start)
+            except Exception as e:
+                logging.error(f"Error selama komunikasi: {e}")
+                self.notify_error(f"Terjadi kesalahan: {e}", transient=True)
+                return None, b''
+
+        connection = self.establish_connection(address)
+        if not connection:
+            return None, b''
+        try:
+            return self.exchange_frame(connection, header, payload, source, sink, pool)
+        except Exception as e:
+            logging.error(f"Error selama komunikasi: {e}")
+            self.notify_error(f"Terjadi kesalahan: {e}", transient=True)
+            return None, b''
+
+    def exchange_frame(self, connection, header, payload=b'', source=None, sink=None, pool=None):
+        """
+        Mengirim satu frame dan membaca respons pada koneksi yang diberikan.
+        Koneksi dikembalikan ke pool (default pool primary) jika respons
+        terbaca utuh, selain itu ditutup.
+        """
+        reusable = False
+        try:
+            logging.info(f"Mengirim frame: {header.get('command')} {header.get('params', [])}")
+            complete = True
+            if source is not None:
+                length = os.fstat(source.fileno()).st_size
+                # Berhenti mengirim jika server sudah menjawab lebih awal (BUSY/ERROR)
+                complete = send_file_frame(connection, header, source, length, interruptible=True)
+            else:
+                send_frame(connection, header, payload)
+
+            reader = SocketReader(connection)
+            response, payload_length = reader.read_header()
+            if response is None:
+                raise FrameError('Server menutup koneksi tanpa respons')
+
+            # Payload terkompresi didekompresi saat diterima, pemanggil selalu mendapat isi asli
+            encoding = response.pop('encoding', None)
+            if sink is not None and response.get('status') == 'OK':
+                if encoding:
+                    target = DecompressingWriter(sink, encoding)
+                    reader.read_into_file(target, payload_length)
+                    target.finish()
+                else:
+                    reader.read_into_file(sink, payload_length)
+                response_payload = b''
+            else:
+                response_payload = reader.read_payload(payload_length)
+                if encoding:
+                    response_payload = b''.join(iter_decompress([response_payload], encoding))
+            reusable = complete and not reader.buffer
+            return response, response_payload
+        finally:
+            if reusable:
+                (pool or self.pool).release(connection)
+            else:
+                connection.close()
+
+    def transmit_pipeline(self, headers):
+        """
+        Mengirim beberapa request v2 tanpa payload (LIST/DELETE/...) pada satu
+        koneksi tanpa menunggu respons satu per satu (pipelining). Respons
+        dibaca berurutan sesuai urutan request.
+        Mengembalikan list (respons, payload_respons); (None, b'') untuk request yang gagal.
+        """
+        results = []
+        connection = self.pool.acquire() or self.establish_connection()
+        if not connection:
+            return [(None, b'')] * len(headers)
+
+        reusable = False
+        try:
+            reader = SocketReader(connection)
+            sent = 0
+            while len(results) < len(headers):
+                # Jaga agar request yang belum dijawab tidak lebih dari PIPELINE_WINDOW
+                while sent < len(headers) and sent - len(results) < PIPELINE_WINDOW:
+                    send_frame(connection, headers[sent])
+                    sent += 1
+                response, payload_length = reader.read_header()
+                if response is None:
+                    raise FrameError('Server menutup koneksi tanpa respons')
+                results.append((response, reader.read_payload(payload_length)))
+            reusable = not reader.buffer
+        except Exception as e:
+            logging.error(f"Error selama komunikasi: {e}")
+            self.notify_error(f"Terjadi kesalahan: {e}", transient=True)
+            results.extend([(None, b'')] * (len(headers) - len(results)))
+        finally:
+            if reusable:
+                self.pool.release(connection)
+            else:
+                connection.close()
+        return results
+
+    def send_command(self, command, params=[]):
+        """Mengirim command tanpa payload (LIST/DELETE) dengan protokol yang disepakati"""
+        if self.uses_frames():
+            response, _ = self.transmit_frame(dict(command=command, params=list(params)))
+            return response
+        return self.transmit_request(shlex.join([command] + list(params)))
     
+    def send_commands(self, commands):
+        """
+        Mengirim beberapa command tanpa payload sekaligus, list berisi (command, params).
+        Dengan protokol v2 request dikirim pipelined pada satu koneksi.
+        """
+        if self.uses_frames():
+            headers = [dict(command=command, params=list(params)) for command, params in commands]
+            return [response for response, _ in self.transmit_pipeline(headers)]
+        return [self.transmit_request(shlex.join([command] + list(params))) for command, params in commands]
+
+    def close(self):
+        """Menutup seluruh koneksi keep-alive yang masih terbuka"""
+        self.pool.close_all()
+        for pool in self.replica_pools.values():
+            pool.close_all()
+
     def display_files(self):
-        """Menampilkan daftar file di server"""
+        """Menampilkan daftar file di server, per halaman"""
         print("\nMengambil daftar file dari server...")
-        request = "LIST"
-        response = self.transmit_request(request)
-        
-        if not response:
-            print("Tidak dapat mengambil daftar file.")
+        params = [f"limit={LIST_PAGE_SIZE}"]
+        number = 0
+        while True:
+            response = self.send_command("LIST", params)
+
+            if not response:
+                print("Tidak dapat mengambil daftar file.")
+                return
+
+            if response.get('status') != 'OK':
+                print(f"Gagal mendapatkan daftar file: {response.get('data', 'Unknown error')}")
+                return
+
+            data = response.get('data', [])
+            if isinstance(data, list):
+                # Server lama tanpa pagination: data berupa list nama
+                files, next_cursor = [dict(name=name) for name in data], None
+            else:
+                files, next_cursor = data.get('files', []), data.get('next_cursor')
+
+            if number == 0:
+                print("\n=== Daftar File di Server ===")
+                if not files:
+                    print("Tidak ada file di server.")
+            for entry in files:
+                number += 1
+                size = f" ({entry['size']} bytes)" if 'size' in entry else ''
+                print(f"{number}. {entry['name']}{size}")
+
+            if not next_cursor:
+                break
+            if input("Tampilkan halaman berikutnya? (y/n): ").lower() != 'y':
+                break
+            params = [f"limit={LIST_PAGE_SIZE}", f"cursor={next_cursor}"]
+        print("============================")
+
+    def watch_changes(self, prefix=''):
+        """
+        Berlangganan event perubahan file (WATCH) lewat koneksi tersendiri dan
+        menghasilkan event (dict event, name, size, mtime, etag, seq) sampai
+        koneksi terputus. Event selama koneksi putus tidak dikirim ulang;
+        pemanggil menyamakan ulang dengan LIST setelah berlangganan lagi.
+        """
+        params = [f'prefix={prefix}'] if prefix else []
+        frames = self.uses_frames()
+        connection = self.establish_connection()
+        if not connection:
             return
-            
-        if response.get('status') == 'OK':
-            files = response.get('data', [])
-            print("\n=== Daftar File di Server ===")
-            if not files:
-                print("Tidak ada file di server.")
+        reader = SocketReader(connection)
+
+        def read_message():
+            if frames:
+                return reader.read_header()[0]
+            start = 0
+            while True:
+                end = reader.buffer.find(b"\r\n\r\n", start)
+                if end >= 0:
+                    message = json.loads(bytes(reader.buffer[:end]))
+                    del reader.buffer[:end + 4]
+                    return message
+                start = max(0, len(reader.buffer) - 3)
+                if not reader.fill():
+                    return None
+
+        try:
+            if frames:
+                send_frame(connection, dict(command='WATCH', params=params))
             else:
-                for index, filename in enumerate(files, 1):
-                    print(f"{index}. {filename}")
-            print("============================")
-        else:
-            print(f"Gagal mendapatkan daftar file: {response.get('data', 'Unknown error')}")
-    
+                connection.sendall(f"WATCH {' '.join(shlex.quote(param) for param in params)}\r\n\r\n".encode())
+            response = read_message()
+            if response is None or response.get('status') != 'OK':
+                raise ConnectionError(response.get('data') if response else 'Koneksi ditutup server')
+            logging.info(f"Berlangganan perubahan file (prefix '{prefix}')")
+            while True:
+                message = read_message()
+                if message is None:
+                    return
+                if message.get('status') != 'EVENT':
+                    raise ConnectionError(message.get('data', 'Langganan WATCH dihentikan server'))
+                # Pesan tanpa event adalah heartbeat dari server
+                yield from message.get('data', [])
+        finally:
+            connection.close()
+
+    def watch_files(self):
+        """Menampilkan perubahan file di server sampai dihentikan dengan Ctrl+C"""
+        prefix = input("\nAwalan nama file yang dipantau (kosongkan untuk semua): ").strip()
+        print("Memantau perubahan file, tekan Ctrl+C untuk berhenti...")
+        try:
+            for event in self.watch_changes(prefix):
+                size = f" ({event['size']} bytes)" if event['event'] != 'deleted' else ''
+                when = time.strftime('%H:%M:%S', time.localtime(event['mtime']))
+                print(f"[{when}] {event['event']}: {event['name']}{size}")
+            print("Koneksi pemantauan ditutup server.")
+        except (OSError, FrameError, ValueError) as e:
+            logging.error(f"Error memantau perubahan: {e}")
+            print(f"Pemantauan berhenti: {e}")
+        except KeyboardInterrupt:
+            print("\nPemantauan dihentikan.")
+
+    def manifest(self, directory):
+        """DownloadManifest untuk directory"""
+        key = os.path.abspath(directory)
+        if key not in self.manifests:
+            # setdefault: thread transfer yang bersamaan tetap memakai manifest yang sama
+            self.manifests.setdefault(key, DownloadManifest(directory))
+        return self.manifests[key]
+
     def download_file(self):
         """Mengunduh file dari server"""
         filename = input("\nMasukkan nama file yang ingin diunduh: ").strip()
@@ -114,30 +716,254 @@ class FileClientApplication:
             print("Nama file tidak boleh kosong.")
             return
             
-        print(f"Mengunduh file {filename}...")
-        request = f"GET {filename}"
-        response = self.transmit_request(request)
+        self.fetch_file(filename)
+
+    def fetch_file(self, filename, directory='files'):
+        """Mengunduh satu file dari server ke directory, mengembalikan True jika berhasil (UNCHANGED jika sudah terbaru)"""
+        self.notify(f"Mengunduh file {filename}...")
+        manifest = self.manifest(directory)
+        etag = manifest.etag(os.path.basename(filename))
+        if self.uses_frames():
+            # Salinan lokal yang ETag-nya masih sama tidak perlu diunduh lagi
+            if etag:
+                response, _ = self.transmit_frame(dict(command='GET', params=[filename, 0, 0], if_none_match=etag))
+                if response and response.get('status') == 'NOT_MODIFIED':
+                    return self.report_not_modified(filename, directory)
+            # Jika salinan lama sudah ada, cukup unduh bagian yang berubah
+            return self.download_file_delta(filename, directory) or self.download_file_frame(filename, directory)
+
+        codec = self.transfer_codec()
+        options = ([f"encoding={codec}"] if codec else []) + ([f"if-none-match={etag}"] if etag else [])
+        response = self.transmit_request(shlex.join(["GET", filename] + options))
         
         if not response:
-            print("Tidak dapat mengunduh file.")
-            return
+            self.notify_error("Tidak dapat mengunduh file.", transient=True)
+            return False
+
+        if response.get('status') == 'NOT_MODIFIED':
+            return self.report_not_modified(filename, directory)
             
         if response.get('status') == 'OK':
             try:
                 file_content_base64 = response.get('data_file', '')
                 file_content = base64.b64decode(file_content_base64)
+                if response.get('encoding'):
+                    file_content = b''.join(iter_decompress([file_content], response['encoding']))
                 
-                save_path = os.path.join('files', filename)
+                save_path = os.path.join(directory, filename)
                 with open(save_path, 'wb') as file:
                     file.write(file_content)
+                manifest.update({os.path.basename(filename): response.get('etag')})
                 
-                print(f"File '{filename}' berhasil disimpan ke direktori files/")
+                self.notify(f"File '{filename}' berhasil disimpan ke direktori {directory}/")
+                return True
             except Exception as e:
                 logging.error(f"Error menyimpan file: {e}")
-                print(f"Gagal menyimpan file: {e}")
+                self.notify_error(f"Gagal menyimpan file: {e}")
         else:
-            print(f"Gagal mengunduh file: {response.get('data', 'Unknown error')}")
-    
+            self.notify_error(f"Gagal mengunduh file: {response.get('data', 'Unknown error')}",
+                              transient=is_transient(response))
+        return False
+
+    def report_not_modified(self, filename, directory):
+        """Salinan lokal masih sama dengan server: berhasil tanpa byte yang diunduh (UNCHANGED)"""
+        self.notify(f"File '{filename}' tidak berubah sejak diunduh, salinan di direktori {directory}/ tetap dipakai.")
+        return UNCHANGED
+
+    def download_file_delta(self, filename, directory='files'):
+        """
+        Memperbarui salinan lokal di directory (default files/) dengan sinkronisasi delta: signature
+        salinan lokal dikirim ke server, server hanya mengirim blok yang berubah.
+        Mengembalikan False jika delta tidak bisa dipakai (tidak ada salinan
+        lokal, server lama, atau perubahan terlalu banyak) agar file diunduh utuh.
+        """
+        save_path = os.path.join(directory, os.path.basename(filename))
+        if not os.path.isfile(save_path) or os.path.getsize(save_path) < DELTA_MIN_SIZE:
+            return False
+
+        temp_path = save_path + '.delta'
+        try:
+            with open(save_path, 'rb') as basis:
+                signature = file_signature(basis)
+            with tempfile.TemporaryFile() as delta_file:
+                response, _ = self.transmit_frame(dict(command='DELTA', params=[filename]),
+                                                  payload=encode_signature(signature), sink=delta_file)
+                if not response or response.get('status') != 'OK':
+                    logging.info(f"Sinkronisasi delta tidak dipakai: {response.get('data') if response else 'tanpa respons'}")
+                    return False
+                delta_length = delta_file.tell()
+                delta_file.seek(0)
+                with open(save_path, 'rb') as basis, open(temp_path, 'wb') as out:
+                    size, checksum = apply_delta(basis, iter(lambda: delta_file.read(DELTA_CHUNK_SIZE), b''),
+                                                 out, signature['block_size'])
+            if checksum != response.get('sha256') or size != response.get('size'):
+                raise DeltaError('Checksum hasil delta tidak cocok')
+            os.replace(temp_path, save_path)
+            # ETag server adalah SHA-256 isi file
+            self.manifest(directory).update({os.path.basename(filename): checksum})
+        except (OSError, DeltaError) as e:
+            logging.error(f"Sinkronisasi delta gagal: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+        self.notify(f"File '{filename}' berhasil disimpan ke direktori {directory}/ "
+              f"(delta: {delta_length} dari {size} bytes diunduh)")
+        return True
+
+    def download_file_frame(self, filename, directory='files'):
+        """
+        Mengunduh file dengan protokol v2 ke directory (default files/). File
+        dibagi menjadi rentang DOWNLOAD_RANGE_SIZE yang diambil lewat beberapa
+        koneksi sekaligus dan ditulis langsung pada offset-nya di file .part.
+        Rentang yang sudah selesai dicatat di file .part.json, sehingga unduhan
+        yang terputus dilanjutkan dari sisa rentang saat diunduh lagi.
+        Mengembalikan True jika file berhasil diunduh.
+        """
+        save_path = os.path.join(directory, os.path.basename(filename))
+        temp_path = save_path + '.part'
+        state_path = temp_path + '.json'
+
+        # GET dengan length 0 hanya mengambil ukuran dan waktu modifikasi file
+        response, _ = self.transmit_frame(dict(command='GET', params=[filename, 0, 0]))
+        if not response:
+            self.notify_error("Tidak dapat mengunduh file.", transient=True)
+            return False
+        if response.get('status') != 'OK':
+            self.notify_error(f"Gagal mengunduh file: {response.get('data', 'Unknown error')}",
+                              transient=is_transient(response))
+            return False
+
+        size = response['size']
+        etag = response.get('etag')
+        # Versi file dikenali dari ETag (sama di primary dan replica), mtime untuk server lama
+        state = dict(size=size, version=etag or response.get('mtime'), range_size=DOWNLOAD_RANGE_SIZE, done=[])
+        try:
+            saved = self.load_transfer_state(state_path)
+            if saved and os.path.exists(temp_path) and all(saved.get(key) == state[key]
+                                                           for key in ('size', 'version', 'range_size')):
+                state = saved
+                self.notify(f"Melanjutkan unduhan, {len(state['done'])} bagian sudah ada")
+            else:
+                # Belum pernah diunduh atau file di server sudah berubah, mulai dari awal
+                with open(temp_path, 'wb') as part:
+                    part.truncate(size)
+                self.save_transfer_state(state_path, state)
+        except OSError as e:
+            logging.error(f"Error menyimpan file: {e}")
+            self.notify_error(f"Gagal menyimpan file: {e}")
+            return False
+
+        done = set(state['done'])
+        ranges = [(offset, min(DOWNLOAD_RANGE_SIZE, size - offset))
+                  for offset in range(0, size, DOWNLOAD_RANGE_SIZE) if offset not in done]
+        errors = []
+        lock = Lock()
+
+        def worker():
+            while True:
+                with lock:
+                    if not ranges or errors:
+                        return
+                    offset, length = ranges.pop(0)
+                error = self.download_range(filename, temp_path, offset, length, state)
+                with lock:
+                    if error:
+                        errors.append(error)
+                        return
+                    state['done'].append(offset)
+                    self.save_transfer_state(state_path, state)
+
+        threads = [Thread(target=worker) for _ in range(min(DOWNLOAD_CONNECTIONS, len(ranges)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            message, transient = errors[0]
+            self.notify_error(f"Gagal mengunduh file: {message}", transient=transient)
+            self.notify("Bagian yang sudah diunduh disimpan, unduh lagi untuk melanjutkan.")
+            return False
+
+        os.replace(temp_path, save_path)
+        os.remove(state_path)
+        self.manifest(directory).update({os.path.basename(filename): etag})
+        self.notify(f"File '{filename}' berhasil disimpan ke direktori {directory}/")
+        return True
+
+    def download_range(self, filename, temp_path, offset, length, state):
+        """
+        Mengunduh satu rentang file ke posisinya di file .part, mengembalikan None atau
+        (pesan error, sementara) dengan sementara True jika unduhan layak dicoba lagi.
+        Rentang dari replica yang masih menyimpan versi lain diulang ke primary.
+        """
+        header = dict(command='GET', params=[filename, offset, length])
+        codec = self.transfer_codec()
+        if codec:
+            header['accept_encoding'] = [codec]
+        try:
+            with open(temp_path, 'r+b') as sink:
+                sink.seek(offset)
+                response, _ = self.transmit_frame(header, sink=sink)
+                if (response and response.get('status') == 'OK' and self.replicas and
+                        self.range_version(response) != (state['size'], state['version'])):
+                    sink.seek(offset)
+                    response, _ = self.transmit_frame_once(header, sink=sink)
+        except OSError as e:
+            logging.error(f"Error menyimpan file: {e}")
+            return str(e), False
+
+        if not response:
+            return 'koneksi ke server gagal', True
+        if response.get('status') != 'OK':
+            return response.get('data', 'Unknown error'), is_transient(response)
+        if self.range_version(response) != (state['size'], state['version']):
+            # Diunduh ulang dari awal pada percobaan berikutnya
+            return 'file di server berubah selama diunduh', True
+        if response.get('length') != length:
+            return f'rentang {offset} hanya berisi {response.get("length")} dari {length} bytes', False
+        logging.info(f"Rentang {offset}-{offset + length} dari {filename} selesai")
+        return None
+
+    def range_version(self, response):
+        return response.get('size'), response.get('etag') or response.get('mtime')
+
+    def load_transfer_state(self, state_path):
+        """Membaca catatan transfer (rentang unduhan/sesi upload) yang tersimpan, None jika tidak ada"""
+        try:
+            with open(state_path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def remove_transfer_state(self, state_path):
+        if not state_path:
+            return
+        try:
+            os.remove(state_path)
+        except FileNotFoundError:
+            pass
+
+    def upload_state_path(self, file_path):
+        """
+        Path catatan sesi upload multipart file_path di UPLOAD_STATE_DIR (dibuat
+        jika belum ada), None jika direktori tersebut tidak bisa dibuat
+        """
+        key = hashlib.sha256(os.path.abspath(file_path).encode('utf-8', 'surrogateescape')).hexdigest()
+        try:
+            os.makedirs(UPLOAD_STATE_DIR, exist_ok=True)
+        except OSError as e:
+            logging.warning(f"Direktori catatan upload {UPLOAD_STATE_DIR} tidak bisa dibuat: {e}")
+            return None
+        return os.path.join(UPLOAD_STATE_DIR, key + '.json')
+
+    def save_transfer_state(self, state_path, state):
+        """Menyimpan catatan transfer secara atomik agar tetap utuh jika client terhenti"""
+        with open(state_path + '.tmp', 'w') as file:
+            json.dump(state, file)
+        os.replace(state_path + '.tmp', state_path)
+
     def upload_file(self):
         """Mengunggah file ke server"""
         file_path = input("\nMasukkan path file yang ingin diunggah: ").strip()
@@ -149,69 +975,536 @@ class FileClientApplication:
         if not os.path.exists(file_path):
             print(f"File {file_path} tidak ditemukan.")
             return
-            
+
+        self.upload_path(file_path)
+
+    def upload_path(self, file_path):
+        """Mengunggah satu file lokal ke server, mengembalikan True jika berhasil"""
         try:
             filename = os.path.basename(file_path)
+
+            # Tanya dulu dengan SHA-256: jika isi yang sama sudah ada di server,
+            # file tidak perlu dikirim ulang
+            checksum = self.file_sha256(file_path)
+            response = self.send_command("UPLOADHASH", [filename, checksum])
+            if response and response.get('status') == 'OK':
+                self.notify(f"Isi file {filename} sudah ada di server, tidak perlu dikirim ulang.")
+                return self.report_upload(filename, response)
+
+            # Jika server punya versi lama file ini, cukup kirim bagian yang berubah
+            if self.uses_frames() and os.path.getsize(file_path) >= DELTA_MIN_SIZE \
+                    and self.upload_file_delta(file_path, filename):
+                return True
+
+            # File besar dikirim per part secara paralel; None jika server tidak mendukung
+            if self.uses_frames() and os.path.getsize(file_path) >= MULTIPART_MIN_SIZE:
+                uploaded = self.upload_file_multipart(file_path, filename, checksum)
+                if uploaded is not None:
+                    return uploaded
+
+            codec = self.upload_codec(file_path)
+            if self.uses_frames():
+                # Protokol v2: isi file dikirim mentah langsung dari disk,
+                # atau dari file sementara berisi hasil kompresinya
+                self.notify(f"Mengunggah file {filename}...")
+                header = dict(command='UPLOAD', params=[filename])
+                with open(file_path, 'rb') as source:
+                    if codec is None:
+                        response, _ = self.transmit_frame(header, source=source)
+                    else:
+                        with tempfile.TemporaryFile() as compressed:
+                            compress_file(source, compressed, codec, self.compress_level)
+                            compressed.flush()
+                            header['encoding'] = codec
+                            response, _ = self.transmit_frame(header, source=compressed)
+                return self.report_upload(filename, response)
             
             # Baca file dan encode ke base64
             with open(file_path, 'rb') as file:
                 file_content = file.read()
-                file_content_base64 = base64.b64encode(file_content).decode()
+            if codec is not None:
+                file_content = b''.join(iter_compress([file_content], codec, self.compress_level))
+            file_content_base64 = base64.b64encode(file_content).decode()
             
-            # Siapkan data untuk upload
+            # Siapkan data untuk upload; encoding harus mendahului filedata
+            # agar server bisa mendekompresi sambil menerima
             upload_data = {
                 "command": "upload",
                 "filename": filename,
-                "filedata": file_content_base64
             }
+            if codec is not None:
+                upload_data["encoding"] = codec
+            upload_data["filedata"] = file_content_base64
             
             request = json.dumps(upload_data)
-            print(f"Mengunggah file {filename}...")
+            self.notify(f"Mengunggah file {filename}...")
             response = self.transmit_request(request)
-            
-            if not response:
-                print("Tidak dapat mengunggah file.")
-                return
-                
-            if response.get('status') == 'OK':
-                print(f"File '{filename}' berhasil diunggah ke server.")
-            else:
-                print(f"Gagal mengunggah file: {response.get('data', 'Unknown error')}")
+            return self.report_upload(filename, response)
                 
         except Exception as e:
             logging.error(f"Error dalam upload file: {e}")
-            print(f"Terjadi kesalahan saat upload: {e}")
+            self.notify_error(f"Terjadi kesalahan saat upload: {e}")
+            return False
+
+    def upload_file_delta(self, file_path, filename):
+        """
+        Mengunggah file dengan sinkronisasi delta terhadap versi yang sudah ada
+        di server: signature diambil dari server, lalu hanya blok yang berubah
+        dikirim dengan PATCH. False jika file harus diunggah utuh.
+        """
+        response, payload = self.transmit_frame(dict(command='SIGNATURE', params=[filename]))
+        if not response or response.get('status') != 'OK':
+            return False
+
+        try:
+            signature = decode_signature(payload)
+            with open(file_path, 'rb') as source, tempfile.TemporaryFile() as delta_file:
+                size = os.fstat(source.fileno()).st_size
+                info = generate_delta(signature, source, delta_file,
+                                      max_literal=int(size * DELTA_MAX_LITERAL_FRACTION))
+                delta_file.flush()
+                delta_length = delta_file.tell()
+                params = [filename, info['sha256'], response['size'], response['mtime'], signature['block_size']]
+                self.notify(f"Mengunggah perubahan file {filename} ({delta_length} dari {size} bytes)...")
+                response, _ = self.transmit_frame(dict(command='PATCH', params=params), source=delta_file)
+        except DeltaError as e:
+            logging.info(f"Sinkronisasi delta tidak dipakai: {e}")
+            return False
+
+        if not response or response.get('status') != 'OK':
+            logging.info(f"Sinkronisasi delta gagal: {response.get('data') if response else 'tanpa respons'}")
+            return False
+        self.report_upload(filename, response)
+        return True
+
+    def upload_file_multipart(self, file_path, filename, checksum):
+        """
+        Mengunggah file dengan sesi multipart protokol v2: file dibagi menjadi
+        part UPLOAD_PART_SIZE yang dikirim lewat beberapa koneksi sekaligus,
+        masing-masing dengan SHA-256-nya, lalu dirangkai server dengan MPCOMMIT.
+        Id sesi dicatat di UPLOAD_STATE_DIR (lihat upload_state_path), sehingga
+        upload yang terputus dilanjutkan dengan hanya mengirim part yang belum
+        diterima server. Jika catatan tidak bisa disimpan, upload tetap berjalan
+        tetapi tidak bisa dilanjutkan setelah terputus.
+        Mengembalikan True/False, atau None jika server tidak mendukung multipart.
+        """
+        state_path = self.upload_state_path(file_path)
+        st = os.stat(file_path)
+        state = dict(filename=filename, size=st.st_size, mtime=st.st_mtime, sha256=checksum,
+                     part_size=UPLOAD_PART_SIZE, id=None)
+        received = {}
+        saved = self.load_transfer_state(state_path) if state_path else None
+        if saved and saved.get('id') and all(saved.get(key) == state[key] for key in
+                                             ('filename', 'size', 'mtime', 'sha256', 'part_size')):
+            response, _ = self.transmit_frame(dict(command='MPSTATUS', params=[saved['id']]))
+            if response and response.get('status') == 'OK':
+                state = saved
+                received = response['data']['received']
+                self.notify(f"Melanjutkan upload, {len(received)} dari {response['data']['parts']} part sudah ada di server")
+
+        if state['id'] is None:
+            response, _ = self.transmit_frame(dict(command='MPBEGIN', params=[filename, state['size'],
+                                                                              state['part_size']]))
+            if not response or response.get('status') != 'OK':
+                logging.info(f"Upload multipart tidak dipakai: {response.get('data') if response else 'tanpa respons'}")
+                return None
+            state['id'] = response['data']['id']
+            if state_path:
+                try:
+                    self.save_transfer_state(state_path, state)
+                except OSError as e:
+                    logging.warning(f"Catatan upload {state_path} tidak bisa disimpan: {e}")
+                    state_path = None
+
+        session_id, size, part_size = state['id'], state['size'], state['part_size']
+        parts = list(range((size + part_size - 1) // part_size))
+        self.notify(f"Mengunggah file {filename} dalam {len(parts)} part...")
+        errors = []
+        lock = Lock()
+
+        def worker():
+            while True:
+                with lock:
+                    if not parts or errors:
+                        return
+                    number = parts.pop(0)
+                error, expired, transient = self.upload_part(file_path, session_id, number, part_size,
+                                                             received.get(str(number)))
+                if error:
+                    with lock:
+                        errors.append((error, expired, transient))
+                    return
+
+        threads = [Thread(target=worker) for _ in range(min(UPLOAD_CONNECTIONS, len(parts)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if not errors:
+            response, _ = self.transmit_frame(dict(command='MPCOMMIT', params=[session_id, checksum]))
+            if response and response.get('status') in ('OK', 'MISSING'):
+                # Sesi selesai atau sudah kedaluwarsa di server: catatan lokal tidak berguna lagi
+                self.remove_transfer_state(state_path)
+            return self.report_upload(filename, response)
+
+        error, expired, transient = errors[0]
+        # Sesi yang kedaluwarsa dimulai ulang pada percobaan berikutnya
+        self.notify_error(f"Gagal mengunggah file: {error}", transient=transient or expired)
+        if expired:
+            self.remove_transfer_state(state_path)
+        elif state_path:
+            self.notify("Part yang sudah terkirim disimpan server, unggah lagi untuk melanjutkan.")
+        return False
+
+    def upload_part(self, file_path, session_id, number, part_size, uploaded_checksum=None):
+        """
+        Mengirim satu part sesi multipart, diulang sampai UPLOAD_PART_RETRIES kali.
+        Part yang sudah ada di server dengan SHA-256 yang sama dilewati.
+        Mengembalikan (pesan error atau None, True jika sesi sudah tidak ada di server,
+        True jika kegagalannya sementara).
+        """
+        with open(file_path, 'rb') as source:
+            source.seek(number * part_size)
+            data = source.read(part_size)
+        part_checksum = hashlib.sha256(data).hexdigest()
+        if part_checksum == uploaded_checksum:
+            return None, False, False
+
+        header = dict(command='MPPART', params=[session_id, number, part_checksum])
+        error = None
+        for attempt in range(UPLOAD_PART_RETRIES):
+            if attempt:
+                logging.warning(f"Part {number} gagal ({error}), mencoba lagi ({attempt}/{UPLOAD_PART_RETRIES - 1})")
+                time.sleep(attempt)
+            response, _ = self.transmit_frame(header, data)
+            if response and response.get('status') == 'OK':
+                logging.info(f"Part {number} dari sesi {session_id} terkirim")
+                return None, False, False
+            error = response.get('data', 'Unknown error') if response else 'koneksi ke server gagal'
+            if response and response.get('status') == 'MISSING':
+                # Sesi sudah tidak ada di server, mengulang part tidak ada gunanya
+                return error, True, False
+        return f'part {number}: {error}', False, is_transient(response)
+
+    def file_sha256(self, file_path):
+        """SHA-256 isi file lokal, dibaca per potongan"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            while True:
+                chunk = file.read(1024 * 1024)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def report_upload(self, filename, response):
+        """Menampilkan hasil upload ke pengguna, mengembalikan True jika berhasil"""
+        if not response:
+            self.notify_error("Tidak dapat mengunggah file.", transient=True)
+            return False
+
+        if response.get('status') == 'OK':
+            self.notify(f"File '{filename}' berhasil diunggah ke server.")
+            return True
+        self.notify_error(f"Gagal mengunggah file: {response.get('data', 'Unknown error')}",
+                          transient=is_transient(response))
+        return False
     
     def delete_file(self):
-        """Menghapus file di server"""
-        filename = input("\nMasukkan nama file yang ingin dihapus: ").strip()
+        """Menghapus satu atau beberapa file di server"""
+        names = input("\nMasukkan nama file yang ingin dihapus (pisahkan dengan spasi): ").strip()
         
-        if not filename:
+        try:
+            filenames = shlex.split(names)
+        except ValueError as e:
+            print(f"Nama file tidak valid: {e}")
+            return
+        if not filenames:
             print("Nama file tidak boleh kosong.")
             return
             
-        confirm = input(f"Apakah Anda yakin ingin menghapus file '{filename}'? (y/n): ").lower()
+        listed = ', '.join(f"'{filename}'" for filename in filenames)
+        confirm = input(f"Apakah Anda yakin ingin menghapus file {listed}? (y/n): ").lower()
         if confirm != 'y':
             print("Penghapusan dibatalkan.")
             return
             
-        print(f"Menghapus file {filename}...")
-        request = f"DELETE {filename}"
-        response = self.transmit_request(request)
+        print(f"Menghapus {len(filenames)} file...")
+        responses = self.delete_files(filenames)
         
-        if not response:
-            print("Tidak dapat menghapus file.")
-            return
-            
-        if response.get('status') == 'OK':
-            print(f"File '{filename}' berhasil dihapus dari server.")
-        else:
-            print(f"Gagal menghapus file: {response.get('data', 'Unknown error')}")
+        for filename, response in zip(filenames, responses):
+            if not response:
+                print(f"Tidak dapat menghapus file '{filename}'.")
+            elif response.get('status') == 'OK':
+                print(f"File '{filename}' berhasil dihapus dari server.")
+            else:
+                print(f"Gagal menghapus file '{filename}': {response.get('data', 'Unknown error')}")
     
+    def batch_unsupported(self, response):
+        """Cek apakah server lama menolak command batch sehingga perlu request per file"""
+        return bool(response) and response.get('status') == 'ERROR' and response.get('data') == 'request tidak dikenali'
+
+    def batch_results(self, batch, response):
+        """Status per file dari respons batch; respons gagal berlaku untuk semua file batch"""
+        if response and response.get('status') == 'OK':
+            return response['data']['files']
+        error = response.get('data', 'Unknown error') if response else 'Tidak ada respons dari server'
+        return [dict(name=name, status='ERROR', data=error) for name in batch]
+
+    def delete_files(self, filenames):
+        """
+        Menghapus beberapa file di server dengan MDELETE, BATCH_MAX_FILES file
+        per request. Server lama tanpa MDELETE dilayani dengan DELETE per file.
+        Mengembalikan list respons per file (None jika tidak ada respons).
+        """
+        results = []
+        for start in range(0, len(filenames), BATCH_MAX_FILES):
+            batch = filenames[start:start + BATCH_MAX_FILES]
+            response = self.send_command("MDELETE", batch)
+            if self.batch_unsupported(response):
+                results.extend(self.send_commands([("DELETE", [filename]) for filename in batch]))
+            else:
+                results.extend(self.batch_results(batch, response))
+        return results
+
+    def download_files(self, entries, directory='files'):
+        """
+        Mengunduh beberapa file dengan MGET, satu request per batch.
+        - entries: list (nama, ukuran) untuk pembagian batch
+        Dengan protokol v2 isi semua file datang berurutan dalam satu payload.
+        Mengembalikan list status per file (name, status, data), atau None
+        jika server tidak mendukung MGET.
+        """
+        results = []
+        manifest = self.manifest(directory)
+        for batch in iter_batches(entries):
+            etags = {}
+            if self.uses_frames():
+                response, payload = self.transmit_frame(dict(command='MGET', params=batch))
+            else:
+                response, payload = self.transmit_request(shlex.join(["MGET"] + batch)), b''
+            if self.batch_unsupported(response):
+                return None
+
+            position = 0
+            for entry in self.batch_results(batch, response):
+                if entry['status'] != 'OK':
+                    results.append(entry)
+                    continue
+                if 'data_file' in entry:
+                    content = base64.b64decode(entry.pop('data_file'))
+                else:
+                    content = payload[position:position + entry['length']]
+                    position += entry['length']
+                save_path = os.path.join(directory, os.path.basename(entry['name']))
+                try:
+                    with open(save_path + '.part', 'wb') as file:
+                        file.write(content)
+                    os.replace(save_path + '.part', save_path)
+                    etags[os.path.basename(entry['name'])] = entry.get('etag')
+                except OSError as e:
+                    entry = dict(name=entry['name'], status='ERROR', data=str(e))
+                results.append(entry)
+            if etags:
+                manifest.update(etags)
+        return results
+
+    def upload_files(self, file_paths):
+        """
+        Mengunggah beberapa file lokal dengan MUPLOAD (protokol v2): isi file
+        satu batch disambung menjadi satu payload. Mengembalikan list status
+        per file (name, status, data), atau None jika server tidak mendukung MUPLOAD.
+        """
+        if not self.uses_frames():
+            return None
+        results = []
+        for batch in iter_batches([(path, os.path.getsize(path)) for path in file_paths]):
+            contents = []
+            for path in batch:
+                with open(path, 'rb') as file:
+                    contents.append(file.read())
+            params = [[os.path.basename(path), len(content)] for path, content in zip(batch, contents)]
+            response, _ = self.transmit_frame(dict(command='MUPLOAD', params=params), payload=b''.join(contents))
+            if self.batch_unsupported(response):
+                return None
+            results.extend(self.batch_results([name for name, _ in params], response))
+        return results
+
+    def remote_files(self, prefix=''):
+        """Seluruh file di server (yang namanya diawali prefix) sebagai dict nama -> entri LIST, None jika gagal"""
+        files = {}
+        options = [f"limit={SYNC_LIST_PAGE_SIZE}"] + ([f"prefix={prefix}"] if prefix else [])
+        params = options
+        while True:
+            response = self.send_command("LIST", params)
+            if not response or response.get('status') != 'OK':
+                self.notify_error(f"Gagal mendapatkan daftar file: {response.get('data', 'Unknown error') if response else 'tanpa respons'}",
+                                  always=True)
+                return None
+            data = response.get('data', [])
+            if isinstance(data, list):
+                # Server lama tanpa pagination: hanya nama file yang diketahui
+                return {name: dict(name=name) for name in data if name.startswith(prefix)}
+            for entry in data.get('files', []):
+                files[entry['name']] = entry
+            if not data.get('next_cursor'):
+                return files
+            params = options + [f"cursor={data['next_cursor']}"]
+
+    def local_files(self, directory):
+        """File di directory sebagai dict nama -> path, tanpa file tersembunyi dan file sementara unduhan"""
+        files = {}
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.name.startswith('.') or entry.name.endswith(LOCAL_TEMP_SUFFIXES) or not entry.is_file():
+                    continue
+                files[entry.name] = entry.path
+        return files
+
+    def same_content(self, path, entry):
+        """Cek apakah file lokal path sama isinya dengan entri LIST di server"""
+        if path is None or entry is None or not entry.get('checksum') or os.path.getsize(path) != entry.get('size'):
+            return False
+        # ETag (SHA-256) di manifest berlaku selama file lokal belum diubah sejak diunduh
+        if self.manifest(os.path.dirname(path)).etag(os.path.basename(path)) == entry['checksum']:
+            return True
+        return self.file_sha256(path) == entry['checksum']
+
+    def report_batch(self, results, action):
+        """Menampilkan file yang gagal diproses, mengembalikan jumlah yang berhasil"""
+        succeeded = 0
+        for result in results:
+            if result.get('status') == 'OK':
+                succeeded += 1
+            else:
+                self.notify_error(f"Gagal {action} file '{result['name']}': {result.get('data', 'Unknown error')}",
+                                  always=True)
+        return succeeded
+
+    def run_transfers(self, engine, transfers, verb):
+        """
+        Menjalankan list Transfer lewat TransferEngine (paralel, dengan percobaan
+        ulang) atau satu per satu jika engine None. Mengembalikan jumlah yang berhasil.
+        """
+        if engine is not None:
+            return sum(1 for result in engine.run(transfers, verb) if result.ok)
+        return sum(1 for transfer in transfers if transfer.action())
+
+    def sync_push(self, directory, mirror=False, engine=None):
+        """
+        Menyamakan isi server dengan directory lokal: file yang baru atau
+        berubah diunggah, file kecil sekaligus per batch dengan MUPLOAD.
+        Dengan mirror=True file di server yang tidak ada di lokal dihapus.
+        engine: TransferEngine untuk mengunggah file besar secara paralel.
+        Mengembalikan dict jumlah file (changed, transferred, deleted, failed),
+        None jika daftar file server tidak bisa diambil.
+        """
+        remote = self.remote_files()
+        if remote is None:
+            return None
+        local = self.local_files(directory)
+        changed = [path for name, path in sorted(local.items()) if not self.same_content(path, remote.get(name))]
+        self.notify(f"{len(changed)} dari {len(local)} file perlu diunggah.")
+
+        # File besar tetap lewat upload biasa agar dapat memakai UPLOADHASH, delta dan kompresi
+        small = [path for path in changed if os.path.getsize(path) < DELTA_MIN_SIZE]
+        large = [path for path in changed if os.path.getsize(path) >= DELTA_MIN_SIZE]
+        results = self.upload_files(small)
+        if results is None:
+            large = changed
+            results = []
+        uploaded = self.report_batch(results, 'mengunggah')
+        uploaded += self.run_transfers(engine, [Transfer(os.path.basename(path), os.path.getsize(path),
+                                                         lambda path=path: self.upload_path(path))
+                                                for path in large], 'diunggah')
+
+        deleted = failed_deletes = 0
+        if mirror:
+            extra = sorted(set(remote) - set(local))
+            if extra:
+                responses = self.delete_files(extra)
+                no_response = dict(status='ERROR', data='Tidak ada respons dari server')
+                deleted = self.report_batch([dict(response or no_response, name=name)
+                                             for name, response in zip(extra, responses)], 'menghapus')
+                failed_deletes = len(extra) - deleted
+        self.notify(f"Sinkronisasi selesai: {uploaded} dari {len(changed)} file diunggah, {deleted} file dihapus dari server.")
+        return dict(changed=len(changed), transferred=uploaded, deleted=deleted,
+                    failed=len(changed) - uploaded + failed_deletes)
+
+    def sync_pull(self, directory, mirror=False, engine=None):
+        """
+        Menyamakan isi directory lokal dengan server: file yang baru atau
+        berubah diunduh, file kecil sekaligus per batch dengan MGET.
+        Dengan mirror=True file lokal yang tidak ada di server dihapus.
+        engine dan nilai kembali seperti sync_push.
+        """
+        remote = self.remote_files()
+        if remote is None:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        local = self.local_files(directory)
+        changed = [entry for name, entry in sorted(remote.items()) if not self.same_content(local.get(name), entry)]
+        self.notify(f"{len(changed)} dari {len(remote)} file perlu diunduh.")
+
+        # Pada protokol v2 file besar diunduh per rentang secara paralel (dan delta jika ada salinan lama)
+        def batched(entry):
+            return 'size' in entry and (entry['size'] < DELTA_MIN_SIZE or not self.uses_frames())
+        small = [entry for entry in changed if batched(entry)]
+        large = [entry for entry in changed if not batched(entry)]
+        results = self.download_files([(entry['name'], entry['size']) for entry in small], directory)
+        if results is None:
+            large = changed
+            results = []
+        downloaded = self.report_batch(results, 'mengunduh')
+        downloaded += self.run_transfers(engine, [Transfer(entry['name'], entry.get('size', 0),
+                                                           lambda name=entry['name']: self.fetch_file(name, directory))
+                                                  for entry in large], 'diunduh')
+
+        deleted = 0
+        if mirror:
+            for name in sorted(set(local) - set(remote)):
+                os.remove(local[name])
+                deleted += 1
+            if deleted:
+                self.manifest(directory).update({name: None for name in set(local) - set(remote)})
+        self.notify(f"Sinkronisasi selesai: {downloaded} dari {len(changed)} file diunduh, {deleted} file lokal dihapus.")
+        return dict(changed=len(changed), transferred=downloaded, deleted=deleted, failed=len(changed) - downloaded)
+
+    def sync_directory(self):
+        """Sinkronisasi satu direktori lokal dengan isi server"""
+        directory = input("\nMasukkan path direktori lokal: ").strip()
+        if not directory:
+            print("Path direktori tidak boleh kosong.")
+            return
+
+        print("1. Unggah: direktori lokal -> server")
+        print("2. Unduh: server -> direktori lokal")
+        direction = input("Arah sinkronisasi (1/2): ").strip()
+        if direction not in ('1', '2'):
+            print("Pilihan tidak valid.")
+            return
+        if direction == '1' and not os.path.isdir(directory):
+            print(f"Direktori {directory} tidak ditemukan.")
+            return
+        mirror = input("Hapus file yang tidak ada di sumber? (y/n): ").lower() == 'y'
+
+        try:
+            if direction == '1':
+                self.sync_push(directory, mirror)
+            else:
+                self.sync_pull(directory, mirror)
+        except OSError as e:
+            logging.error(f"Error sinkronisasi direktori: {e}")
+            print(f"Terjadi kesalahan saat sinkronisasi: {e}")
+
     def show_main_menu(self):
         """Menampilkan menu utama aplikasi"""
+        self.ensure_dirs_exist()
         print("\n===== File Client Application =====")
         print(f"Server: {self.server_address[0]}:{self.server_address[1]}")
+        if self.replicas:
+            print(f"Replica: {', '.join(f'{host}:{port}' for host, port in self.replicas)}")
         
         while True:
             print("\nMenu:")
@@ -219,9 +1512,11 @@ class FileClientApplication:
             print("2. Unduh file dari server")
             print("3. Unggah file ke server")
             print("4. Hapus file di server")
-            print("5. Keluar aplikasi")
+            print("5. Sinkronisasi direktori lokal")
+            print("6. Pantau perubahan file di server")
+            print("7. Keluar aplikasi")
             
-            choice = input("\nPilihan Anda (1-5): ")
+            choice = input("\nPilihan Anda (1-7): ")
             
             if choice == '1':
                 self.display_files()
@@ -232,19 +1527,244 @@ class FileClientApplication:
             elif choice == '4':
                 self.delete_file()
             elif choice == '5':
+                self.sync_directory()
+            elif choice == '6':
+                self.watch_files()
+            elif choice == '7':
                 print("\nTerima kasih telah menggunakan aplikasi. Sampai jumpa!")
+                self.close()
                 break
             else:
-                print("Pilihan tidak valid. Silakan pilih 1-5.")
+                print("Pilihan tidak valid. Silakan pilih 1-7.")
 
 
-if __name__ == '__main__':
+def glob_prefix(patterns):
+    """Awalan literal yang sama untuk semua pola glob, untuk membatasi LIST di server"""
+    return os.path.commonprefix([re.split(r'[*?\[]', pattern, maxsplit=1)[0] for pattern in patterns])
+
+
+def match_remote(app, patterns):
+    """
+    File di server yang cocok dengan pola glob (fnmatch, peka huruf besar/kecil).
+    Mengembalikan (list entri LIST urut nama, pola yang tidak cocok dengan file apa pun);
+    list entri None jika daftar file tidak bisa diambil.
+    """
+    remote = app.remote_files(glob_prefix(patterns))
+    if remote is None:
+        return None, patterns
+    matched, unmatched = set(), []
+    for pattern in patterns:
+        names = [name for name in remote if fnmatch.fnmatchcase(name, pattern)]
+        if not names:
+            unmatched.append(pattern)
+        matched.update(names)
+    return [remote[name] for name in sorted(matched)], unmatched
+
+
+def expand_local(app, paths):
+    """
+    Path lokal (file, direktori atau pola glob) menjadi list file yang akan
+    diunggah; isi direktori diambil satu tingkat seperti sinkronisasi.
+    Mengembalikan (list path file, path yang tidak cocok dengan file apa pun).
+    """
+    files, seen, unmatched = [], set(), []
+    for path in paths:
+        candidates = sorted(glob.glob(path)) if glob.has_magic(path) else [path]
+        found = []
+        for candidate in candidates:
+            if os.path.isdir(candidate):
+                found.extend(sorted(app.local_files(candidate).values()))
+            elif os.path.isfile(candidate):
+                found.append(candidate)
+        if not found:
+            unmatched.append(path)
+        for file_path in found:
+            if os.path.abspath(file_path) not in seen:
+                seen.add(os.path.abspath(file_path))
+                files.append(file_path)
+    return files, unmatched
+
+
+def report_unmatched(unmatched):
+    for pattern in unmatched:
+        print(f"Tidak ada file yang cocok dengan '{pattern}'", file=sys.stderr)
+
+
+def exit_status(results, unmatched):
+    return EXIT_FAILED if unmatched or any(not result.ok for result in results) else EXIT_OK
+
+
+def command_ls(app, engine, args):
+    entries, unmatched = match_remote(app, args.patterns or ['*'])
+    if entries is None:
+        return EXIT_UNAVAILABLE
+    if not args.patterns:
+        unmatched = []
+    for entry in entries:
+        if args.long:
+            mtime = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['mtime'])) if 'mtime' in entry else '-'
+            print(f"{entry.get('size', '-'):>12}  {mtime}  {entry['name']}")
+        else:
+            print(entry['name'])
+    report_unmatched(unmatched)
+    if unmatched:
+        return EXIT_FAILED if entries else EXIT_NO_MATCH
+    return EXIT_OK
+
+
+def command_get(app, engine, args):
+    entries, unmatched = match_remote(app, args.patterns)
+    if entries is None:
+        return EXIT_UNAVAILABLE
+    report_unmatched(unmatched)
+    if not entries:
+        return EXIT_NO_MATCH
+    os.makedirs(args.output, exist_ok=True)
+    results = engine.run([Transfer(entry['name'], entry.get('size', 0),
+                                   lambda name=entry['name']: app.fetch_file(name, args.output))
+                          for entry in entries], 'diunduh')
+    return exit_status(results, unmatched)
+
+
+def command_put(app, engine, args):
+    file_paths, unmatched = expand_local(app, args.paths)
+    report_unmatched(unmatched)
+    if not file_paths:
+        return EXIT_NO_MATCH
+    results = engine.run([Transfer(os.path.basename(path), os.path.getsize(path),
+                                   lambda path=path: app.upload_path(path))
+                          for path in file_paths], 'diunggah')
+    return exit_status(results, unmatched)
+
+
+def command_rm(app, engine, args):
+    entries, unmatched = match_remote(app, args.patterns)
+    if entries is None:
+        return EXIT_UNAVAILABLE
+    report_unmatched(unmatched)
+    if not entries:
+        return EXIT_NO_MATCH
+    names = [entry['name'] for entry in entries]
+    failed = 0
+    for name, response in zip(names, app.delete_files(names)):
+        if response and response.get('status') == 'OK':
+            engine.report(f"{name} dihapus")
+        else:
+            failed += 1
+            error = response.get('data', 'Unknown error') if response else 'Tidak ada respons dari server'
+            engine.report(f"GAGAL {name}: {error}", always=True)
+    engine.report(f"Selesai: {len(names) - failed} file dihapus, {failed} gagal")
+    return EXIT_FAILED if failed or unmatched else EXIT_OK
+
+
+def command_sync(app, engine, args):
+    if args.push and not os.path.isdir(args.directory):
+        print(f"Direktori {args.directory} tidak ditemukan", file=sys.stderr)
+        return EXIT_NO_MATCH
+    if args.push:
+        summary, verb = app.sync_push(args.directory, args.mirror, engine), 'diunggah'
+    else:
+        summary, verb = app.sync_pull(args.directory, args.mirror, engine), 'diunduh'
+    if summary is None:
+        return EXIT_UNAVAILABLE
+    if app.quiet:
+        engine.report(f"Sinkronisasi selesai: {summary['transferred']} dari {summary['changed']} file {verb}, "
+                      f"{summary['deleted']} file dihapus")
+    return EXIT_FAILED if summary['failed'] else EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description='Client file server non-interaktif. Tanpa subcommand: '
+                    'python file_client_cli.py [HOST PORT [HOST:PORT...]] membuka menu interaktif.')
+    parser.add_argument('--server', default=f'{SERVER_HOST}:{SERVER_PORT}', metavar='HOST:PORT',
+                        help=f'server primary (default {SERVER_HOST}:{SERVER_PORT})')
+    parser.add_argument('--replica', action='append', default=[], metavar='HOST:PORT',
+                        help='replica untuk request baca, boleh diulang')
+    parser.add_argument('-j', '--jobs', type=int, default=TRANSFER_WORKERS,
+                        help=f'jumlah file yang ditransfer bersamaan (default {TRANSFER_WORKERS})')
+    parser.add_argument('--retries', type=int, default=TRANSFER_RETRIES,
+                        help=f'percobaan ulang per file yang gagal (default {TRANSFER_RETRIES})')
+    parser.add_argument('--protocol', type=int, choices=[1, PROTOCOL_VERSION],
+                        help='versi protokol (default dinegosiasikan dengan HELLO)')
+    parser.add_argument('--no-compress', action='store_true', help='transfer tanpa kompresi')
+    parser.add_argument('-q', '--quiet', action='store_true', help='hanya tampilkan file yang gagal')
+    parser.add_argument('-v', '--verbose', action='store_true', help='tampilkan log dan pesan proses transfer')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ls = commands.add_parser('ls', help='daftar file di server')
+    ls.add_argument('patterns', nargs='*', metavar='PATTERN', help='pola glob nama file (default semua)')
+    ls.add_argument('-l', '--long', action='store_true', help='tampilkan ukuran dan waktu modifikasi')
+    ls.set_defaults(handler=command_ls)
+
+    get = commands.add_parser('get', help='unduh file yang cocok dengan pola')
+    get.add_argument('patterns', nargs='+', metavar='PATTERN')
+    get.add_argument('-o', '--output', default='.', metavar='DIR', help='direktori tujuan (default .)')
+    get.set_defaults(handler=command_get)
+
+    put = commands.add_parser('put', help='unggah file, direktori atau pola glob lokal')
+    put.add_argument('paths', nargs='+', metavar='PATH')
+    put.set_defaults(handler=command_put)
+
+    rm = commands.add_parser('rm', help='hapus file yang cocok dengan pola di server')
+    rm.add_argument('patterns', nargs='+', metavar='PATTERN')
+    rm.set_defaults(handler=command_rm)
+
+    sync = commands.add_parser('sync', help='sinkronisasi direktori lokal dengan server')
+    sync.add_argument('directory', metavar='DIR')
+    direction = sync.add_mutually_exclusive_group(required=True)
+    direction.add_argument('--push', action='store_true', help='direktori lokal -> server')
+    direction.add_argument('--pull', action='store_true', help='server -> direktori lokal')
+    sync.add_argument('--mirror', action='store_true', help='hapus file yang tidak ada di sumber')
+    sync.set_defaults(handler=command_sync)
+    return parser
+
+
+def run_command(argv):
+    """Client non-interaktif: python file_client_cli.py [opsi] ls|get|put|rm|sync ..."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.jobs < 1 or args.retries < 0:
+        parser.error('--jobs minimal 1 dan --retries tidak boleh negatif')
+    try:
+        host, port = parse_address(args.server, SERVER_HOST)
+        replicas = [parse_address(value, host) for value in args.replica]
+    except ValueError as e:
+        parser.error(f'alamat server tidak valid: {e}')
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.ERROR if args.quiet else logging.WARNING)
+    app = FileClientApplication(host, port, protocol_version=args.protocol,
+                                compression=None if args.no_compress else DEFAULT_COMPRESSION, replicas=replicas)
+    # Pesan per file dari FileClientApplication diganti laporan TransferEngine di stderr
+    app.quiet = not args.verbose
+    app.pool.max_idle = max(MAX_IDLE_CONNECTIONS, args.jobs)
+    engine = TransferEngine(args.jobs, args.retries, reason=app.last_error, quiet=args.quiet)
+    try:
+        # Versi protokol dan codec disepakati sekali sebelum transfer paralel dimulai
+        app.negotiate_protocol()
+        if app.protocol_version is not None:
+            app.transfer_codec()
+        if app.protocol_version is None or (app.compression and app.server_codecs is None):
+            print(f"Server {host}:{port} tidak bisa dihubungi", file=sys.stderr)
+            return EXIT_UNAVAILABLE
+        return args.handler(app, engine, args)
+    except KeyboardInterrupt:
+        print("\nDihentikan oleh pengguna.", file=sys.stderr)
+        return EXIT_INTERRUPTED
+    finally:
+        app.close()
+
+
+def run_interactive(argv):
+    """Menu interaktif: python file_client_cli.py [HOST PORT [HOST:PORT...]]"""
     # Jika ada argumen command line, gunakan sebagai alamat server
-    if len(sys.argv) > 2:
+    # Argumen berikutnya (HOST:PORT) adalah replica untuk request baca
+    if len(argv) > 1:
         try:
-            host = sys.argv[1]
-            port = int(sys.argv[2])
-            client_app = FileClientApplication(host, port)
+            host = argv[0]
+            port = int(argv[1])
+            client_app = FileClientApplication(host, port, replicas=[parse_address(value, host)
+                                                                    for value in argv[2:]])
         except ValueError:
             print("Format port tidak valid. Menggunakan pengaturan default.")
             client_app = FileClientApplication()
@@ -257,4 +1777,16 @@ if __name__ == '__main__':
         print("\nProgram dihentikan oleh pengguna.")
     except Exception as e:
         logging.error(f"Error tidak terduga: {e}")
-        print(f"Terjadi kesalahan: {e}")
\ No newline at end of file
+    return EXIT_OK
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    # Argumen pertama berupa subcommand atau opsi berarti mode non-interaktif
+    if argv and (argv[0] in CLI_COMMANDS or argv[0].startswith('-')):
+        return run_command(argv)
+    return run_interactive(argv)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,206 @@
+import os
+import bz2
+import lzma
+import zlib
+
+"""
+* file_compress berisi kompresi isi file saat dikirim (upload maupun
+  download) dengan codec dari standard library: zlib, bz2 dan lzma
+* kompresi dan dekompresi berjalan per potongan (streaming), sehingga
+  isi file tidak pernah perlu dimuat seluruhnya ke memori
+* kompresi dilewati untuk file yang sudah terkompresi (dilihat dari
+  ekstensinya) atau jika sampel awal file menunjukkan rasio yang buruk
+"""
+
+COMPRESS_CHUNK_SIZE = 256 * 1024
+DEFAULT_COMPRESS_LEVEL = 6
+# Urutan preferensi codec, dari yang tercepat
+CODECS = ('zlib', 'bz2', 'lzma')
+# File lebih kecil dari ini tidak sebanding dengan ongkos kompresinya
+MIN_COMPRESS_SIZE = 4 * 1024
+# Ukuran sampel dan rasio (ukuran terkompresi / asli) maksimum agar kompresi dipakai
+SAMPLE_SIZE = 64 * 1024
+MAX_SAMPLE_RATIO = 0.9
+COMPRESSED_EXTENSIONS = {
+    '.gz', '.tgz', '.bz2', '.tbz2', '.xz', '.txz', '.lzma', '.zst', '.lz4', '.z', '.zip', '.7z', '.rar',
+    '.jar', '.apk', '.whl', '.docx', '.xlsx', '.pptx', '.odt', '.epub',
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.avif',
+    '.mp3', '.aac', '.ogg', '.opus', '.flac', '.m4a', '.mp4', '.m4v', '.mkv', '.webm', '.mov', '.avi',
+    '.pdf',
+}
+
+
+class CompressionError(Exception):
+    """Codec tidak dikenal atau data terkompresi rusak/terpotong"""
+    pass
+
+
+def check_codec(codec):
+    if codec not in CODECS:
+        raise CompressionError(f'Codec {codec} tidak didukung')
+    return codec
+
+
+def compressor(codec, level=DEFAULT_COMPRESS_LEVEL):
+    check_codec(codec)
+    level = max(1, min(int(level), 9))
+    if codec == 'zlib':
+        return zlib.compressobj(level)
+    if codec == 'bz2':
+        return bz2.BZ2Compressor(level)
+    return lzma.LZMACompressor(preset=level)
+
+
+def decompressor(codec):
+    check_codec(codec)
+    if codec == 'zlib':
+        return zlib.decompressobj()
+    if codec == 'bz2':
+        return bz2.BZ2Decompressor()
+    return lzma.LZMADecompressor()
+
+
+def select_codec(accepted, supported=CODECS):
+    """Codec pertama dari daftar yang diterima pihak lain yang juga didukung di sini"""
+    if isinstance(accepted, str):
+        accepted = accepted.split(',')
+    for codec in accepted or ():
+        if codec in supported:
+            return codec
+    return None
+
+
+def worth_compressing(filename, sample, size, codec, level=DEFAULT_COMPRESS_LEVEL):
+    """
+    Cek apakah kompresi layak dipakai: file cukup besar, bukan format yang
+    sudah terkompresi, dan sampel awalnya mengecil cukup banyak
+    """
+    if size < MIN_COMPRESS_SIZE:
+        return False
+    if os.path.splitext(filename)[1].lower() in COMPRESSED_EXTENSIONS:
+        return False
+    if not sample:
+        return False
+    # Sampel dikompresi dengan zlib level rendah: cepat dan cukup mewakili codec lain
+    compressed = zlib.compress(sample, 1)
+    return len(compressed) <= len(sample) * MAX_SAMPLE_RATIO
+
+
+def read_sample(fileobj, offset=0):
+    """Sampel awal isi file (mulai offset), posisi baca file dikembalikan"""
+    position = fileobj.tell()
+    fileobj.seek(offset)
+    sample = fileobj.read(SAMPLE_SIZE)
+    fileobj.seek(position)
+    return sample
+
+
+def iter_compress(chunks, codec, level=DEFAULT_COMPRESS_LEVEL):
+    """Mengompresi iterable potongan bytes, menghasilkan potongan terkompresi"""
+    engine = compressor(codec, level)
+    for chunk in chunks:
+        data = engine.compress(chunk)
+        if data:
+            yield data
+    yield engine.flush()
+
+
+def decompress_chunk(engine, chunk, max_length=COMPRESS_CHUNK_SIZE):
+    """
+    Hasil dekompresi satu potongan input, dipecah per paling banyak max_length
+    byte agar input dengan rasio ekstrem tidak dimuat seluruhnya ke memori
+    """
+    if hasattr(engine, 'unconsumed_tail'):
+        # zlib: input yang belum terpakai dikembalikan di unconsumed_tail
+        data = engine.decompress(chunk, max_length)
+        while data:
+            yield data
+            if not engine.unconsumed_tail:
+                return
+            data = engine.decompress(engine.unconsumed_tail, max_length)
+        return
+    # bz2/lzma: input disimpan di engine sampai needs_input
+    data = engine.decompress(chunk, max_length)
+    while True:
+        if data:
+            yield data
+        if engine.eof or engine.needs_input:
+            return
+        data = engine.decompress(b'', max_length)
+
+
+def iter_decompress(chunks, codec, limit=0):
+    """
+    Mendekompresi iterable potongan bytes, CompressionError jika stream
+    terpotong/rusak atau hasilnya melebihi limit byte (0 = tanpa batas)
+    """
+    engine = decompressor(codec)
+    produced = 0
+    try:
+        for chunk in chunks:
+            for data in decompress_chunk(engine, chunk):
+                produced += len(data)
+                if limit and produced > limit:
+                    raise CompressionError(f'Hasil dekompresi melebihi batas {limit} bytes')
+                yield data
+        if hasattr(engine, 'unconsumed_tail'):
+            data = engine.flush()
+            produced += len(data)
+            if limit and produced > limit:
+                raise CompressionError(f'Hasil dekompresi melebihi batas {limit} bytes')
+            if data:
+                yield data
+    except (zlib.error, OSError, lzma.LZMAError, EOFError) as e:
+        raise CompressionError(f'Data terkompresi rusak: {str(e)}')
+    if not engine.eof:
+        raise CompressionError('Data terkompresi terpotong')
+
+
+def iter_file(fileobj, offset=0, length=None, chunk_size=COMPRESS_CHUNK_SIZE):
+    """Potongan isi file mulai offset sepanjang length (None = sampai akhir)"""
+    fileobj.seek(offset)
+    while length is None or length > 0:
+        chunk = fileobj.read(chunk_size if length is None else min(chunk_size, length))
+        if not chunk:
+            break
+        if length is not None:
+            length -= len(chunk)
+        yield chunk
+
+
+def compress_file(fileobj, out, codec, level=DEFAULT_COMPRESS_LEVEL, offset=0, length=None):
+    """Menulis isi file (rentang offset/length) terkompresi ke out, mengembalikan panjangnya"""
+    written = 0
+    for data in iter_compress(iter_file(fileobj, offset, length), codec, level):
+        out.write(data)
+        written += len(data)
+    return written
+
+
+class DecompressingWriter:
+    """
+    Objek mirip file untuk menerima payload terkompresi: write() menulis
+    hasil dekompresi ke file tujuan. seek() ke posisi baru memulai ulang
+    dekompresi (dipakai saat request diulang dari awal).
+    """
+    def __init__(self, fileobj, codec):
+        self.fileobj = fileobj
+        self.codec = codec
+        self.engine = decompressor(codec)
+
+    def write(self, data):
+        try:
+            self.fileobj.write(self.engine.decompress(data))
+        except (zlib.error, OSError, lzma.LZMAError, EOFError) as e:
+            raise CompressionError(f'Data terkompresi rusak: {str(e)}')
+
+    def tell(self):
+        return self.fileobj.tell()
+
+    def seek(self, position):
+        self.engine = decompressor(self.codec)
+        return self.fileobj.seek(position)
+
+    def finish(self):
+        if not self.engine.eof:
+            raise CompressionError('Data terkompresi terpotong')
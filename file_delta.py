@@ -0,0 +1,262 @@
+import zlib
+import mmap
+import json
+import struct
+import hashlib
+
+"""
+* file_delta berisi sinkronisasi delta per blok ala rsync
+  - signature: checksum lemah (Adler-32, bisa digeser per byte) dan
+    checksum kuat (BLAKE2b) untuk setiap blok berukuran tetap dari salinan
+    file yang sudah dimiliki satu pihak (basis)
+  - delta: hasil mencocokkan file baru dengan signature basis, berupa
+    instruksi salin blok dari basis dan data literal untuk bagian yang berubah
+  - apply: membangun ulang file baru dari basis dan delta
+* format delta berupa rangkaian record biner:
+  - b'C' + uint32 indeks blok awal + uint32 jumlah blok : salin blok dari basis
+  - b'D' + uint32 panjang + data                       : data literal
+"""
+
+DELTA_MIN_BLOCK_SIZE = 64 * 1024
+# Batas jumlah blok agar signature file sangat besar tetap kecil
+DELTA_MAX_BLOCKS = 64 * 1024
+DELTA_CHUNK_SIZE = 1024 * 1024
+# Delta dibatalkan jika data literal melebihi bagian ini dari ukuran file
+DELTA_MAX_LITERAL_FRACTION = 0.25
+ADLER_MOD = 65521
+COPY_RECORD = struct.Struct('!cII')
+DATA_RECORD = struct.Struct('!cI')
+
+
+class DeltaError(Exception):
+    """Delta tidak valid atau tidak cocok dengan basis"""
+    pass
+
+
+def block_size_for(size):
+    """Ukuran blok: minimal DELTA_MIN_BLOCK_SIZE, membesar agar jumlah blok tetap terbatas"""
+    block_size = DELTA_MIN_BLOCK_SIZE
+    while size > block_size * DELTA_MAX_BLOCKS:
+        block_size *= 2
+    return block_size
+
+
+def strong_checksum(block):
+    return hashlib.blake2b(block, digest_size=16).hexdigest()
+
+
+def file_signature(fileobj, block_size=None):
+    """
+    Signature file basis yang sudah dibuka (mode rb):
+    dict(block_size, size, blocks=[[adler32, blake2b], ...])
+    """
+    fileobj.seek(0, 2)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    block_size = block_size or block_size_for(size)
+    blocks = []
+    while True:
+        block = fileobj.read(block_size)
+        if not block:
+            break
+        blocks.append([zlib.adler32(block), strong_checksum(block)])
+    return dict(block_size=block_size, size=size, blocks=blocks)
+
+
+def encode_signature(signature):
+    return json.dumps(signature, separators=(',', ':')).encode()
+
+
+def decode_signature(data):
+    try:
+        signature = json.loads(data)
+        block_size = int(signature['block_size'])
+        blocks = signature['blocks']
+        if block_size <= 0 or not isinstance(blocks, list):
+            raise ValueError()
+        return signature
+    except (ValueError, KeyError, TypeError):
+        raise DeltaError('Signature tidak valid')
+
+
+class DeltaWriter:
+    """Menulis record delta, instruksi salin blok yang berurutan digabung"""
+    def __init__(self, out):
+        self.out = out
+        self.copy_start = None
+        self.copy_count = 0
+        self.literal_bytes = 0
+        self.copied_blocks = 0
+
+    def copy(self, index):
+        if self.copy_start is not None and self.copy_start + self.copy_count == index:
+            self.copy_count += 1
+            return
+        self.flush()
+        self.copy_start, self.copy_count = index, 1
+
+    def literal(self, data, start, end):
+        """Data literal data[start:end], ditulis per potongan tanpa menyalin seluruhnya"""
+        if start >= end:
+            return
+        self.flush()
+        for offset in range(start, end, DELTA_CHUNK_SIZE):
+            stop = min(offset + DELTA_CHUNK_SIZE, end)
+            self.out.write(DATA_RECORD.pack(b'D', stop - offset))
+            self.out.write(data[offset:stop])
+        self.literal_bytes += end - start
+
+    def flush(self):
+        if self.copy_start is not None:
+            self.out.write(COPY_RECORD.pack(b'C', self.copy_start, self.copy_count))
+            self.copied_blocks += self.copy_count
+            self.copy_start = None
+
+
+def generate_delta(signature, fileobj, out, max_literal=None):
+    """
+    Menulis delta dari file baru (fileobj, mode rb) terhadap signature basis
+    ke out. Blok yang sejajar dicek dengan zlib.adler32; hanya di bagian yang
+    berubah checksum lemah digeser per byte untuk mencari blok basis berikutnya.
+    Dengan max_literal, DeltaError dilempar begitu data literal melebihinya
+    (mengirim file utuh lebih murah daripada delta).
+    Mengembalikan dict size, sha256 file baru, literal_bytes dan copied_blocks.
+    """
+    block_size = signature['block_size']
+    blocks = signature['blocks']
+    basis_size = signature.get('size', len(blocks) * block_size)
+    full_blocks = basis_size // block_size
+    table = {}
+    for index, (weak, strong) in enumerate(blocks[:full_blocks]):
+        table.setdefault(weak, {}).setdefault(strong, index)
+    tail = None
+    if len(blocks) > full_blocks:
+        # Blok terakhir basis yang lebih pendek hanya bisa cocok di akhir file baru
+        tail = (full_blocks, basis_size - full_blocks * block_size, blocks[full_blocks][1])
+
+    writer = DeltaWriter(out)
+    fileobj.seek(0, 2)
+    size = fileobj.tell()
+    if size == 0:
+        writer.flush()
+        return dict(size=0, sha256=hashlib.sha256().hexdigest(), literal_bytes=0, copied_blocks=0)
+
+    def lookup(a, b, position):
+        candidates = table.get(b << 16 | a)
+        if candidates:
+            return candidates.get(strong_checksum(data[position:position + block_size]))
+        return None
+
+    with mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        view = memoryview(data)
+        position = 0
+        literal_start = 0
+        try:
+            while position + block_size <= size:
+                weak = zlib.adler32(view[position:position + block_size])
+                a, b = weak & 0xffff, weak >> 16
+                index = lookup(a, b, position)
+                if index is None:
+                    # Geser jendela per byte sampai menemukan blok basis; Adler-32
+                    # diperbarui dari nilai sebelumnya tanpa menghitung ulang blok
+                    last = size - block_size
+                    if max_literal is not None:
+                        last = min(last, literal_start + max_literal - writer.literal_bytes)
+                    for removed, added in zip(view[position:last], view[position + block_size:last + block_size]):
+                        a = (a - removed + added) % ADLER_MOD
+                        b = (b - block_size * removed + a - 1) % ADLER_MOD
+                        position += 1
+                        if (b << 16 | a) in table:
+                            index = lookup(a, b, position)
+                            if index is not None:
+                                break
+                if index is None:
+                    if position < size - block_size:
+                        raise DeltaError('Perubahan terlalu banyak untuk sinkronisasi delta')
+                    break
+                writer.literal(data, literal_start, position)
+                writer.copy(index)
+                position += block_size
+                literal_start = position
+        finally:
+            view.release()
+
+        end = size
+        if tail is not None and size - tail[1] >= literal_start:
+            tail_start = size - tail[1]
+            if strong_checksum(data[tail_start:size]) == tail[2]:
+                end = tail_start
+        writer.literal(data, literal_start, end)
+        if end < size:
+            writer.copy(tail[0])
+        writer.flush()
+        sha256 = hashlib.sha256(data).hexdigest()
+
+    return dict(size=size, sha256=sha256, literal_bytes=writer.literal_bytes, copied_blocks=writer.copied_blocks)
+
+
+class ChunkReader:
+    """Membaca tepat n byte dari iterable potongan bytes (payload/stream)"""
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = bytearray()
+
+    def read(self, n):
+        """Maksimum n byte, b'' jika stream habis"""
+        while not self.buffer:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                return b''
+            self.buffer.extend(chunk)
+        data = bytes(self.buffer[:n])
+        del self.buffer[:n]
+        return data
+
+    def read_exact(self, n):
+        parts = []
+        while n > 0:
+            data = self.read(n)
+            if not data:
+                raise DeltaError('Delta terpotong')
+            parts.append(data)
+            n -= len(data)
+        return b''.join(parts)
+
+
+def apply_delta(basis, chunks, out, block_size):
+    """
+    Membangun file baru ke out dari basis (file rb) dan delta (iterable
+    potongan bytes). Mengembalikan (size, sha256) file yang dihasilkan.
+    """
+    reader = ChunkReader(chunks)
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        op = reader.read(1)
+        if not op:
+            break
+        if op == b'C':
+            _, index, count = COPY_RECORD.unpack(op + reader.read_exact(COPY_RECORD.size - 1))
+            basis.seek(index * block_size)
+            remaining = count * block_size
+            while remaining > 0:
+                block = basis.read(min(remaining, DELTA_CHUNK_SIZE))
+                if not block:
+                    break
+                out.write(block)
+                digest.update(block)
+                size += len(block)
+                remaining -= len(block)
+        elif op == b'D':
+            _, length = DATA_RECORD.unpack(op + reader.read_exact(DATA_RECORD.size - 1))
+            while length > 0:
+                data = reader.read(min(length, DELTA_CHUNK_SIZE))
+                if not data:
+                    raise DeltaError('Delta terpotong')
+                out.write(data)
+                digest.update(data)
+                size += len(data)
+                length -= len(data)
+        else:
+            raise DeltaError('Record delta tidak dikenali')
+    return size, digest.hexdigest()
@@ -0,0 +1,251 @@
+import os
+import json
+import mmap
+import errno
+import socket
+import struct
+import select
+import selectors
+
+"""
+* file_frame berisi format pesan protokol versi 2 (binary framing)
+* setiap frame terdiri dari:
+  - prefix tetap 16 byte: MAGIC (4 byte), panjang header (uint32),
+    panjang payload (uint64), semuanya big-endian
+  - header JSON kecil berisi command/status dan metadata
+  - payload berupa byte mentah file (tanpa base64)
+* frame dipakai untuk request maupun response
+"""
+
+MAGIC = b'FPv2'
+PROTOCOL_VERSION = 2
+PREFIX = struct.Struct('!4sIQ')
+MAX_HEADER_SIZE = 64 * 1024
+CHUNK_SIZE = 64 * 1024
+# Ukuran maksimum per panggilan os.sendfile
+SENDFILE_BLOCK = 8 * 1024 * 1024
+# Ukuran blok antar pengecekan respons awal pada pengiriman interruptible
+INTERRUPTIBLE_BLOCK = 1024 * 1024
+# errno yang menandakan sendfile tidak didukung untuk pasangan fd ini
+SENDFILE_UNSUPPORTED = (errno.EINVAL, errno.ENOSYS, errno.ENOTSOCK, errno.EOPNOTSUPP, errno.ENOTSUP)
+# Flag send() untuk header yang langsung disusul payload: kernel menahan
+# header sampai payload ikut dikirim (0 jika platform tidak mendukung)
+MSG_MORE = getattr(socket, 'MSG_MORE', 0)
+# Payload sampai ukuran ini digabung dengan header dalam satu sendall
+COALESCE_LIMIT = 64 * 1024
+
+
+class FrameError(Exception):
+    """Frame yang diterima tidak sesuai format protokol versi 2"""
+    pass
+
+
+def encode_header(header, payload_length=0):
+    """Membentuk prefix + header JSON untuk sebuah frame (tanpa payload)"""
+    header_bytes = json.dumps(header).encode()
+    if len(header_bytes) > MAX_HEADER_SIZE:
+        raise FrameError(f'Header terlalu besar ({len(header_bytes)} bytes)')
+    return PREFIX.pack(MAGIC, len(header_bytes), payload_length) + header_bytes
+
+
+def encode_frame(header, payload=b''):
+    """Membentuk frame lengkap beserta payload-nya"""
+    return encode_header(header, len(payload)) + bytes(payload)
+
+
+def is_frame_prefix(data):
+    """Cek apakah data diawali (atau bisa menjadi awal dari) MAGIC frame v2"""
+    n = min(len(data), len(MAGIC))
+    return bytes(data[:n]) == MAGIC[:n]
+
+
+def decode_prefix(prefix):
+    """Mengurai prefix 16 byte menjadi (panjang_header, panjang_payload)"""
+    magic, header_length, payload_length = PREFIX.unpack(prefix)
+    if magic != MAGIC:
+        raise FrameError('MAGIC frame tidak valid')
+    if header_length > MAX_HEADER_SIZE:
+        raise FrameError(f'Header terlalu besar ({header_length} bytes)')
+    return header_length, payload_length
+
+
+def decode_header(header_bytes):
+    """Mengurai header JSON sebuah frame"""
+    try:
+        return json.loads(header_bytes)
+    except ValueError:
+        raise FrameError('Header frame bukan JSON yang valid')
+
+
+class SocketReader:
+    """
+    Pembaca buffered di atas socket untuk frame v2.
+    Byte yang sudah terlanjur diterima (misalnya saat mendeteksi
+    versi protokol) bisa diberikan lewat parameter initial.
+    """
+    def __init__(self, sock, initial=b''):
+        self.sock = sock
+        self.buffer = bytearray(initial)
+        # Total byte yang diterima dari socket (untuk metrik)
+        self.bytes_received = 0
+
+    def fill(self):
+        """Menerima data berikutnya dari socket ke buffer, False jika koneksi ditutup"""
+        data = self.sock.recv(CHUNK_SIZE)
+        if not data:
+            return False
+        self.bytes_received += len(data)
+        self.buffer.extend(data)
+        return True
+
+    def read_exact(self, n):
+        """Membaca tepat n byte, FrameError jika koneksi terputus di tengah"""
+        while len(self.buffer) < n:
+            if not self.fill():
+                raise FrameError('Koneksi terputus sebelum data lengkap diterima')
+        data = bytes(self.buffer[:n])
+        del self.buffer[:n]
+        return data
+
+    def read_header(self):
+        """
+        Membaca prefix dan header sebuah frame.
+        Mengembalikan (header, panjang_payload), atau (None, 0) jika
+        koneksi ditutup dengan rapi sebelum frame baru dimulai.
+        """
+        if not self.buffer and not self.fill():
+            return None, 0
+        header_length, payload_length = decode_prefix(self.read_exact(PREFIX.size))
+        return decode_header(self.read_exact(header_length)), payload_length
+
+    def read_payload(self, length):
+        """Membaca seluruh payload ke memori"""
+        return self.read_exact(length)
+
+    def iter_payload(self, length):
+        """Membaca payload sepotong demi sepotong tanpa menampung semuanya"""
+        remaining = length
+        while remaining > 0:
+            if not self.buffer and not self.fill():
+                raise FrameError('Koneksi terputus sebelum payload lengkap diterima')
+            take = min(remaining, len(self.buffer))
+            chunk = bytes(self.buffer[:take])
+            del self.buffer[:take]
+            remaining -= take
+            yield chunk
+
+    def read_into_file(self, fileobj, length):
+        """Menyalin payload langsung ke file yang sudah dibuka"""
+        for chunk in self.iter_payload(length):
+            fileobj.write(chunk)
+
+
+def set_nodelay(sock):
+    """
+    Mematikan algoritma Nagle pada koneksi TCP. Respons request-response
+    kecil langsung dikirim tanpa menunggu ACK (delayed ACK peer bisa
+    menahan segmen terakhir sampai ~40 ms).
+    """
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except OSError:
+        # Bukan socket TCP (misalnya socketpair)
+        pass
+
+
+def send_header(sock, header_bytes, more):
+    """Mengirim prefix + header; more=True jika payload langsung menyusul di panggilan berikutnya"""
+    sock.sendall(header_bytes, MSG_MORE if more else 0)
+
+
+def send_frame(sock, header, payload=b''):
+    """Mengirim satu frame berisi payload di memori, mengembalikan jumlah byte terkirim"""
+    header_bytes = encode_header(header, len(payload))
+    if len(payload) <= COALESCE_LIMIT:
+        # Header dan payload kecil dalam satu segmen
+        sock.sendall(header_bytes + payload)
+    else:
+        send_header(sock, header_bytes, True)
+        sock.sendall(payload)
+    return len(header_bytes) + len(payload)
+
+
+def send_file_frame(sock, header, fileobj, length, offset=0, interruptible=False):
+    """
+    Mengirim satu frame dengan payload diambil langsung dari file.
+    Dengan interruptible=True payload dikirim per blok dan pengiriman
+    dihentikan begitu peer sudah membalas lebih awal (misalnya BUSY).
+    Mengembalikan False jika pengiriman dihentikan sebelum selesai.
+    """
+    send_header(sock, encode_header(header, length), length > 0)
+    if not length:
+        return True
+    if not interruptible:
+        send_file(sock, fileobj, offset, length)
+        return True
+
+    sent = 0
+    while sent < length:
+        readable, _, _ = select.select([sock], [], [], 0)
+        if readable:
+            return False
+        block = min(length - sent, INTERRUPTIBLE_BLOCK)
+        send_file(sock, fileobj, offset + sent, block)
+        sent += block
+    return True
+
+
+def send_file(sock, fileobj, offset, length):
+    """
+    Mengirim length byte dari file mulai offset ke socket tanpa
+    menyalinnya ke memori proses: os.sendfile langsung dari page cache,
+    atau jika tidak didukung, potongan dari mmap file.
+    """
+    if hasattr(os, 'sendfile'):
+        try:
+            _send_with_sendfile(sock, fileobj, offset, length)
+            return
+        except _SendfileUnsupported:
+            pass
+    _send_with_mmap(sock, fileobj, offset, length)
+
+
+class _SendfileUnsupported(Exception):
+    pass
+
+
+def _send_with_sendfile(sock, fileobj, offset, length):
+    in_fd = fileobj.fileno()
+    out_fd = sock.fileno()
+    timeout = sock.gettimeout()
+    sent_total = 0
+    with selectors.DefaultSelector() as selector:
+        selector.register(sock, selectors.EVENT_WRITE)
+        while sent_total < length:
+            try:
+                sent = os.sendfile(out_fd, in_fd, offset + sent_total,
+                                   min(length - sent_total, SENDFILE_BLOCK))
+            except BlockingIOError:
+                # Socket dengan timeout bersifat non-blocking, tunggu sampai bisa ditulis
+                if not selector.select(timeout):
+                    raise socket.timeout('timed out')
+                continue
+            except OSError as e:
+                if sent_total == 0 and e.errno in SENDFILE_UNSUPPORTED:
+                    raise _SendfileUnsupported()
+                raise
+            if sent == 0:
+                raise FrameError('File berubah ukuran saat sedang dikirim')
+            sent_total += sent
+
+
+def _send_with_mmap(sock, fileobj, offset, length):
+    with mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if offset + length > len(mapped):
+            raise FrameError('File berubah ukuran saat sedang dikirim')
+        view = memoryview(mapped)
+        try:
+            for start in range(offset, offset + length, CHUNK_SIZE):
+                sock.sendall(view[start:min(start + CHUNK_SIZE, offset + length)])
+        finally:
+            view.release()
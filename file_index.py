@@ -0,0 +1,492 @@
+import os
+import json
+import time
+import base64
+import bisect
+import hashlib
+import logging
+import threading
+from file_storage import FlatStorage, is_visible_name
+
+"""
+* file_index menyimpan indeks isi direktori files/ di memori: nama, ukuran,
+  waktu modifikasi dan checksum SHA-256 setiap file
+* upload dan delete memperbarui indeks secara langsung; perubahan dari luar
+  server tertangkap oleh rescan berkala di thread latar belakang
+* pada mode --workers setiap worker mencatat nama yang diubahnya ke jurnal
+  bersama (ChangeJournal); worker lain menerapkan catatan baru sebelum
+  melayani LIST, sehingga LIST di worker mana pun langsung konsisten.
+  Event perubahan lewat server diteruskan ke listeners dari jurnal, dengan
+  urutan dan nomor (posisi di jurnal) yang sama di semua worker
+* LIST dilayani dari indeks dengan pagination berbasis cursor, filter prefix
+  dan pengurutan, tanpa memindai direktori setiap kali dipanggil
+* setiap entri yang bertambah, berubah atau hilang dilaporkan ke listeners
+  sebagai event (lihat file_watch)
+"""
+
+# Jeda (detik) antar rescan direktori
+INDEX_RESCAN_INTERVAL = 60
+# Ukuran halaman LIST default dan maksimum
+LIST_DEFAULT_LIMIT = 1000
+LIST_MAX_LIMIT = 10000
+LIST_SORT_KEYS = ('name', 'size', 'mtime')
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+# Jurnal perubahan bersama antar proses worker (lihat ChangeJournal)
+JOURNAL_FILE = '.index-journal'
+# Jurnal yang melebihi ukuran ini dimulai ulang dari kosong
+JOURNAL_MAX_BYTES = 1024 * 1024
+
+
+def file_checksum(path):
+    """Checksum SHA-256 isi file, dibaca per potongan"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        while True:
+            chunk = fp.read(CHECKSUM_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def encode_cursor(key):
+    """Cursor halaman berikutnya: posisi (nilai urut, nama) entri terakhir"""
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        value, name = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return value, name
+    except (ValueError, TypeError):
+        raise ValueError('Cursor tidak valid')
+
+
+def read_journal_base(fd):
+    """Posisi awal jurnal dari baris header {"base": N} yang ditulis saat jurnal dimulai ulang, 0 jika tidak ada"""
+    first = os.pread(fd, 256, 0).split(b'\n', 1)[0]
+    try:
+        return int(json.loads(first)['base'])
+    except (ValueError, KeyError, TypeError):
+        return 0
+
+
+class ChangeJournal:
+    """
+    Jurnal append-only berisi nama file yang diubah (upload/delete) setiap
+    proses worker, satu baris JSON per perubahan. Pembaca hanya memeriksa
+    inode dan ukuran jurnal (satu stat) lalu membaca baris yang baru.
+    Posisi akhir setiap baris (ditambah base) menjadi nomor urut perubahan
+    yang sama di semua worker.
+    Jurnal yang melebihi JOURNAL_MAX_BYTES diganti file berisi header base
+    (posisi akhir jurnal lama) agar nomor urut tetap naik; pembaca yang
+    melihat inode baru tidak tahu apa yang terlewat dan perlu scan ulang.
+    """
+    def __init__(self, path=JOURNAL_FILE):
+        self.path = path
+        self.inode = None
+        self.offset = 0
+        self.base = 0
+        # Dipegang selama membaca dan menerapkan catatan (lihat FileIndex.sync)
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Membaca mulai dari akhir jurnal saat ini; isi sebelumnya sudah tercakup scan"""
+        fd = os.open(self.path, os.O_RDONLY | os.O_CREAT, 0o644)
+        try:
+            st = os.fstat(fd)
+            self.base = read_journal_base(fd)
+        finally:
+            os.close(fd)
+        self.inode, self.offset = st.st_ino, st.st_size
+
+    def position(self):
+        """Nomor urut perubahan terakhir yang sudah dibaca"""
+        return self.base + self.offset
+
+    def append(self, change):
+        """
+        Mencatat perubahan (dict name, size, mtime, checksum; size None = dihapus,
+        event: event untuk listeners atau None jika entri tidak berubah)
+        """
+        line = json.dumps(dict(change, pid=os.getpid())).encode('utf-8') + b'\n'
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+                size = os.fstat(fd).st_size
+                if size > JOURNAL_MAX_BYTES:
+                    header = json.dumps(dict(base=read_journal_base(fd) + size)).encode('utf-8') + b'\n'
+                    temp_name = f'{self.path}.{os.getpid()}'
+                    with open(temp_name, 'wb') as temp:
+                        temp.write(header)
+                    os.replace(temp_name, self.path)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            # Perubahan sudah tersimpan; worker lain tetap melihatnya pada rescan berikutnya
+            logging.warning(f"ChangeJournal: Gagal mencatat perubahan {change['name']}: {str(e)}")
+
+    def read(self):
+        """
+        Dipanggil dengan lock: (rotated, perubahan semua proses sejak pembacaan
+        terakhir), setiap perubahan diberi seq. rotated True jika jurnal sudah
+        dimulai ulang sejak saat itu sehingga ada catatan yang terlewat.
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False, []
+        if st.st_ino == self.inode and st.st_size <= self.offset:
+            return False, []
+        rotated = st.st_ino != self.inode
+        if rotated:
+            self.inode, self.offset = st.st_ino, 0
+        with open(self.path, 'rb') as fp:
+            fp.seek(self.offset)
+            data = fp.read()
+        # Baris terakhir yang belum lengkap dibaca lagi pada pemanggilan berikutnya
+        data = data[:data.rfind(b'\n') + 1]
+        changes = []
+        for line in data.splitlines(keepends=True):
+            self.offset += len(line)
+            try:
+                change = json.loads(line)
+            except ValueError:
+                continue
+            if 'base' in change:
+                self.base = change['base']
+                continue
+            change['seq'] = self.position()
+            changes.append(change)
+        return rotated, changes
+
+
+class FileIndex:
+    """
+    Indeks file di direktori kerja (files/)
+    - rescan_interval: jeda rescan berkala dalam detik (0 = tanpa rescan berkala)
+    - storage: pemetaan nama file ke path fisik (lihat file_storage)
+    - link_times: waktu upload nama yang berbagi inode blob (lihat
+      file_blob.LinkTimes), None jika mtime cukup diambil dari stat
+    Setiap entri berupa dict name, size, mtime dan checksum (None jika
+    checksum belum dihitung oleh rescan).
+    """
+    def __init__(self, rescan_interval=INDEX_RESCAN_INTERVAL, storage=None, link_times=None):
+        self.rescan_interval = rescan_interval
+        self.storage = storage or FlatStorage()
+        self.link_times = link_times
+        # ChangeJournal bersama antar proses worker, None pada satu proses
+        self.journal = None
+        self.entries = {}
+        # Nama file selalu terurut agar LIST per nama cukup dengan bisect
+        self.names = []
+        # Urutan per size/mtime dibangun ulang hanya jika indeks berubah
+        self.sorted_views = {}
+        # Waktu perubahan terakhir lewat update/remove, agar rescan yang
+        # sedang berjalan tidak menimpa perubahan yang lebih baru
+        self.touched = {}
+        self.lock = threading.Lock()
+        self.rescanner = None
+        self.rescanner_pid = None
+        # Fungsi event(dict) yang dipanggil dengan lock indeks setiap entri berubah
+        self.listeners = []
+
+    def is_indexed_name(self, name):
+        # File tersembunyi dan file sementara upload (.upload-*) tidak diindeks
+        return is_visible_name(name)
+
+    def scan_directory(self):
+        """Membaca (size, mtime) seluruh file yang tersimpan di storage"""
+        found = {}
+        link_times = self.link_times.scan() if self.link_times else {}
+        for name, stat in self.storage.scan():
+            if self.is_indexed_name(name):
+                found[name] = (stat.st_size, max(stat.st_mtime, link_times.get(name, 0)))
+        return found
+
+    def scan(self, with_checksum=True):
+        """
+        Menyamakan indeks dengan isi direktori. Checksum hanya dihitung
+        ulang untuk file baru atau yang size/mtime-nya berubah.
+        """
+        started = time.monotonic()
+        found = self.scan_directory()
+        with self.lock:
+            snapshot = dict(self.entries)
+
+        entries = {}
+        for name, (size, mtime) in found.items():
+            old = snapshot.get(name)
+            if old and old['size'] == size and old['mtime'] == mtime and (old['checksum'] or not with_checksum):
+                entries[name] = old
+                continue
+            checksum = None
+            if with_checksum:
+                try:
+                    checksum = file_checksum(self.storage.path(name))
+                except OSError:
+                    # File terhapus di tengah rescan
+                    continue
+            entries[name] = dict(name=name, size=size, mtime=mtime, checksum=checksum)
+
+        with self.lock:
+            for name in set(self.entries) | set(entries):
+                if self.touched.get(name, 0) >= started:
+                    continue
+                if name in entries:
+                    self.put(entries[name])
+                else:
+                    self.drop(name)
+            self.touched = {name: at for name, at in self.touched.items() if at >= started}
+        # Scan ringan (tanpa checksum) dijalankan sering selama ada pelanggan WATCH
+        logging.log(logging.INFO if with_checksum else logging.DEBUG,
+                    f"FileIndex: {len(entries)} files indexed in {time.monotonic() - started:.2f}s")
+
+    def put(self, entry, publish=True):
+        """
+        Dipanggil dengan lock: menambah atau mengganti entri. Mengembalikan
+        event perubahannya (None jika isi tidak berubah), diteruskan ke
+        listeners hanya jika publish.
+        """
+        name = entry['name']
+        old = self.entries.get(name)
+        if old == entry:
+            return None
+        if old is None:
+            bisect.insort(self.names, name)
+        self.entries[name] = entry
+        self.sorted_views.clear()
+        if old is None:
+            return self.emit('created', entry, publish)
+        elif (old['size'], old['mtime']) != (entry['size'], entry['mtime']) or \
+                (old['checksum'] and entry['checksum'] and old['checksum'] != entry['checksum']):
+            # Checksum yang baru dilengkapi (rescan/ETag) bukan perubahan isi
+            return self.emit('modified', entry, publish)
+        return None
+
+    def drop(self, name, publish=True):
+        """Dipanggil dengan lock: menghapus entri jika ada, mengembalikan event-nya (lihat put)"""
+        old = self.entries.pop(name, None)
+        if old is None:
+            return None
+        del self.names[bisect.bisect_left(self.names, name)]
+        self.sorted_views.clear()
+        return self.emit('deleted', old, publish)
+
+    def emit(self, event, entry, publish=True):
+        """Dipanggil dengan lock: membentuk event entri, diteruskan ke listeners jika publish"""
+        event = dict(event=event, name=entry['name'], size=entry['size'], mtime=entry['mtime'],
+                     etag=entry['checksum'])
+        if publish:
+            self.notify(event)
+        return event
+
+    def notify(self, event):
+        """Meneruskan event ke listeners (listener tidak boleh memblok)"""
+        for listener in self.listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logging.error(f"FileIndex: Error in change listener: {str(e)}")
+
+    def update(self, name, checksum=None):
+        """Mencatat file yang baru ditulis (upload)"""
+        self.ensure_rescanner()
+        # Perubahan worker lain diterapkan dulu agar event (created/modified) sesuai keadaan terakhir
+        self.sync()
+        stat = os.stat(self.storage.path(name))
+        mtime = self.link_times.mtime(name, stat) if self.link_times else stat.st_mtime
+        entry = dict(name=name, size=stat.st_size, mtime=mtime, checksum=checksum)
+        # Dengan jurnal, event diteruskan sync() sesuai urutan jurnal
+        with self.lock:
+            event = self.put(entry, publish=self.journal is None)
+            self.touched[name] = time.monotonic()
+        if self.journal is not None:
+            self.journal.append(dict(entry, event=event))
+            self.sync()
+
+    def share_changes(self, path=JOURNAL_FILE):
+        """
+        Membagi perubahan indeks dengan proses worker lain lewat ChangeJournal.
+        Dipanggil sebelum worker dibuat (fork), sehingga worker yang dijalankan
+        ulang juga menerapkan perubahan sejak saat itu.
+        """
+        self.journal = ChangeJournal(path)
+        self.journal.start()
+
+    def sync(self):
+        """
+        Menerapkan perubahan dari proses worker lain sebelum indeks dibaca,
+        lalu meneruskan event setiap catatan jurnal (termasuk milik proses
+        ini) ke listeners dengan seq posisi jurnal. Event diambil dari
+        catatannya, sehingga file yang dibuat lalu dihapus worker lain tetap
+        terlihat sebagai dua event walaupun indeks tidak berubah.
+        """
+        if self.journal is None:
+            return
+        with self.journal.lock:
+            rotated, changes = self.journal.read()
+            if rotated:
+                # Jurnal dimulai ulang: perubahan yang terlewat dicari dengan scan ringan
+                self.scan(with_checksum=False)
+            pid = os.getpid()
+            for change in changes:
+                if change.get('pid') != pid:
+                    self.refresh(change)
+                if change.get('event'):
+                    self.notify(dict(change['event'], seq=change['seq']))
+
+    def position(self):
+        """Nomor urut perubahan terakhir di jurnal bersama, None pada satu proses"""
+        return self.journal.position() if self.journal is not None else None
+
+    def refresh(self, change):
+        """
+        Menyamakan entri satu nama dengan isi storage setelah perubahan dari
+        proses lain; event-nya diteruskan sync() dari catatan jurnal
+        """
+        name = change['name']
+        try:
+            stat = os.stat(self.storage.path(name))
+        except FileNotFoundError:
+            stat = None
+        with self.lock:
+            if stat is None and change.get('size') is not None:
+                # Sudah dihapus lagi: catatan hapusnya menyusul di jurnal, entri dari catatan
+                # dipakai sampai saat itu agar penghapusnya tetap mencatat event deleted
+                self.put(dict(name=name, size=change['size'], mtime=change['mtime'],
+                              checksum=change.get('checksum')), publish=False)
+            elif stat is None:
+                self.drop(name, publish=False)
+            else:
+                mtime = self.link_times.mtime(name, stat) if self.link_times else stat.st_mtime
+                # Checksum dari jurnal hanya berlaku jika file belum diganti lagi sejak dicatat
+                same = (change.get('size'), change.get('mtime')) == (stat.st_size, mtime)
+                self.put(dict(name=name, size=stat.st_size, mtime=mtime,
+                              checksum=change.get('checksum') if same else None), publish=False)
+            self.touched[name] = time.monotonic()
+
+    def set_checksum(self, name, size, mtime, checksum):
+        """Mencatat checksum yang dihitung di luar rescan (ETag), hanya jika entri masih file yang sama"""
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry and entry['size'] == size and entry['mtime'] == mtime and entry['checksum'] != checksum:
+                self.put(dict(entry, checksum=checksum))
+
+    def remove(self, name):
+        """Mencatat file yang dihapus"""
+        self.ensure_rescanner()
+        self.sync()
+        with self.lock:
+            event = self.drop(name, publish=self.journal is None)
+            self.touched[name] = time.monotonic()
+        if self.journal is not None:
+            self.journal.append(dict(name=name, size=None, event=event))
+            self.sync()
+
+    def get(self, name):
+        with self.lock:
+            return self.entries.get(name)
+
+    def ensure_rescanner(self):
+        """
+        Menjalankan thread rescan berkala saat indeks pertama kali dipakai.
+        Thread tidak ikut terbawa fork, sehingga pid dicek agar setiap
+        proses worker menjalankan rescanner-nya sendiri.
+        """
+        if not self.rescan_interval or self.rescanner_pid == os.getpid():
+            return
+        with self.lock:
+            if self.rescanner_pid == os.getpid():
+                return
+            self.rescanner_pid = os.getpid()
+            self.rescanner = threading.Thread(target=self.rescan_loop, name='index-rescan', daemon=True)
+            self.rescanner.start()
+
+    def rescan_loop(self):
+        # Rescan pertama langsung melengkapi checksum yang belum dihitung
+        while True:
+            try:
+                self.scan()
+            except Exception as e:
+                logging.error(f"FileIndex: Error rescanning directory: {str(e)}")
+            time.sleep(self.rescan_interval)
+
+    def sorted_view(self, sort_key):
+        """Dipanggil dengan lock: list (nilai urut, nama) terurut untuk sort_key"""
+        if sort_key == 'name':
+            return None
+        view = self.sorted_views.get(sort_key)
+        if view is None:
+            view = sorted((entry[sort_key], name) for name, entry in self.entries.items())
+            self.sorted_views[sort_key] = view
+        return view
+
+    def snapshot(self):
+        """Salinan seluruh entri indeks: dict nama -> entri"""
+        self.sync()
+        with self.lock:
+            return dict(self.entries)
+
+    def names_only(self):
+        self.sync()
+        with self.lock:
+            return list(self.names)
+
+    def page(self, prefix='', sort='name', cursor=None, limit=LIST_DEFAULT_LIMIT):
+        """
+        Satu halaman entri indeks
+        - prefix: hanya nama yang diawali prefix
+        - sort: name, size atau mtime; awalan '-' untuk urutan menurun
+        - cursor: next_cursor dari halaman sebelumnya
+        - limit: jumlah entri per halaman
+        Mengembalikan (list entri, next_cursor atau None jika halaman terakhir)
+        """
+        self.ensure_rescanner()
+        self.sync()
+        descending = sort.startswith('-')
+        sort_key = sort.lstrip('-')
+        if sort_key not in LIST_SORT_KEYS:
+            raise ValueError(f'Urutan {sort} tidak dikenali, gunakan salah satu dari {", ".join(LIST_SORT_KEYS)}')
+        if limit < 1:
+            raise ValueError('limit harus lebih besar dari 0')
+        limit = min(limit, LIST_MAX_LIMIT)
+        after = decode_cursor(cursor) if cursor else None
+
+        with self.lock:
+            view = self.sorted_view(sort_key)
+            if view is None:
+                # Urut nama: prefix dan cursor cukup dengan bisect
+                keys = self.names
+                position = lambda key: key[1]
+                start, stop = 0, len(keys)
+                if prefix:
+                    start = bisect.bisect_left(keys, prefix)
+                    stop = bisect.bisect_left(keys, prefix + '\U0010ffff')
+            else:
+                keys = view
+                position = tuple
+                start, stop = 0, len(keys)
+
+            if descending:
+                indexes = range(stop - 1, start - 1, -1)
+                if after is not None:
+                    indexes = range(min(stop, bisect.bisect_left(keys, position(after))) - 1, start - 1, -1)
+            else:
+                indexes = range(start, stop)
+                if after is not None:
+                    indexes = range(max(start, bisect.bisect_right(keys, position(after))), stop)
+
+            files = []
+            next_cursor = None
+            for i in indexes:
+                name = keys[i] if view is None else keys[i][1]
+                if prefix and not name.startswith(prefix):
+                    continue
+                if len(files) == limit:
+                    last = files[-1]
+                    next_cursor = encode_cursor([last[sort_key], last['name']])
+                    break
+                files.append(dict(self.entries[name]))
+        return files, next_cursor
@@ -1,8 +1,98 @@
 import os
 import json
 import base64
+import hashlib
+import stat
 import logging
+import tempfile
 from glob import glob
+from file_index import FileIndex, LIST_DEFAULT_LIMIT, CHECKSUM_CHUNK_SIZE, JOURNAL_FILE, file_checksum
+from file_cache import ResponseCache
+from file_blob import BlobStore, LinkTimes, is_digest, BLOB_DIR, LINK_TIME_DIR
+from file_lock import NamedLocks, LOCK_FILE
+from file_storage import open_storage, LAYOUT_FILE, SHARD_DIR
+from file_multipart import UploadSessions, SessionError, SessionMissing, SESSION_DIR
+from file_delta import (DeltaError, DELTA_MAX_LITERAL_FRACTION, file_signature, generate_delta,
+                        apply_delta)
+
+# Prefix file sementara selama upload berlangsung (tidak ikut di LIST)
+UPLOAD_TEMP_PREFIX = '.upload-'
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Nama internal di files/ yang tidak boleh dipakai sebagai nama file client
+RESERVED_NAMES = frozenset(('.', '..', LOCK_FILE, SESSION_DIR, BLOB_DIR, LINK_TIME_DIR, LAYOUT_FILE, SHARD_DIR,
+                            JOURNAL_FILE))
+# Jumlah file maksimum per request batch (MGET/MDELETE/MUPLOAD), agar
+# header respons yang memuat status per file tetap di bawah batas header frame
+BATCH_MAX_FILES = 100
+
+class FileRange:
+    """
+    Potongan file (offset, length) yang dikirim sebagai payload respons
+    tanpa dibaca ke memori. Dipakai dengan with agar file selalu ditutup.
+    """
+    def __init__(self, file_object, offset, length):
+        self.file_object = file_object
+        self.offset = offset
+        self.length = length
+
+    def fileno(self):
+        return self.file_object.fileno()
+
+    def close(self):
+        self.file_object.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def parts(self):
+        return [self]
+
+class FileRanges:
+    """
+    Beberapa FileRange yang dikirim berurutan sebagai satu payload
+    respons (MGET). Dipakai dengan with agar semua file ditutup.
+    """
+    def __init__(self, ranges):
+        self.ranges = ranges
+        self.length = sum(part.length for part in ranges)
+
+    def close(self):
+        for part in self.ranges:
+            part.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def parts(self):
+        return self.ranges
+
+class PayloadSplitter:
+    """
+    Membagi payload (iterable potongan bytes) menjadi beberapa bagian
+    berurutan dengan panjang yang sudah diketahui (MUPLOAD)
+    """
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.pending = memoryview(b'')
+
+    def part(self, length):
+        """Iterator tepat length byte berikutnya, ValueError jika payload terpotong"""
+        while length > 0:
+            if not self.pending:
+                chunk = next(self.chunks, b'')
+                if not chunk:
+                    raise ValueError('Payload terpotong')
+                self.pending = memoryview(chunk)
+            data = self.pending[:length]
+            self.pending = self.pending[len(data):]
+            length -= len(data)
+            yield data
 
 class FileInterface:
     def __init__(self):
@@ -11,78 +101,516 @@ class FileInterface:
             os.makedirs('files/')
         os.chdir('files/')
         logging.info("FileInterface: Working directory set to files/")
+        self.cleanup_temp_files()
+        # Nama file dipetakan ke path fisik oleh storage (default: layout sharded)
+        self.storage = open_storage()
+        logging.info(f"FileInterface: Storage layout {self.storage.layout}")
+        # Waktu upload nama file yang dibuat sebagai link ke blob yang sudah ada
+        self.link_times = LinkTimes()
+        # Indeks awal tanpa checksum agar start cepat, checksum dilengkapi rescan
+        self.index = FileIndex(storage=self.storage, link_times=self.link_times)
+        self.index.scan(with_checksum=False)
+        # Cache respons GET untuk file yang sering diminta
+        self.cache = ResponseCache()
+        # Lock tulis per nama file; pembaca tidak memakai lock (lihat file_lock)
+        self.locks = NamedLocks()
+        # Isi file disimpan per SHA-256, nama file berupa hard link ke blob
+        self.blobs = BlobStore(locks=self.locks)
+        self.blobs.collect_garbage()
+        # Sesi upload multipart; sesi yang ditinggalkan dibersihkan saat start
+        self.sessions = UploadSessions()
+        self.sessions.collect_garbage(force=True)
+        # Fungsi (op, nama, sha256) yang dipanggil setiap file berubah (replikasi)
+        self.change_listeners = []
+
+    def cleanup_temp_files(self):
+        """Menghapus sisa file sementara dari upload yang terputus"""
+        for temp_name in glob(UPLOAD_TEMP_PREFIX + '*'):
+            try:
+                os.remove(temp_name)
+                logging.info(f"FileInterface: Removed stale temp file {temp_name}")
+            except OSError:
+                pass
+
+    def is_valid_name(self, filename):
+        """Nama file harus berada langsung di files/ dan bukan file sementara/internal"""
+        return bool(filename) and '/' not in filename and '\\' not in filename \
+            and not filename.startswith(UPLOAD_TEMP_PREFIX) and filename not in RESERVED_NAMES
+
+    def path(self, filename):
+        """Path fisik file filename di storage"""
+        return self.storage.path(filename)
+
+    def notify_change(self, op, filename, checksum=None):
+        """
+        Memberi tahu change_listeners bahwa filename berubah: op 'put' (isi
+        baru dengan SHA-256 checksum) atau 'delete'. Dipanggil setelah lock
+        tulis dilepas; listener tidak boleh memblok (cukup memasukkan ke antrian).
+        """
+        for listener in self.change_listeners:
+            try:
+                listener(op, filename, checksum)
+            except Exception as e:
+                logging.error(f"FileInterface: Error in change listener: {str(e)}")
+
+    def replace_file(self, temp_name, filename, linked=False):
+        """
+        Dipanggil dengan lock tulis filename: memasang file sementara sebagai
+        filename secara atomik. Pembaca yang sudah membuka file lama tetap
+        membaca isi lama (inode lama) sampai file tersebut ditutup.
+        - linked: file sementara berupa link ke blob yang sudah ada, waktu
+          upload dicatat di link_times karena mtime inode milik upload pertama
+        """
+        # Blob isi lama dibebaskan jika tidak lagi dirujuk setelah diganti
+        path = self.storage.prepare(filename)
+        previous = self.linked_checksum(filename) if os.path.isfile(path) else None
+        os.replace(temp_name, path)
+        # rename antar dua link ke blob yang sama tidak menghapus sumbernya
+        if os.path.lexists(temp_name):
+            os.remove(temp_name)
+        if linked:
+            self.link_times.mark(filename)
+        else:
+            self.link_times.clear(filename)
+        self.cache.invalidate(filename)
+        if previous:
+            self.blobs.release(previous)
+
+    def commit_file(self, temp_name, filename, checksum, base=None):
+        """
+        Memasang file sementara yang sudah lengkap sebagai filename:
+        isi didaftarkan ke blob store, lalu cache dan indeks diperbarui.
+        Pemasangan dilakukan di bawah lock tulis filename, penulisan isinya
+        tidak, sehingga upload besar tidak menahan penulis lain.
+        - base: (size, mtime) yang harus masih dimiliki filename saat dipasang
+          (PATCH), DeltaError jika file sudah diganti penulis lain
+        Mengembalikan True jika isi yang sama sudah tersimpan sebelumnya.
+        """
+        try:
+            os.chmod(temp_name, 0o644)
+            deduplicated = self.blobs.store(temp_name, checksum)
+            with self.locks.hold(filename):
+                if base is not None:
+                    st = os.stat(self.path(filename))
+                    if (st.st_size, self.mtime(filename, st)) != base:
+                        raise DeltaError(f'File {filename} sudah berubah sejak signature diambil')
+                self.replace_file(temp_name, filename, linked=deduplicated)
+                self.index.update(filename, checksum)
+        except BaseException:
+            if os.path.lexists(temp_name):
+                os.remove(temp_name)
+            raise
+        self.notify_change('put', filename, checksum)
+        return deduplicated
+
+    def iter_chunks(self, file_content):
+        """
+        Menyeragamkan konten upload menjadi iterator potongan bytes.
+        Konten dapat berupa bytes, objek dengan method read(),
+        atau iterable yang menghasilkan potongan bytes.
+        """
+        if isinstance(file_content, (bytes, bytearray, memoryview)):
+            yield file_content
+        elif hasattr(file_content, 'read'):
+            while True:
+                chunk = file_content.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        else:
+            yield from file_content
 
     def list(self, params=[]):
         """
-        Menampilkan daftar file di direktori files/
+        Menampilkan daftar file di direktori files/ dari indeks file
+        Parameter (opsional, masing-masing berbentuk key=value):
+        - prefix=<awalan nama>
+        - sort=name|size|mtime (awalan '-' untuk urutan menurun)
+        - limit=<jumlah per halaman>
+        - cursor=<next_cursor dari halaman sebelumnya>
+        Tanpa parameter, data berisi list seluruh nama file (format lama).
+        Dengan parameter, data berisi files (name, size, mtime, checksum)
+        dan next_cursor (None pada halaman terakhir).
         """
         try:
-            # Ambil semua file di direktori files/
-            filelist = glob('*.*')
-            logging.info(f"FileInterface: Found {len(filelist)} files")
-            return dict(status='OK', data=filelist)
+            if not params:
+                filelist = self.index.names_only()
+                logging.info(f"FileInterface: Found {len(filelist)} files")
+                return dict(status='OK', data=filelist)
+
+            options = {}
+            for param in params:
+                key, sep, value = str(param).partition('=')
+                if not sep or key not in ('prefix', 'sort', 'limit', 'cursor'):
+                    return dict(status='ERROR', data=f'Parameter LIST tidak dikenali: {param}')
+                options[key] = value
+            files, next_cursor = self.index.page(prefix=options.get('prefix', ''),
+                                                 sort=options.get('sort') or 'name',
+                                                 cursor=options.get('cursor') or None,
+                                                 limit=int(options.get('limit') or LIST_DEFAULT_LIMIT))
+            logging.info(f"FileInterface: Listing {len(files)} files")
+            return dict(status='OK', data=dict(files=files, next_cursor=next_cursor))
         except Exception as e:
             logging.error(f"FileInterface: Error listing files: {str(e)}")
             return dict(status='ERROR', data=str(e))
 
+    def cache_key(self, filename, kind):
+        """
+        Kunci cache respons GET seluruh isi file: (nama, jenis respons,
+        ukuran, mtime). None jika file tidak ada atau terlalu besar untuk cache.
+        """
+        try:
+            st = os.stat(self.path(filename))
+        except (OSError, ValueError):
+            return None
+        if not stat.S_ISREG(st.st_mode) or st.st_size > self.cache.max_entry_bytes():
+            return None
+        return (filename, kind, st.st_size, st.st_mtime_ns)
+
+    def etag(self, filename, st, file_object=None):
+        """
+        ETag isi file: SHA-256 dari indeks jika entrinya masih cocok dengan st
+        (size, mtime). Jika belum ada dan file_object (file yang sudah dibuka,
+        st dari fstat-nya) diberikan, checksum dihitung lalu disimpan di indeks;
+        tanpa file_object hasilnya None.
+        """
+        entry = self.index.get(filename)
+        if entry and entry['checksum'] and entry['size'] == st.st_size and entry['mtime'] == self.mtime(filename, st):
+            return entry['checksum']
+        if file_object is None:
+            return None
+        digest = hashlib.sha256()
+        offset = 0
+        while True:
+            # pread tidak menggeser posisi baca file_object
+            chunk = os.pread(file_object.fileno(), CHECKSUM_CHUNK_SIZE, offset)
+            if not chunk:
+                break
+            digest.update(chunk)
+            offset += len(chunk)
+        checksum = digest.hexdigest()
+        self.index.set_checksum(filename, st.st_size, self.mtime(filename, st), checksum)
+        return checksum
+
+    def not_modified(self, filename, etag):
+        """
+        Respons NOT_MODIFIED jika isi filename masih ber-ETag etag (GET dengan
+        if-none-match), None jika file berubah atau tidak ada sehingga GET
+        dilayani seperti biasa
+        """
+        if not etag or not self.is_valid_name(filename):
+            return None
+        try:
+            with open(self.path(filename), 'rb') as fp:
+                st = os.fstat(fp.fileno())
+                current = self.etag(filename, st, fp)
+        except OSError:
+            return None
+        if current != etag:
+            return None
+        logging.info(f"FileInterface: File {filename} not modified")
+        return dict(status='NOT_MODIFIED', data=f'File {filename} tidak berubah', etag=current,
+                    size=st.st_size, mtime=self.mtime(filename, st))
+
+    def parse_range(self, params, size):
+        """
+        Membaca rentang byte opsional dari params[1] (offset) dan params[2]
+        (length). Tanpa length, rentang berlanjut sampai akhir file; length
+        yang melewati akhir file dipotong. ValueError jika rentang tidak valid.
+        """
+        offset = int(params[1]) if len(params) > 1 and params[1] is not None else 0
+        length = int(params[2]) if len(params) > 2 and params[2] is not None else size - offset
+        if offset < 0 or length < 0 or offset > size:
+            raise ValueError(f'Rentang {offset}+{length} tidak valid untuk file berukuran {size} bytes')
+        return offset, min(length, size - offset)
+
     def get(self, params=[]):
         """
         Mengambil file dari direktori files/
         Parameter:
         - params[0]: nama file yang akan diambil
+        - params[1], params[2] (opsional): offset dan length bagian file yang diambil
         """
         try:
             if not params or len(params) == 0:
                 return dict(status='ERROR', data='Nama file tidak disebutkan')
             
             filename = params[0]
-            if not os.path.isfile(filename):
+            if not self.is_valid_name(filename) or not os.path.isfile(self.path(filename)):
                 return dict(status='ERROR', data=f'File {filename} tidak ditemukan')
             
             logging.info(f"FileInterface: Retrieving file {filename}")
             
             # Baca file dalam mode binary
-            with open(filename, 'rb') as fp:
+            with open(self.path(filename), 'rb') as fp:
+                st = os.fstat(fp.fileno())
+                result = dict(status='OK', data=f'File {filename} berhasil diambil')
+                result['etag'] = self.etag(filename, st, fp)
+                if len(params) > 1:
+                    offset, length = self.parse_range(params, st.st_size)
+                    fp.seek(offset)
+                    file_content = fp.read(length)
+                    result.update(size=st.st_size, offset=offset, length=length, file_content=file_content)
+                    return result
                 file_content = fp.read()
                 
             # Untuk kompatibilitas dengan protokol, kita berikan file content langsung
             # dan di file_protocol.py akan di-encode ke base64
-            return dict(status='OK', data=f'File {filename} berhasil diambil', file_content=file_content)
+            result['file_content'] = file_content
+            return result
             
         except Exception as e:
             logging.error(f"FileInterface: Error retrieving file: {str(e)}")
             return dict(status='ERROR', data=str(e))
 
+    def open_file(self, params=[]):
+        """
+        Membuka file untuk dikirim tanpa membaca isinya ke memori
+        Parameter:
+        - params[0]: nama file yang akan diambil
+        - params[1], params[2] (opsional): offset dan length bagian file yang diambil
+        Jika berhasil, hasil berisi size, mtime dan etag file, offset dan length
+        rentang, serta file_range (FileRange); pemanggil wajib menutup file_range
+        """
+        try:
+            if not params or len(params) == 0:
+                return dict(status='ERROR', data='Nama file tidak disebutkan')
+
+            filename = params[0]
+            if not self.is_valid_name(filename) or not os.path.isfile(self.path(filename)):
+                return dict(status='ERROR', data=f'File {filename} tidak ditemukan')
+
+            logging.info(f"FileInterface: Opening file {filename}")
+            file_object = open(self.path(filename), 'rb')
+            try:
+                st = os.fstat(file_object.fileno())
+                offset, length = self.parse_range(params, st.st_size)
+                # ETag dihitung sekali per versi file lalu disimpan di indeks
+                etag = self.etag(filename, st, file_object)
+            except Exception:
+                file_object.close()
+                raise
+            return dict(status='OK', data=f'File {filename} berhasil diambil', size=st.st_size,
+                        mtime=self.mtime(filename, st), etag=etag, offset=offset, length=length,
+                        file_range=FileRange(file_object, offset, length))
+
+        except Exception as e:
+            logging.error(f"FileInterface: Error opening file: {str(e)}")
+            return dict(status='ERROR', data=str(e))
+
     def upload(self, params=[]):
         """
         Menyimpan file ke direktori files/
         Parameter:
         - params[0]: nama file
-        - params[1]: konten file dalam bentuk bytes
+        - params[1]: konten file, berupa bytes atau stream
+          (objek dengan read() / iterable potongan bytes)
+        - params[2] (opsional): SHA-256 yang harus dimiliki isi file
+          (replikasi); file tidak disimpan jika tidak cocok
+        Konten ditulis bertahap ke file sementara di files/ lalu
+        di-rename secara atomik, sehingga file lama tetap utuh sampai
+        upload selesai dan memori yang dipakai tidak bergantung ukuran file.
         """
         try:
             if len(params) < 2:
                 return dict(status='ERROR', data='Parameter tidak lengkap')
             
             filename = params[0]
-            file_content = params[1]  # Sudah dalam bentuk bytes
+            file_content = params[1]
             
             # Cek apakah nama file valid
-            if not filename or '/' in filename or '\\' in filename:
+            if not self.is_valid_name(filename):
                 return dict(status='ERROR', data='Nama file tidak valid')
             
-            logging.info(f"FileInterface: Uploading file {filename} ({len(file_content)} bytes)")
+            logging.info(f"FileInterface: Uploading file {filename}")
             
-            # Tulis file ke disk
-            with open(filename, 'wb') as fp:
-                fp.write(file_content)
-                
+            # Tulis file ke file sementara, potong demi potong
+            fd, temp_name = tempfile.mkstemp(prefix=UPLOAD_TEMP_PREFIX, dir='.')
+            try:
+                size = 0
+                # Checksum dihitung sambil menulis untuk indeks file
+                digest = hashlib.sha256()
+                with os.fdopen(fd, 'wb') as fp:
+                    for chunk in self.iter_chunks(file_content):
+                        fp.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+            except BaseException:
+                os.remove(temp_name)
+                raise
+            checksum = digest.hexdigest()
+            if len(params) > 2 and params[2] and checksum != str(params[2]).lower():
+                os.remove(temp_name)
+                return dict(status='ERROR', data=f'Checksum isi file {filename} tidak cocok')
+            deduplicated = self.commit_file(temp_name, filename, checksum)
+
+            if deduplicated:
+                logging.info(f"FileInterface: Stored file {filename} ({size} bytes) as link to existing blob {checksum}")
+            else:
+                logging.info(f"FileInterface: Stored file {filename} ({size} bytes)")
             return dict(status='OK', data=f'File {filename} berhasil disimpan')
             
         except Exception as e:
             logging.error(f"FileInterface: Error uploading file: {str(e)}")
             return dict(status='ERROR', data=str(e))
 
+    def upload_hash(self, params=[]):
+        """
+        Upload tanpa isi file: jika server sudah menyimpan isi dengan SHA-256
+        yang sama, filename langsung dibuat merujuk isi tersebut.
+        Parameter:
+        - params[0]: nama file
+        - params[1]: SHA-256 isi file (hex)
+        Status MISSING berarti isi belum ada, client perlu mengirim file utuh.
+        """
+        try:
+            if len(params) < 2:
+                return dict(status='ERROR', data='Parameter tidak lengkap')
+
+            filename = params[0]
+            checksum = str(params[1]).lower()
+            if not self.is_valid_name(filename):
+                return dict(status='ERROR', data='Nama file tidak valid')
+            if not is_digest(checksum):
+                return dict(status='ERROR', data='SHA-256 tidak valid')
+
+            temp_name = UPLOAD_TEMP_PREFIX + os.urandom(8).hex()
+            if not self.blobs.link(checksum, temp_name):
+                return dict(status='MISSING', data=f'Isi file {filename} belum ada di server')
+            try:
+                with self.locks.hold(filename):
+                    self.replace_file(temp_name, filename, linked=True)
+                    self.index.update(filename, checksum)
+            except BaseException:
+                if os.path.lexists(temp_name):
+                    os.remove(temp_name)
+                raise
+            self.notify_change('put', filename, checksum)
+
+            logging.info(f"FileInterface: Linked file {filename} to existing blob {checksum}")
+            return dict(status='OK', data=f'File {filename} berhasil disimpan')
+
+        except Exception as e:
+            logging.error(f"FileInterface: Error uploading file by hash: {str(e)}")
+            return dict(status='ERROR', data=str(e))
+
+    def signature(self, params=[]):
+        """
+        Signature blok file untuk sinkronisasi delta (lihat file_delta)
+        Parameter:
+        - params[0]: nama file
+        Hasil berisi size dan mtime file (basis) serta signature
+        """
+        try:
+            if not params or len(params) == 0:
+                return dict(status='ERROR', data='Nama file tidak disebutkan')
+
+            filename = params[0]
+            if not self.is_valid_name(filename) or not os.path.isfile(self.path(filename)):
+                return dict(status='ERROR', data=f'File {filename} tidak ditemukan')
+
+            with open(self.path(filename), 'rb') as fp:
+                st = os.fstat(fp.fileno())
+                signature = file_signature(fp)
+            logging.info(f"FileInterface: Signature of {filename} ({len(signature['blocks'])} blocks)")
+            return dict(status='OK', data=f'Signature file {filename}', size=st.st_size,
+                        mtime=self.mtime(filename, st), signature=signature)
+
+        except Exception as e:
+            logging.error(f"FileInterface: Error computing signature: {str(e)}")
+            return dict(status='ERROR', data=str(e))
+
+    def delta(self, params=[]):
+        """
+        Delta isi file di server terhadap salinan lama milik client (unduh delta)
+        Parameter:
+        - params[0]: nama file
+        - params[1]: signature salinan client
+        Hasil berisi size, mtime dan sha256 file serta delta_range (FileRange
+        berisi delta di file sementara); pemanggil wajib menutup delta_range
+        """
+        try:
+            if len(params) < 2:
+                return dict(status='ERROR', data='Parameter tidak lengkap')
+
+            filename = params[0]
+            if not self.is_valid_name(filename) or not os.path.isfile(self.path(filename)):
+                return dict(status='ERROR', data=f'File {filename} tidak ditemukan')
+
+            delta_file = tempfile.TemporaryFile()
+            try:
+                with open(self.path(filename), 'rb') as fp:
+                    st = os.fstat(fp.fileno())
+                    info = generate_delta(params[1], fp, delta_file,
+                                          max_literal=int(st.st_size * DELTA_MAX_LITERAL_FRACTION))
+                # sendfile membaca langsung dari fd, isi buffer harus sudah tertulis
+                delta_file.flush()
+                length = delta_file.tell()
+            except BaseException:
+                delta_file.close()
+                raise
+            logging.info(f"FileInterface: Delta of {filename}: {info['copied_blocks']} blocks reused, "
+                         f"{info['literal_bytes']} literal bytes")
+            return dict(status='OK', data=f'Delta file {filename}', size=info['size'], mtime=self.mtime(filename, st),
+                        sha256=info['sha256'], delta_range=FileRange(delta_file, 0, length))
+
+        except Exception as e:
+            logging.error(f"FileInterface: Error computing delta: {str(e)}")
+            return dict(status='ERROR', data=str(e))
+
+    def patch(self, params=[]):
+        """
+        Membangun ulang file dari isi lamanya di server dan delta dari client (unggah delta)
+        Parameter:
+        - params[0]: nama file
+        - params[1]: SHA-256 isi file baru
+        - params[2], params[3]: size dan mtime basis saat signature diambil
+        - params[4]: ukuran blok signature
+        - params[5]: delta, berupa bytes atau stream (lihat iter_chunks)
+        """
+        try:
+            if len(params) < 6:
+                return dict(status='ERROR', data='Parameter tidak lengkap')
+
+            filename, checksum = params[0], str(params[1]).lower()
+            base_size, base_mtime, block_size = int(params[2]), float(params[3]), int(params[4])
+            if not self.is_valid_name(filename) or not os.path.isfile(self.path(filename)):
+                return dict(status='ERROR', data=f'File {filename} tidak ditemukan')
+
+            fd, temp_name = tempfile.mkstemp(prefix=UPLOAD_TEMP_PREFIX, dir='.')
+            try:
+                with open(self.path(filename), 'rb') as basis, os.fdopen(fd, 'wb') as out:
+                    st = os.fstat(basis.fileno())
+                    if st.st_size != base_size or self.mtime(filename, st) != base_mtime:
+                        raise DeltaError(f'File {filename} sudah berubah sejak signature diambil')
+                    size, result_checksum = apply_delta(basis, self.iter_chunks(params[5]), out, block_size)
+                if result_checksum != checksum:
+                    raise DeltaError('Checksum hasil delta tidak cocok')
+            except BaseException:
+                os.remove(temp_name)
+                raise
+            # Delta diterapkan tanpa lock; saat dipasang basis harus masih file yang sama
+            self.commit_file(temp_name, filename, checksum, base=(st.st_size, self.mtime(filename, st)))
+
+            logging.info(f"FileInterface: Patched file {filename} ({size} bytes)")
+            return dict(status='OK', data=f'File {filename} berhasil disimpan')
+
+        except Exception as e:
+            logging.error(f"FileInterface: Error patching file: {str(e)}")
+            return dict(status='ERROR', data=str(e))
+
+    def mtime(self, filename, st):
+        """Waktu upload filename (st hasil stat/fstat file tersebut), lihat file_blob.LinkTimes"""
+        return self.link_times.mtime(filename, st)
+
+    def linked_checksum(self, filename):
+        """SHA-256 blob yang dirujuk filename, None jika file tidak berupa link ke blob"""
+        path = self.path(filename)
+        st = os.stat(path)
+        if st.st_nlink < 2:
+            return None
+        return self.etag(filename, st) or file_checksum(path)
+
     def delete(self, params=[]):
         """
         Menghapus file dari direktori files/
@@ -94,13 +622,26 @@ class FileInterface:
                 return dict(status='ERROR', data='Nama file tidak disebutkan')
             
             filename = params[0]
-            if not os.path.isfile(filename):
+            if not self.is_valid_name(filename):
                 return dict(status='ERROR', data=f'File {filename} tidak ditemukan')
-            
-            logging.info(f"FileInterface: Deleting file {filename}")
-            
-            # Hapus file
-            os.remove(filename)
+
+            with self.locks.hold(filename):
+                if not os.path.isfile(self.path(filename)):
+                    return dict(status='ERROR', data=f'File {filename} tidak ditemukan')
+
+                logging.info(f"FileInterface: Deleting file {filename}")
+
+                # Cari blob yang dirujuk file ini agar bisa dibebaskan jika tidak dipakai lagi
+                checksum = self.linked_checksum(filename)
+
+                # Hapus file; pembaca yang sudah membukanya tetap bisa menyelesaikan pembacaan
+                os.remove(self.path(filename))
+                self.link_times.clear(filename)
+                self.cache.invalidate(filename)
+                self.index.remove(filename)
+                if checksum:
+                    self.blobs.release(checksum)
+            self.notify_change('delete', filename)
             
             return dict(status='OK', data=f'File {filename} berhasil dihapus')
             
@@ -108,6 +649,249 @@ class FileInterface:
             logging.error(f"FileInterface: Error deleting file: {str(e)}")
             return dict(status='ERROR', data=str(e))
 
+    def check_batch(self, names):
+        """Pesan kesalahan jika daftar file untuk request batch tidak valid, None jika valid"""
+        if not names:
+            return 'Nama file tidak disebutkan'
+        if len(names) > BATCH_MAX_FILES:
+            return f'Maksimum {BATCH_MAX_FILES} file per request'
+        return None
+
+    def mget(self, params=[]):
+        """
+        Membuka beberapa file sekaligus untuk dikirim dalam satu respons
+        Parameter:
+        - params: daftar nama file
+        Jika berhasil, data berisi files: status per file (name, status, lalu
+        size, mtime, etag dan length jika OK, atau data berisi pesan kesalahan), dan
+        file_ranges (FileRanges) berisi isi file yang OK berurutan sesuai
+        files; pemanggil wajib menutup file_ranges
+        """
+        error = self.check_batch(params)
+        if error:
+            return dict(status='ERROR', data=error)
+
+        files = []
+        ranges = []
+        for filename in params:
+            result = self.open_file([filename])
+            file_range = result.pop('file_range', None)
+            if file_range is None:
+                files.append(dict(name=filename, status=result['status'], data=result['data']))
+                continue
+            ranges.append(file_range)
+            files.append(dict(name=filename, status='OK', size=result['size'], mtime=result['mtime'],
+                              etag=result['etag'], length=result['length']))
+        logging.info(f"FileInterface: Retrieving {len(ranges)} of {len(files)} files in batch")
+        return dict(status='OK', data=dict(files=files), file_ranges=FileRanges(ranges))
+
+    def mupload(self, params=[]):
+        """
+        Menyimpan beberapa file dari satu payload
+        Parameter:
+        - params[0]: daftar [nama file, ukuran] sesuai urutan isi di payload
+        - params[1]: payload berisi isi semua file yang disambung berurutan
+        Setiap file disimpan seperti upload biasa; data berisi files: status
+        per file (name, status, data).
+        """
+        try:
+            if len(params) < 2:
+                return dict(status='ERROR', data='Parameter tidak lengkap')
+            entries = params[0]
+            error = self.check_batch(entries)
+            if error:
+                return dict(status='ERROR', data=error)
+            sizes = []
+            for entry in entries:
+                if not isinstance(entry, list) or len(entry) != 2 or not isinstance(entry[1], int) or entry[1] < 0:
+                    return dict(status='ERROR', data='Setiap file harus berupa [nama, ukuran]')
+                sizes.append(entry[1])
+
+            splitter = PayloadSplitter(self.iter_chunks(params[1]))
+            files = []
+            for filename, size in entries:
+                part = splitter.part(size)
+                result = self.upload([filename, part])
+                # Isi file yang ditolak tetap dilewati agar file berikutnya terbaca dari posisi yang benar
+                for _ in part:
+                    pass
+                files.append(dict(name=filename, status=result['status'], data=result['data']))
+            logging.info(f"FileInterface: Stored {sum(f['status'] == 'OK' for f in files)} of {len(files)} files "
+                         f"({sum(sizes)} bytes) in batch")
+            return dict(status='OK', data=dict(files=files))
+
+        except Exception as e:
+            logging.error(f"FileInterface: Error uploading batch: {str(e)}")
+            return dict(status='ERROR', data=str(e))
+
+    def mdelete(self, params=[]):
+        """
+        Menghapus beberapa file sekaligus
+        Parameter:
+        - params: daftar nama file
+        data berisi files: status per file (name, status, data)
+        """
+        error = self.check_batch(params)
+        if error:
+            return dict(status='ERROR', data=error)
+        files = []
+        for filename in params:
+            result = self.delete([filename])
+            files.append(dict(name=filename, status=result['status'], data=result['data']))
+        return dict(status='OK', data=dict(files=files))
+
+    def session_lock(self, session_id):
+        """Nama lock sesi multipart; tidak bisa bentrok dengan nama file karena memuat '/'"""
+        return f'{SESSION_DIR}/{session_id}'
+
+    def multipart_begin(self, params=[]):
+        """
+        Memulai sesi upload multipart
+        Parameter:
+        - params[0]: nama file
+        - params[1]: ukuran file
+        - params[2]: ukuran part (semua part kecuali yang terakhir)
+        data berisi id sesi, jumlah part dan ukuran part
+        """
+        try:
+            if len(params) < 3:
+                return dict(status='ERROR', data='Parameter tidak lengkap')
+            filename, size, part_size = params[0], int(params[1]), int(params[2])
+            if not self.is_valid_name(filename):
+                return dict(status='ERROR', data='Nama file tidak valid')
+
+            session = self.sessions.create(filename, size, part_size)
+            logging.info(f"FileInterface: Started upload session {session['id']} for {filename} "
+                         f"({size} bytes, {session['parts']} parts)")
+            return dict(status='OK', data=dict(id=session['id'], parts=session['parts'], part_size=part_size))
+
+        except (SessionError, ValueError) as e:
+            return dict(status='ERROR', data=str(e))
+        except Exception as e:
+            logging.error(f"FileInterface: Error starting upload session: {str(e)}")
+            return dict(status='ERROR', data=str(e))
+
+    def multipart_part(self, params=[]):
+        """
+        Menerima satu part sesi multipart
+        Parameter:
+        - params[0]: id sesi
+        - params[1]: nomor part (mulai 0)
+        - params[2]: SHA-256 isi part
+        - params[3]: isi part, berupa bytes atau stream (lihat iter_chunks)
+        Part tidak memakai lock sehingga part-part sesi yang sama bisa
+        diterima bersamaan; status MISSING berarti sesi sudah tidak ada.
+        """
+        try:
+            if len(params) < 4:
+                return dict(status='ERROR', data='Parameter tidak lengkap')
+            session_id, number, checksum = params[0], params[1], str(params[2]).lower()
+            if not is_digest(checksum):
+                return dict(status='ERROR', data='SHA-256 tidak valid')
+
+            session = self.sessions.load(session_id)
+            length = self.sessions.store_part(session, number, checksum, self.iter_chunks(params[3]))
+            logging.debug(f"FileInterface: Stored part {number} of upload session {session_id} ({length} bytes)")
+            return dict(status='OK', data=f'Part {number} diterima', length=length)
+
+        except SessionMissing as e:
+            return dict(status='MISSING', data=str(e))
+        except SessionError as e:
+            return dict(status='ERROR', data=str(e))
+        except Exception as e:
+            logging.error(f"FileInterface: Error storing upload part: {str(e)}")
+            return dict(status='ERROR', data=str(e))
+
+    def multipart_status(self, params=[]):
+        """
+        Keadaan sesi multipart untuk melanjutkan upload yang terputus
+        Parameter:
+        - params[0]: id sesi
+        data berisi nama file, ukuran, ukuran part, jumlah part dan
+        received: {nomor part: SHA-256} untuk part yang sudah diterima
+        """
+        try:
+            if len(params) < 1:
+                return dict(status='ERROR', data='Id sesi tidak disebutkan')
+            session = self.sessions.load(params[0])
+            received = self.sessions.received(params[0])
+            return dict(status='OK', data=dict(id=session['id'], filename=session['filename'], size=session['size'],
+                                               part_size=session['part_size'], parts=session['parts'],
+                                               received={str(number): checksum
+                                                         for number, checksum in sorted(received.items())}))
+
+        except SessionMissing as e:
+            return dict(status='MISSING', data=str(e))
+        except Exception as e:
+            logging.error(f"FileInterface: Error reading upload session: {str(e)}")
+            return dict(status='ERROR', data=str(e))
+
+    def multipart_commit(self, params=[]):
+        """
+        Merangkai semua part sesi menjadi file tujuan lalu menghapus sesi
+        Parameter:
+        - params[0]: id sesi
+        - params[1]: SHA-256 seluruh file
+        Sesi tetap ada jika ada part yang belum diterima atau checksum
+        tidak cocok, sehingga client bisa mengirim ulang part yang kurang.
+        """
+        try:
+            if len(params) < 2:
+                return dict(status='ERROR', data='Parameter tidak lengkap')
+            session_id, checksum = params[0], str(params[1]).lower()
+            if not is_digest(checksum):
+                return dict(status='ERROR', data='SHA-256 tidak valid')
+
+            # Lock sesi mencegah commit/abort ganda; lock nama file diambil commit_file
+            with self.locks.hold(self.session_lock(session_id)):
+                session = self.sessions.load(session_id)
+                filename = session['filename']
+                fd, temp_name = tempfile.mkstemp(prefix=UPLOAD_TEMP_PREFIX, dir='.')
+                try:
+                    with os.fdopen(fd, 'wb') as out:
+                        size, result_checksum = self.sessions.assemble(session, out)
+                    if result_checksum != checksum:
+                        raise SessionError('Checksum file hasil rangkaian part tidak cocok')
+                except BaseException:
+                    os.remove(temp_name)
+                    raise
+                self.commit_file(temp_name, filename, checksum)
+                self.sessions.remove(session_id)
+
+            logging.info(f"FileInterface: Stored file {filename} ({size} bytes) from "
+                         f"{session['parts']} parts of upload session {session_id}")
+            return dict(status='OK', data=f'File {filename} berhasil disimpan')
+
+        except SessionMissing as e:
+            return dict(status='MISSING', data=str(e))
+        except SessionError as e:
+            return dict(status='ERROR', data=str(e))
+        except Exception as e:
+            logging.error(f"FileInterface: Error committing upload session: {str(e)}")
+            return dict(status='ERROR', data=str(e))
+
+    def multipart_abort(self, params=[]):
+        """
+        Membatalkan sesi multipart dan menghapus part yang sudah diterima
+        Parameter:
+        - params[0]: id sesi
+        """
+        try:
+            if len(params) < 1:
+                return dict(status='ERROR', data='Id sesi tidak disebutkan')
+            session_id = params[0]
+            with self.locks.hold(self.session_lock(session_id)):
+                self.sessions.load(session_id)
+                self.sessions.remove(session_id)
+            logging.info(f"FileInterface: Aborted upload session {session_id}")
+            return dict(status='OK', data=f'Sesi upload {session_id} dibatalkan')
+
+        except SessionMissing as e:
+            return dict(status='MISSING', data=str(e))
+        except Exception as e:
+            logging.error(f"FileInterface: Error aborting upload session: {str(e)}")
+            return dict(status='ERROR', data=str(e))
+
 if __name__=='__main__':
     # Konfigurasi logging
     logging.basicConfig(
@@ -0,0 +1,71 @@
+import os
+import fcntl
+import hashlib
+import threading
+from contextlib import contextmanager
+
+"""
+* file_lock berisi lock tulis per nama file, agar perubahan pada file yang
+  sama (upload, patch, delete) tidak saling menimpa sementara file lain
+  tetap bisa diubah bersamaan
+* pembaca tidak memakai lock: isi baru selalu ditulis ke file sementara
+  lalu dipasang dengan rename atomik, sehingga pembaca yang sudah membuka
+  file tetap membaca versi lama sampai selesai
+* antar thread dalam satu proses dipakai threading.Lock per nama; antar
+  proses worker (--workers) dipakai lock fcntl pada satu byte di file
+  LOCK_FILE, di offset hasil hash nama file, sehingga nama yang berbeda
+  tidak saling menunggu
+"""
+
+LOCK_FILE = '.file-locks'
+# Offset lock fcntl diambil dari 62 bit hash nama (di bawah batas off_t)
+LOCK_OFFSET_BITS = 62
+
+
+class NamedLocks:
+    """
+    Lock tulis per nama file. Entri dibuat saat pertama dipakai dan dibuang
+    lagi begitu tidak ada thread yang memegang atau menunggunya.
+    - path: file lock bersama antar proses (relatif terhadap files/)
+    """
+    def __init__(self, path=LOCK_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.locks = {}
+        self.fd = None
+        self.fd_pid = None
+
+    def lock_fd(self):
+        """fd file lock milik proses ini (lock fcntl tidak diwarisi proses hasil fork)"""
+        with self.lock:
+            if self.fd is None or self.fd_pid != os.getpid():
+                self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                self.fd_pid = os.getpid()
+            return self.fd
+
+    def offset(self, name):
+        digest = hashlib.blake2b(name.encode('utf-8', 'surrogateescape'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big') >> (64 - LOCK_OFFSET_BITS)
+
+    @contextmanager
+    def hold(self, name):
+        """Memegang lock tulis nama file selama blok with"""
+        with self.lock:
+            entry = self.locks.get(name)
+            if entry is None:
+                entry = self.locks[name] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                fd = self.lock_fd()
+                offset = self.offset(name)
+                fcntl.lockf(fd, fcntl.LOCK_EX, 1, offset)
+                try:
+                    yield
+                finally:
+                    fcntl.lockf(fd, fcntl.LOCK_UN, 1, offset)
+        finally:
+            with self.lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self.locks[name]
@@ -0,0 +1,180 @@
+import os
+import sys
+import json
+import time
+import queue
+import random
+import atexit
+import logging
+import logging.handlers
+
+"""
+* file_logging memindahkan penulisan log server ke thread latar belakang:
+  handler thread/event loop hanya memasukkan record ke antrian
+  (QueueHandler), penulisan ke stderr/file dilakukan QueueListener
+* antrian dibatasi; jika penuh record dibuang dan jumlahnya dilaporkan
+  kemudian, sehingga handler tidak pernah menunggu disk
+* setiap request menghasilkan satu baris access log terstruktur (JSON):
+  client, command, file, bytes, durasi dan status
+* isi request (misalnya base64 upload) tidak pernah ditulis utuh ke log,
+  hanya beberapa byte awal lewat echo()
+* record level DEBUG bisa di-sampling agar detail per request tetap
+  terbaca tanpa membanjiri log
+"""
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+LOG_DATEFMT = '%Y-%m-%d %H:%M:%S'
+# Jumlah record yang boleh menunggu ditulis sebelum record baru dibuang
+LOG_QUEUE_SIZE = 10000
+# Panjang maksimum isi request/nama yang ikut ditulis ke log
+LOG_ECHO_LIMIT = 32
+LOG_NAME_LIMIT = 128
+
+access_logger = logging.getLogger('access')
+
+
+def echo(value, limit=LOG_ECHO_LIMIT):
+    """Potongan awal value untuk ditulis ke log, sisanya diringkas jumlahnya saja"""
+    if value is None:
+        return ''
+    if isinstance(value, (bytes, bytearray)):
+        text = bytes(value[:limit]).decode('utf-8', 'replace')
+        return text if len(value) <= limit else f'{text}...(+{len(value) - limit} bytes)'
+    value = str(value)
+    if len(value) <= limit:
+        return value
+    return f'{value[:limit]}...(+{len(value) - limit} chars)'
+
+
+class SampleFilter(logging.Filter):
+    """Meloloskan record DEBUG dengan peluang rate (0..1), level lain selalu lolos"""
+    def __init__(self, rate=1.0):
+        logging.Filter.__init__(self)
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler yang tidak pernah menunggu: jika antrian penuh record
+    dibuang dan dihitung, lalu dilaporkan begitu antrian longgar lagi
+    """
+    def __init__(self, log_queue):
+        logging.handlers.QueueHandler.__init__(self, log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            if self.dropped:
+                dropped = self.dropped
+                self.queue.put_nowait(logging.makeLogRecord(dict(
+                    name='file_logging', levelno=logging.WARNING, levelname='WARNING',
+                    msg=f'{dropped} record log dibuang karena antrian log penuh')))
+                self.dropped -= dropped
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """QueueHandler di root logger dan QueueListener yang menulis ke handler tujuan"""
+    def __init__(self, handlers, queue_size=LOG_QUEUE_SIZE):
+        self.handlers = handlers
+        self.queue_size = queue_size
+        self.queue_handler = DroppingQueueHandler(queue.Queue(queue_size))
+        self.listener = logging.handlers.QueueListener(self.queue_handler.queue, *handlers,
+                                                       respect_handler_level=True)
+
+    def start(self):
+        self.listener.start()
+
+    def stop(self):
+        try:
+            self.listener.stop()
+        except AttributeError:
+            # Listener sudah dihentikan
+            pass
+
+    def restart_in_child(self):
+        """
+        Setelah fork thread listener tidak ikut tersalin: proses worker
+        membuat antrian dan listener sendiri dengan handler yang sama
+        """
+        self.queue_handler.queue = queue.Queue(self.queue_size)
+        self.queue_handler.dropped = 0
+        self.listener = logging.handlers.QueueListener(self.queue_handler.queue, *self.handlers,
+                                                       respect_handler_level=True)
+        self.listener.start()
+
+
+pipeline = None
+
+
+def setup_logging(level=logging.INFO, log_file=None, debug_sample=1.0):
+    """
+    Mengganti handler root logger dengan pipeline antrian
+    - log_file: file tujuan log, None = stderr
+    - debug_sample: bagian record DEBUG yang ditulis (1.0 = semua)
+    """
+    global pipeline
+    formatter = logging.Formatter(LOG_FORMAT, LOG_DATEFMT)
+    target = logging.FileHandler(log_file) if log_file else logging.StreamHandler(sys.stderr)
+    target.setFormatter(formatter)
+
+    root = logging.getLogger()
+    if pipeline is not None:
+        pipeline.stop()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    pipeline = LogPipeline([target])
+    pipeline.queue_handler.addFilter(SampleFilter(debug_sample))
+    root.addHandler(pipeline.queue_handler)
+    root.setLevel(level)
+    pipeline.start()
+    return pipeline
+
+
+def _restart_after_fork():
+    if pipeline is not None:
+        pipeline.restart_in_child()
+
+
+def _stop_at_exit():
+    # Record yang masih di antrian ditulis sebelum proses keluar
+    if pipeline is not None:
+        pipeline.stop()
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
+atexit.register(_stop_at_exit)
+
+
+class AccessRecord:
+    """
+    Data satu request untuk access log. Dibuat server di awal request,
+    diisi FileProtocol (command, file, status) dan server (byte masuk/keluar),
+    lalu ditulis sebagai satu baris JSON dengan emit().
+    """
+    __slots__ = ('client', 'command', 'filename', 'status', 'bytes_in', 'bytes_out', 'started')
+
+    def __init__(self, client):
+        self.client = client
+        self.command = None
+        self.filename = None
+        self.status = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.started = time.perf_counter()
+
+    def emit(self):
+        if self.command is None or not access_logger.isEnabledFor(logging.INFO):
+            return
+        client = f'{self.client[0]}:{self.client[1]}' if isinstance(self.client, tuple) else str(self.client)
+        record = dict(client=client, command=self.command, file=echo(self.filename, LOG_NAME_LIMIT),
+                      bytes_in=self.bytes_in, bytes_out=self.bytes_out,
+                      duration_ms=round((time.perf_counter() - self.started) * 1000, 3), status=self.status)
+        access_logger.info('access ' + json.dumps(record, separators=(',', ':')))
@@ -0,0 +1,209 @@
+import os
+import time
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+"""
+* file_metrics mencatat metrik server di memori proses:
+  - jumlah request per command dan status, histogram latensi per command
+  - byte yang diterima dan dikirim
+  - koneksi aktif, puncak koneksi aktif dan total koneksi
+  - jumlah error per jenis (exception, frame tidak valid, penolakan BUSY)
+* metrik dibaca lewat command STATS (JSON) atau endpoint teks format
+  Prometheus pada port lokal kedua (--metrics-port)
+* pencatatan hanya berupa penambahan penghitung di bawah satu lock,
+  waktu diukur dengan time.perf_counter()
+"""
+
+# Batas atas bucket histogram latensi (detik), bucket terakhir +Inf implisit
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_PREFIX = 'file_server'
+METRICS_HOST = '127.0.0.1'
+
+
+class Histogram:
+    """Histogram latensi dengan bucket tetap (tidak menyimpan sampel)"""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self):
+        """Pasangan (batas atas, jumlah kumulatif) seperti bucket Prometheus"""
+        running = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            running += count
+            yield bound, running
+
+    def quantile(self, q):
+        """Perkiraan kuantil: batas atas bucket tempat kuantil q berada"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        for bound, running in self.cumulative():
+            if running >= target:
+                return bound if bound != float('inf') else self.buckets[-1]
+        return self.buckets[-1]
+
+    def summary(self):
+        return dict(count=self.count, sum=round(self.total, 6),
+                    mean=round(self.total / self.count, 6) if self.count else 0.0,
+                    p50=self.quantile(0.5), p95=self.quantile(0.95), p99=self.quantile(0.99))
+
+
+class ServerMetrics:
+    """
+    Penghitung metrik satu proses server, aman dipakai banyak thread.
+    Pada mode --workers setiap worker punya ServerMetrics sendiri.
+    - info: keterangan server (mode, ukuran pool, worker) yang diisi saat start
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.requests = {}
+        self.latency = {}
+        self.errors = {}
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.connections_active = 0
+        self.connections_peak = 0
+        self.connections_total = 0
+        self.requests_active = 0
+        self.info = {}
+
+    def begin_request(self):
+        with self.lock:
+            self.requests_active += 1
+
+    def end_request(self, command, seconds, status):
+        """Mencatat satu request yang selesai diproses"""
+        with self.lock:
+            self.requests_active -= 1
+            key = (command, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.latency.get(command)
+            if histogram is None:
+                histogram = self.latency[command] = Histogram()
+            histogram.observe(seconds)
+
+    def error(self, kind):
+        with self.lock:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def add_received(self, size):
+        if size:
+            with self.lock:
+                self.bytes_received += size
+
+    def add_sent(self, size):
+        if size:
+            with self.lock:
+                self.bytes_sent += size
+
+    def connection_opened(self):
+        with self.lock:
+            self.connections_active += 1
+            self.connections_total += 1
+            if self.connections_active > self.connections_peak:
+                self.connections_peak = self.connections_active
+
+    def connection_closed(self):
+        with self.lock:
+            self.connections_active -= 1
+
+    def snapshot(self):
+        """Seluruh metrik dalam bentuk dict (untuk respons STATS)"""
+        with self.lock:
+            commands = {}
+            for (command, status), count in self.requests.items():
+                entry = commands.setdefault(command, dict(requests=0, statuses={}))
+                entry['requests'] += count
+                entry['statuses'][status] = count
+            for command, histogram in self.latency.items():
+                commands[command]['latency'] = histogram.summary()
+            return dict(pid=os.getpid(), uptime=round(time.time() - self.started, 3),
+                        threads=threading.active_count(), info=dict(self.info),
+                        connections=dict(active=self.connections_active, peak=self.connections_peak,
+                                         total=self.connections_total),
+                        requests_active=self.requests_active,
+                        bytes=dict(received=self.bytes_received, sent=self.bytes_sent),
+                        commands=commands, errors=dict(self.errors))
+
+    def prometheus(self, extra=None):
+        """
+        Metrik dalam format teks exposition Prometheus
+        - extra: dict nama -> (tipe, nilai) untuk gauge/counter tambahan (cache, indeks)
+        """
+        p = METRICS_PREFIX
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {p}_{name} {help_text}')
+            lines.append(f'# TYPE {p}_{name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{p}_{name}{labels} {value}')
+
+        with self.lock:
+            metric('requests_total', 'counter', 'Jumlah request per command dan status',
+                   [(f'{{command="{command}",status="{status}"}}', count)
+                    for (command, status), count in sorted(self.requests.items())])
+            lines.append(f'# HELP {p}_request_duration_seconds Lama pemrosesan request per command')
+            lines.append(f'# TYPE {p}_request_duration_seconds histogram')
+            for command, histogram in sorted(self.latency.items()):
+                for bound, running in histogram.cumulative():
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{p}_request_duration_seconds_bucket{{command="{command}",le="{le}"}} {running}')
+                lines.append(f'{p}_request_duration_seconds_sum{{command="{command}"}} {histogram.total:.6f}')
+                lines.append(f'{p}_request_duration_seconds_count{{command="{command}"}} {histogram.count}')
+            metric('errors_total', 'counter', 'Jumlah error per jenis',
+                   [(f'{{type="{kind}"}}', count) for kind, count in sorted(self.errors.items())])
+            metric('received_bytes_total', 'counter', 'Byte yang diterima dari client',
+                   [('', self.bytes_received)])
+            metric('sent_bytes_total', 'counter', 'Byte yang dikirim ke client', [('', self.bytes_sent)])
+            metric('connections_active', 'gauge', 'Koneksi yang sedang terbuka', [('', self.connections_active)])
+            metric('connections_peak', 'gauge', 'Puncak koneksi terbuka bersamaan', [('', self.connections_peak)])
+            metric('connections_total', 'counter', 'Total koneksi yang diterima', [('', self.connections_total)])
+            metric('requests_active', 'gauge', 'Request yang sedang diproses', [('', self.requests_active)])
+        metric('threads', 'gauge', 'Jumlah thread proses server', [('', threading.active_count())])
+        metric('uptime_seconds', 'gauge', 'Lama proses server berjalan', [('', round(time.time() - self.started, 3))])
+        for name, (kind, value) in sorted((extra or {}).items()):
+            metric(name, kind, name.replace('_', ' '), [('', value)])
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """GET /metrics: metrik format Prometheus dari server.render()"""
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.server.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_endpoint(port, render, host=METRICS_HOST):
+    """
+    Menjalankan endpoint HTTP metrik di thread daemon
+    - render: fungsi tanpa argumen yang menghasilkan teks metrik
+    """
+    httpd = ThreadingHTTPServer((host, port), MetricsHandler)
+    httpd.daemon_threads = True
+    httpd.render = render
+    threading.Thread(target=httpd.serve_forever, name='metrics-endpoint', daemon=True).start()
+    logging.info(f"Endpoint metrik berjalan di http://{host}:{port}/metrics")
+    return httpd
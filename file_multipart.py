@@ -0,0 +1,211 @@
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import logging
+
+"""
+* file_multipart menyimpan sesi upload multipart: file besar dikirim
+  sebagai bagian-bagian (part) bernomor yang boleh diunggah paralel lewat
+  beberapa koneksi, diulang sendiri-sendiri jika gagal, lalu dirangkai
+  menjadi satu file saat sesi di-commit
+* setiap sesi berupa direktori .sessions/<id>/ berisi session.json
+  (nama file, ukuran, ukuran part) dan satu file per part bernama
+  part-<nomor>.<sha256>; daftar part yang sudah diterima dibaca dari isi
+  direktori sehingga part tidak perlu menulis ke satu file bersama dan
+  sesi bisa dilayani worker mana pun
+* SHA-256 setiap part diperiksa saat diterima, SHA-256 seluruh file
+  diperiksa saat dirangkai
+* sesi yang tidak disentuh lebih dari ttl detik dianggap ditinggalkan
+  dan dihapus (saat server start dan berkala saat sesi baru dibuat)
+"""
+
+SESSION_DIR = '.sessions'
+SESSION_MANIFEST = 'session.json'
+# Lama sesi boleh tidak aktif sebelum dihapus (detik)
+SESSION_TTL = 24 * 3600
+# Jeda minimum antar pembersihan sesi yang ditinggalkan (detik)
+SESSION_GC_INTERVAL = 600
+# Batas ukuran part; part terakhir boleh lebih kecil dari MIN_PART_SIZE
+MIN_PART_SIZE = 64 * 1024
+MAX_PART_SIZE = 256 * 1024 * 1024
+MAX_PARTS = 10000
+SESSION_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+PART_PATTERN = re.compile(r'^part-(\d+)\.([0-9a-f]{64})$')
+PART_TEMP_PREFIX = '.tmp-'
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class SessionError(Exception):
+    """Request multipart tidak valid untuk sesi ini (part salah, checksum tidak cocok, ...)"""
+    pass
+
+
+class SessionMissing(SessionError):
+    """Sesi tidak ada: belum dibuat, sudah di-commit/abort atau dihapus karena kedaluwarsa"""
+    pass
+
+
+def part_count(size, part_size):
+    return (size + part_size - 1) // part_size
+
+
+class UploadSessions:
+    """
+    Sesi upload multipart di root (relatif terhadap files/)
+    - ttl: lama sesi boleh tidak aktif sebelum dihapus collect_garbage()
+    """
+    def __init__(self, root=SESSION_DIR, ttl=SESSION_TTL):
+        self.root = root
+        self.ttl = ttl
+        self.last_gc = 0.0
+
+    def directory(self, session_id):
+        if not isinstance(session_id, str) or not SESSION_ID_PATTERN.match(session_id):
+            raise SessionMissing(f'Sesi upload {session_id} tidak ditemukan')
+        return os.path.join(self.root, session_id)
+
+    def create(self, filename, size, part_size):
+        """Membuat sesi baru untuk filename, mengembalikan manifest sesi"""
+        if size < 0:
+            raise SessionError('Ukuran file tidak valid')
+        if not MIN_PART_SIZE <= part_size <= MAX_PART_SIZE:
+            raise SessionError(f'Ukuran part harus antara {MIN_PART_SIZE} dan {MAX_PART_SIZE} bytes')
+        if part_count(size, part_size) > MAX_PARTS:
+            raise SessionError(f'Jumlah part melebihi {MAX_PARTS}, perbesar ukuran part')
+        self.collect_garbage()
+
+        session = dict(id=os.urandom(16).hex(), filename=filename, size=size, part_size=part_size,
+                       parts=part_count(size, part_size), created=time.time())
+        directory = self.directory(session['id'])
+        os.makedirs(directory)
+        temp_name = os.path.join(directory, PART_TEMP_PREFIX + SESSION_MANIFEST)
+        with open(temp_name, 'w') as fp:
+            json.dump(session, fp)
+        os.replace(temp_name, os.path.join(directory, SESSION_MANIFEST))
+        return session
+
+    def load(self, session_id):
+        """Manifest sesi, SessionMissing jika sesi tidak ada"""
+        try:
+            with open(os.path.join(self.directory(session_id), SESSION_MANIFEST)) as fp:
+                return json.load(fp)
+        except (FileNotFoundError, ValueError):
+            raise SessionMissing(f'Sesi upload {session_id} tidak ditemukan')
+
+    def part_length(self, session, number):
+        """Panjang part ke-number (mulai 0), SessionError jika nomor di luar sesi"""
+        if not isinstance(number, int) or not 0 <= number < session['parts']:
+            raise SessionError(f'Nomor part {number} di luar 0..{session["parts"] - 1}')
+        return min(session['part_size'], session['size'] - number * session['part_size'])
+
+    def received(self, session_id):
+        """Part yang sudah diterima: dict nomor -> SHA-256"""
+        parts = {}
+        try:
+            names = os.listdir(self.directory(session_id))
+        except FileNotFoundError:
+            raise SessionMissing(f'Sesi upload {session_id} tidak ditemukan')
+        for name in names:
+            match = PART_PATTERN.match(name)
+            if match:
+                parts[int(match.group(1))] = match.group(2)
+        return parts
+
+    def store_part(self, session, number, checksum, chunks):
+        """
+        Menulis isi part dari iterable potongan bytes, memeriksa panjang
+        dan SHA-256-nya, lalu memasangnya dengan rename. Part yang sama
+        boleh dikirim ulang; isi lama diganti.
+        """
+        length = self.part_length(session, number)
+        directory = self.directory(session['id'])
+        temp_name = os.path.join(directory, f'{PART_TEMP_PREFIX}{number}-{os.urandom(4).hex()}')
+        try:
+            digest = hashlib.sha256()
+            written = 0
+            with open(temp_name, 'wb') as fp:
+                # Payload selalu dibaca habis (menutup iterator di tengah jalan ikut
+                # menutup payload frame), kelebihannya tidak ditulis
+                for chunk in chunks:
+                    if written + len(chunk) <= length:
+                        fp.write(chunk)
+                        digest.update(chunk)
+                    written += len(chunk)
+            if written > length:
+                raise SessionError(f'Part {number} melebihi {length} bytes')
+            if written != length:
+                raise SessionError(f'Part {number} berisi {written} dari {length} bytes')
+            if digest.hexdigest() != checksum:
+                raise SessionError(f'Checksum part {number} tidak cocok')
+            os.replace(temp_name, os.path.join(directory, f'part-{number}.{checksum}'))
+        except FileNotFoundError:
+            # Direktori sesi dihapus (commit/abort/kedaluwarsa) selama part diterima
+            raise SessionMissing(f'Sesi upload {session["id"]} tidak ditemukan')
+        finally:
+            if os.path.lexists(temp_name):
+                os.remove(temp_name)
+        # Part yang dikirim ulang dengan isi berbeda menggantikan versi sebelumnya
+        for name in os.listdir(directory):
+            match = PART_PATTERN.match(name)
+            if match and int(match.group(1)) == number and match.group(2) != checksum:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass
+        return length
+
+    def assemble(self, session, out):
+        """
+        Merangkai semua part berurutan ke file terbuka out.
+        Mengembalikan (ukuran, SHA-256) hasil, SessionError jika ada part yang belum diterima.
+        """
+        parts = self.received(session['id'])
+        missing = [number for number in range(session['parts']) if number not in parts]
+        if missing:
+            raise SessionError(f'{len(missing)} part belum diterima, misalnya part {missing[0]}')
+        directory = self.directory(session['id'])
+        digest = hashlib.sha256()
+        size = 0
+        for number in range(session['parts']):
+            with open(os.path.join(directory, f'part-{number}.{parts[number]}'), 'rb') as part:
+                while True:
+                    chunk = part.read(COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+        return size, digest.hexdigest()
+
+    def remove(self, session_id):
+        shutil.rmtree(self.directory(session_id), ignore_errors=True)
+
+    def collect_garbage(self, force=False):
+        """
+        Menghapus sesi yang tidak aktif lebih dari ttl detik (dilihat dari
+        mtime direktori sesi, yang berubah setiap ada part masuk).
+        Tanpa force dijalankan paling sering sekali per SESSION_GC_INTERVAL.
+        """
+        now = time.time()
+        if not force and now - self.last_gc < SESSION_GC_INTERVAL:
+            return 0
+        self.last_gc = now
+        removed = 0
+        try:
+            it = os.scandir(self.root)
+        except FileNotFoundError:
+            return 0
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False) and now - entry.stat().st_mtime > self.ttl:
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                        removed += 1
+                except OSError:
+                    continue
+        if removed:
+            logging.info(f"UploadSessions: Removed {removed} abandoned upload session(s)")
+        return removed
@@ -1,8 +1,170 @@
+import os
 import json
 import logging
-import shlex
 import base64
-from file_interface import FileInterface
+import io
+import re
+import time
+import tempfile
+from file_interface import FileInterface, FileRange
+from file_frame import PROTOCOL_VERSION, FrameError
+from file_delta import DeltaError, encode_signature, decode_signature
+from file_compress import (CODECS, DEFAULT_COMPRESS_LEVEL, SAMPLE_SIZE, CompressionError, select_codec,
+                           check_codec, worth_compressing, read_sample, compress_file, iter_compress,
+                           iter_decompress)
+from file_metrics import ServerMetrics
+from file_logging import echo
+from file_replication import ReplicaState
+from file_watch import ChangeFeed, WATCH_HEARTBEAT
+from file_request import split_command
+
+# Awal nilai filedata pada request upload JSON
+FILEDATA_PATTERN = re.compile(rb'"filedata"\s*:\s*"')
+# Batas ukuran bagian JSON di luar filedata (command, filename, dll)
+MAX_JSON_HEAD = 64 * 1024
+# Batas ukuran signature yang dikirim client pada DELTA
+MAX_SIGNATURE_SIZE = 16 * 1024 * 1024
+# Command yang dicatat namanya di metrik, selain itu dicatat sebagai UNKNOWN
+KNOWN_COMMANDS = frozenset(['HELLO', 'LIST', 'GET', 'MGET', 'UPLOAD', 'MUPLOAD', 'UPLOADHASH', 'DELETE',
+                            'MDELETE', 'SIGNATURE', 'DELTA', 'PATCH', 'STATS', 'MPBEGIN', 'MPPART', 'MPSTATUS',
+                            'MPCOMMIT', 'MPABORT', 'REPL', 'WATCH'])
+# Command yang mengubah file, ditolak pada server replica (hanya baca)
+WRITE_COMMANDS = frozenset(['UPLOAD', 'MUPLOAD', 'UPLOADHASH', 'DELETE', 'MDELETE', 'PATCH', 'MPBEGIN', 'MPPART',
+                            'MPCOMMIT', 'MPABORT'])
+# Command yang parameternya bukan nama file (tidak ditulis sebagai file di access log)
+NO_FILE_COMMANDS = frozenset(['HELLO', 'LIST', 'STATS', 'WATCH', 'UNKNOWN'])
+# Status respons v1 dibaca dari awal string JSON tanpa mengurai seluruh respons
+STATUS_PATTERN = re.compile(r'"status":\s*"(\w+)"')
+
+
+class Envelope:
+    """
+    Respons tetap yang sering dikirim (parameter kurang, command tidak
+    dikenali, ...): string JSON v1-nya dibuat sekali saat modul dimuat,
+    bukan di-serialize ulang setiap request
+    """
+    __slots__ = ('result', 'text')
+
+    def __init__(self, status, data):
+        self.result = dict(status=status, data=data)
+        self.text = json.dumps(self.result)
+
+    def copy(self):
+        """Dict respons untuk frame v2 (salinan, boleh diubah pemanggil)"""
+        return dict(self.result)
+
+
+UNKNOWN_REQUEST = Envelope('ERROR', 'request tidak dikenali')
+MISSING_FILENAME = Envelope('ERROR', 'Nama file tidak disebutkan')
+MISSING_CHECKSUM = Envelope('ERROR', 'Nama file dan SHA-256 harus disebutkan')
+MISSING_PARAMS = Envelope('ERROR', 'Parameter tidak lengkap')
+INVALID_PARAMS = Envelope('ERROR', 'params harus berupa list')
+READ_ONLY = Envelope('ERROR', 'Server ini replica (hanya baca), kirim perubahan ke server primary')
+
+class JsonUploadReader:
+    """
+    Membaca request upload JSON (protokol v1) secara inkremental dari
+    SocketReader. Nilai filedata (base64) di-decode sepotong demi
+    sepotong sehingga memori per koneksi tetap kecil berapapun ukuran file.
+    """
+    def __init__(self, reader):
+        self.reader = reader
+        self.head = b''
+        self.tail = b''
+        self.tail_read = False
+
+    def is_complete(self, data):
+        """Cek apakah data sudah berisi request JSON yang utuh"""
+        if b"\r\n\r\n" in data:
+            return True
+        try:
+            json.loads(data)
+            return True
+        except ValueError:
+            return False
+
+    def read_head(self):
+        """
+        Membaca bagian JSON sebelum nilai filedata.
+        Mengembalikan True jika filedata ditemukan, False jika request
+        sudah lengkap tanpa filedata (seluruh request ada di self.head).
+        """
+        buffer = self.reader.buffer
+        while True:
+            match = FILEDATA_PATTERN.search(buffer)
+            if match:
+                self.head = bytes(buffer[:match.start()])
+                del buffer[:match.end()]
+                return True
+            if self.is_complete(buffer):
+                self.head = bytes(buffer).split(b"\r\n\r\n")[0]
+                buffer.clear()
+                return False
+            if len(buffer) > MAX_JSON_HEAD:
+                raise ValueError('Request JSON terlalu besar')
+            if not self.reader.fill():
+                self.head = bytes(buffer)
+                buffer.clear()
+                return False
+
+    def iter_filedata(self):
+        """Menghasilkan isi file hasil decode base64, sepotong demi sepotong"""
+        buffer = self.reader.buffer
+        remainder = b''
+        while True:
+            if not buffer and not self.reader.fill():
+                raise FrameError('Koneksi terputus sebelum filedata lengkap diterima')
+            end = buffer.find(b'"')
+            if end >= 0:
+                chunk = bytes(buffer[:end])
+                del buffer[:end + 1]
+            else:
+                chunk = bytes(buffer)
+                buffer.clear()
+            # JSON boleh meng-escape '/' menjadi '\/', base64 sendiri tidak memakai backslash
+            chunk = remainder + chunk.replace(b'\\', b'')
+            usable = len(chunk) - len(chunk) % 4
+            if usable:
+                yield base64.b64decode(chunk[:usable])
+            remainder = chunk[usable:]
+            if end >= 0:
+                if remainder:
+                    yield base64.b64decode(remainder)
+                return
+
+    def read_tail(self):
+        """Membaca sisa JSON setelah nilai filedata sampai request berakhir (sekali saja)"""
+        if self.tail_read:
+            return
+        self.tail_read = True
+        buffer = self.reader.buffer
+        while True:
+            end = buffer.find(b"\r\n\r\n")
+            if end >= 0:
+                self.tail = bytes(buffer[:end])
+                del buffer[:end + 4]
+                return
+            if self.is_complete(self.head + b'"filedata": ""' + buffer):
+                self.tail = bytes(buffer)
+                buffer.clear()
+                return
+            if len(buffer) > MAX_JSON_HEAD:
+                raise ValueError('Request JSON terlalu besar')
+            if not self.reader.fill():
+                self.tail = bytes(buffer)
+                buffer.clear()
+                return
+
+    def metadata(self):
+        """Field JSON selain filedata yang sudah diterima sejauh ini"""
+        try:
+            if self.tail:
+                return json.loads(self.head + b'"filedata": ""' + self.tail)
+            # Tail belum dibaca, tutup objek JSON setelah field terakhir
+            return json.loads(self.head.rstrip().rstrip(b',') + b'}')
+        except ValueError:
+            return {}
+
 
 """
 * class FileProtocol bertugas untuk memproses 
@@ -16,72 +178,616 @@ string
 class FileProtocol:
     def __init__(self):
         self.file = FileInterface()
-    
-    def proses_string(self, string_datamasuk=''):
-        logging.warning(f"string diproses: {string_datamasuk}")
-        
-        # Cek apakah input adalah JSON (untuk upload file)
+        # Level kompresi untuk respons GET yang dikompresi
+        self.compress_level = DEFAULT_COMPRESS_LEVEL
+        # Batas isi upload terkompresi setelah didekompresi (--max-request-bytes, 0 = tanpa batas)
+        self.max_request_bytes = 0
+        self.metrics = ServerMetrics()
+        # Replikasi: Replicator (primary), ReplicaState (replica) atau None
+        self.replication = None
+        # Event perubahan file untuk koneksi WATCH
+        self.watch = ChangeFeed(self.file.index)
+        # Tabel dispatch command -> handler, satu lookup per request menggantikan rantai if/elif
+        # v1: handler(params) mengembalikan string JSON respons
+        self.string_handlers = dict(
+            HELLO=self.string_hello, LIST=self.string_list, GET=self.string_get, MGET=self.string_mget,
+            UPLOADHASH=self.string_uploadhash, DELETE=self.string_delete, MDELETE=self.string_mdelete,
+            STATS=self.string_stats)
+        # v2: handler(params, header, payload) mengembalikan (header respons, payload respons)
+        self.frame_handlers = dict(
+            LIST=self.frame_list, GET=self.frame_get, UPLOAD=self.frame_upload, MGET=self.frame_mget,
+            MUPLOAD=self.frame_mupload, UPLOADHASH=self.frame_uploadhash, SIGNATURE=self.frame_signature,
+            DELTA=self.frame_delta, PATCH=self.frame_patch, DELETE=self.frame_delete, MDELETE=self.frame_mdelete,
+            STATS=self.frame_stats, MPBEGIN=self.frame_mpbegin, MPPART=self.frame_mppart,
+            MPSTATUS=self.frame_mpstatus, MPCOMMIT=self.frame_mpcommit, MPABORT=self.frame_mpabort,
+            REPL=self.frame_repl)
+
+    @property
+    def read_only(self):
+        """Server replica hanya menerima perubahan file dari primary (REPL)"""
+        return isinstance(self.replication, ReplicaState)
+
+    def read_only_result(self):
+        return READ_ONLY.copy()
+
+    def upload_content(self, filename, content):
+        """Menyimpan isi upload protokol v1, ditolak pada server replica"""
+        if self.read_only:
+            return self.read_only_result()
+        return self.file.upload([filename, content])
+
+    def command_label(self, command):
+        command = str(command).upper()
+        return command if command in KNOWN_COMMANDS else 'UNKNOWN'
+
+    def response_status(self, hasil):
+        match = STATUS_PATTERN.search(hasil, 0, 64)
+        return match.group(1) if match else 'UNKNOWN'
+
+    def proses_string(self, string_datamasuk='', access=None):
+        """
+        Memproses request teks/JSON protokol v1, lama pemrosesan dicatat di metrik
+        - access: AccessRecord request ini (opsional), diisi command, file dan status
+        """
+        words = string_datamasuk.split(None, 2)
+        command = 'UPLOAD' if string_datamasuk.lstrip().startswith('{') else self.command_label(words[0] if words else '')
+        if access is not None:
+            access.command = command
+            if command not in NO_FILE_COMMANDS and command != 'UPLOAD' and len(words) > 1:
+                access.filename = words[1].strip('"\'')
+        started = time.perf_counter()
+        self.metrics.begin_request()
+        hasil = None
         try:
-            json_data = json.loads(string_datamasuk)
-            if 'command' in json_data and json_data['command'] == 'upload':
-                # Proses upload file
-                filename = json_data.get('filename', '')
-                filedata = json_data.get('filedata', '')
-                
-                # Decode file dari base64
-                file_content = base64.b64decode(filedata)
-                
-                # Simpan file menggunakan interface
-                result = self.file.upload([filename, file_content])
-                return json.dumps(result)
-        except ValueError:
-            # Bukan JSON, lanjutkan pemrosesan command biasa
-            pass
+            hasil = self.handle_string(string_datamasuk)
+            return hasil
+        finally:
+            status = self.response_status(hasil) if hasil is not None else 'EXCEPTION'
+            self.metrics.end_request(command, time.perf_counter() - started, status)
+            if access is not None:
+                access.status = status
+
+    def handle_string(self, string_datamasuk=''):
+        # Isi request (misalnya base64 upload) hanya ditulis beberapa byte awalnya
+        logging.debug(f"string diproses: {echo(string_datamasuk)}")
+        
+        # Request JSON (upload file) dikenali dari karakter pertamanya, command
+        # teks tidak perlu dicoba di-decode sebagai JSON lebih dulu
+        if string_datamasuk.lstrip().startswith('{'):
+            try:
+                json_data = json.loads(string_datamasuk)
+                if isinstance(json_data, dict) and json_data.get('command') == 'upload':
+                    # Proses upload file
+                    filename = json_data.get('filename', '')
+                    filedata = json_data.get('filedata', '')
+
+                    # Decode file dari base64
+                    file_content = base64.b64decode(filedata)
+
+                    # Simpan file menggunakan interface
+                    result = self.upload_content(filename, file_content)
+                    return json.dumps(result)
+            except ValueError:
+                # Bukan JSON, lanjutkan pemrosesan command biasa
+                pass
         
         try:
-            # Split command dengan shlex untuk handle spasi di nama file
-            c = shlex.split(string_datamasuk)
-            c_request = c[0].upper()  # Standarisasi ke uppercase
-            
-            logging.warning(f"memproses request: {c_request}")
-            
-            # Proses berdasarkan tipe request
-            if c_request == 'LIST':
-                result = self.file.list([])
-                return json.dumps(result)
+            # Command dari kata pertama (huruf besar), shlex hanya untuk parameter berkutip
+            c_request, params = split_command(string_datamasuk)
             
-            elif c_request == 'GET':
-                if len(c) < 2:
-                    return json.dumps(dict(status='ERROR', data='Nama file tidak disebutkan'))
-                
-                filename = c[1]
-                result = self.file.get([filename])
-                
-                # Jika berhasil dan ada file_content dalam hasil
-                if result['status'] == 'OK' and 'file_content' in result:
-                    # Encode file content ke base64 dan tambahkan ke response
-                    file_content_base64 = base64.b64encode(result['file_content']).decode()
-                    result['data_file'] = file_content_base64
-                    # Hapus file_content dari response karena sudah direpresentasikan sebagai base64
-                    del result['file_content']
-                
-                return json.dumps(result)
-            
-            elif c_request == 'DELETE':
-                if len(c) < 2:
-                    return json.dumps(dict(status='ERROR', data='Nama file tidak disebutkan'))
+            logging.debug(f"memproses request: {c_request}")
+
+            if self.read_only and c_request in WRITE_COMMANDS:
+                return READ_ONLY.text
+
+            handler = self.string_handlers.get(c_request)
+            if handler is None:
+                return UNKNOWN_REQUEST.text
+            return handler(params)
                 
-                filename = c[1]
-                result = self.file.delete([filename])
-                return json.dumps(result)
-            
+        except Exception as e:
+            logging.error(f"Error: {str(e)}")
+            self.metrics.error(type(e).__name__)
+            return json.dumps(dict(status='ERROR', data=f'terjadi kesalahan: {str(e)}'))
+
+    def string_hello(self, params):
+        # Negosiasi versi protokol, client menyebutkan versi tertinggi yang didukung
+        return json.dumps(self.hello(params))
+
+    def string_list(self, params):
+        # LIST [prefix=.. sort=.. limit=.. cursor=..]
+        return json.dumps(self.file.list(params))
+
+    def string_get(self, params):
+        if not params:
+            return MISSING_FILENAME.text
+        # GET nama [offset [length]] [encoding=codec1,codec2] [if-none-match=etag]
+        args = [params[0]] + [arg for arg in params[1:] if '=' not in arg]
+        options = dict(arg.split('=', 1) for arg in params[1:] if '=' in arg)
+        return self.get_string(args[:3], options.get('encoding'), options.get('if-none-match'))
+
+    def string_mget(self, params):
+        # MGET nama1 nama2 ...: beberapa file dalam satu respons
+        return json.dumps(self.mget_string(params))
+
+    def string_uploadhash(self, params):
+        # UPLOADHASH nama sha256: upload tanpa isi jika isi sudah ada di server
+        if len(params) < 2:
+            return MISSING_CHECKSUM.text
+        return json.dumps(self.file.upload_hash(params[:2]))
+
+    def string_delete(self, params):
+        if not params:
+            return MISSING_FILENAME.text
+        return json.dumps(self.file.delete(params[:1]))
+
+    def string_mdelete(self, params):
+        # MDELETE nama1 nama2 ...: status dilaporkan per file
+        return json.dumps(self.file.mdelete(params))
+
+    def string_stats(self, params):
+        # Metrik server: request, latensi, byte, koneksi, error, cache
+        return json.dumps(self.stats())
+
+    def proses_upload_stream(self, reader, access=None):
+        """
+        Memproses request JSON (protokol v1) langsung dari socket.
+        Upload ditulis ke disk sambil diterima tanpa menampung seluruh
+        request di memori. Mengembalikan respons dalam bentuk string JSON.
+        """
+        started = time.perf_counter()
+        self.metrics.begin_request()
+        if access is not None:
+            access.command = 'UPLOAD'
+        hasil = None
+        try:
+            hasil = self.handle_upload_stream(reader, access)
+            return hasil
+        finally:
+            status = self.response_status(hasil) if hasil is not None else 'EXCEPTION'
+            self.metrics.end_request('UPLOAD', time.perf_counter() - started, status)
+            if access is not None:
+                access.status = status
+
+    def handle_upload_stream(self, reader, access=None):
+        upload = JsonUploadReader(reader)
+        try:
+            if not upload.read_head():
+                # Request JSON tanpa filedata, proses seperti biasa
+                return self.handle_string(upload.head.decode('utf-8'))
+
+            meta = upload.metadata()
+            filename = meta.get('filename', '')
+            filedata = upload.iter_filedata()
+
+            if meta.get('command') == 'upload' and filename:
+                logging.debug(f"memproses upload stream: {filename}")
+                if access is not None:
+                    access.filename = filename
+                codec = meta.get('encoding')
+                content = self.iter_upload_content(upload, filedata, codec)
+                if codec:
+                    # filedata terkompresi didekompresi sambil ditulis ke disk
+                    content = iter_decompress(content, check_codec(codec), self.max_request_bytes)
+                result = self.upload_content(filename, content)
+                # Pastikan sisa request terbaca walaupun upload ditolak
+                for _ in filedata:
+                    pass
+                upload.read_tail()
             else:
-                return json.dumps(dict(status='ERROR', data='request tidak dikenali'))
-                
+                # Command/filename dikirim setelah filedata, tampung dulu di file sementara
+                with tempfile.TemporaryFile(dir='.') as spool:
+                    for chunk in filedata:
+                        spool.write(chunk)
+                    upload.read_tail()
+                    meta = upload.metadata()
+                    if meta.get('command') != 'upload':
+                        return json.dumps(dict(status='ERROR', data='request tidak dikenali'))
+                    filename = meta.get('filename', '')
+                    logging.debug(f"memproses upload stream: {filename}")
+                    if access is not None:
+                        access.filename = filename
+                    spool.seek(0)
+                    content = spool
+                    if meta.get('encoding'):
+                        content = iter_decompress(self.file.iter_chunks(spool), check_codec(meta['encoding']),
+                                                  self.max_request_bytes)
+                    result = self.upload_content(filename, content)
+            return json.dumps(result)
+
         except Exception as e:
             logging.error(f"Error: {str(e)}")
+            self.metrics.error(type(e).__name__)
             return json.dumps(dict(status='ERROR', data=f'terjadi kesalahan: {str(e)}'))
 
+    def iter_upload_content(self, upload, filedata, codec):
+        """
+        Isi upload JSON yang ditulis ke file sementara. Sisa JSON setelah
+        filedata dibaca sebelum upload dipasang: encoding yang baru muncul di
+        sana ditolak (encoding harus mendahului filedata), sehingga isi yang
+        masih terkompresi tidak pernah tersimpan.
+        """
+        yield from filedata
+        upload.read_tail()
+        if not codec and upload.metadata().get('encoding'):
+            raise CompressionError('encoding harus dikirim sebelum filedata')
+
+    def hello(self, params=[]):
+        """
+        Menentukan versi protokol yang dipakai pada koneksi ini
+        Parameter:
+        - params[0]: versi tertinggi yang didukung client (default 1)
+        """
+        try:
+            requested = int(params[0]) if params else 1
+        except ValueError:
+            return dict(status='ERROR', data='Versi protokol tidak valid')
+        version = max(1, min(requested, PROTOCOL_VERSION))
+        return dict(status='OK', data=dict(version=version, versions=list(range(1, PROTOCOL_VERSION + 1)),
+                                           codecs=list(CODECS)))
+
+    def stats(self):
+        """Respons STATS: metrik proses ini ditambah statistik cache dan indeks file"""
+        data = self.metrics.snapshot()
+        data['cache'] = self.file.cache.stats()
+        data['files'] = len(self.file.index.entries)
+        if self.replication is not None:
+            data['replication'] = self.replication.status()
+        data['watch'] = self.watch.status()
+        return dict(status='OK', data=data)
+
+    def prometheus(self):
+        """Teks metrik untuk endpoint --metrics-port"""
+        cache = self.file.cache.stats()
+        extra = dict(
+            cache_hits_total=('counter', cache['hits']), cache_misses_total=('counter', cache['misses']),
+            cache_evictions_total=('counter', cache['evictions']), cache_entries=('gauge', cache['entries']),
+            cache_bytes=('gauge', cache['bytes']), files=('gauge', len(self.file.index.entries)))
+        if self.replication is not None:
+            extra.update(self.replication.metrics())
+        extra.update(self.watch.metrics())
+        return self.metrics.prometheus(extra)
+
+    def watch_params(self, request):
+        """
+        Parameter WATCH jika request (string protokol v1 atau header frame v2)
+        adalah command WATCH, None untuk command lain. Koneksi WATCH dilayani
+        engine server lewat open_watch, bukan proses_string/proses_frame,
+        karena koneksinya tetap terbuka untuk mengalirkan event.
+        """
+        if isinstance(request, dict):
+            if str(request.get('command', '')).upper() != 'WATCH':
+                return None
+            params = request.get('params', [])
+            return params if isinstance(params, list) else [params]
+        words = request.split(None, 1)
+        if not words or words[0].upper() != 'WATCH':
+            return None
+        try:
+            return split_command(request)[1]
+        except ValueError:
+            return words[1:]
+
+    def open_watch(self, params, notify=None, access=None):
+        """
+        WATCH [prefix=<awalan nama>]: berlangganan event perubahan file.
+        Mengembalikan (respons, Subscription), Subscription None jika request
+        ditolak. Engine server mengirim respons lalu meneruskan event dari
+        Subscription sampai client menutup koneksi atau antriannya penuh,
+        dan memanggil self.watch.unsubscribe setelahnya.
+        - notify: dipanggil setiap Subscription mendapat event baru
+        """
+        if access is not None:
+            access.command = 'WATCH'
+        started = time.perf_counter()
+        self.metrics.begin_request()
+        subscription = None
+        options = {}
+        for param in params:
+            key, sep, value = str(param).partition('=')
+            if not sep or key != 'prefix':
+                result = dict(status='ERROR', data=f'Parameter WATCH tidak dikenali: {param}')
+                break
+            options[key] = value
+        else:
+            subscription = self.watch.subscribe(options.get('prefix', ''), notify)
+            result = dict(status='OK', data=dict(prefix=subscription.prefix, seq=self.watch.seq,
+                                                 heartbeat=WATCH_HEARTBEAT))
+        self.metrics.end_request('WATCH', time.perf_counter() - started, result['status'])
+        if access is not None:
+            access.status = result['status']
+        return result, subscription
+
+    def get_string(self, params, accept_encoding=None, if_none_match=None):
+        """
+        GET protokol v1. Respons GET seluruh isi file disimpan di cache
+        sebagai string JSON siap kirim, sehingga GET berikutnya untuk file
+        yang sama tidak membaca disk dan meng-encode base64 lagi.
+        accept_encoding: daftar codec yang diterima client; jika kompresi
+        layak, data_file berisi isi file terkompresi dan respons memuat encoding.
+        if_none_match: ETag salinan client; jika isi file masih sama dijawab
+        NOT_MODIFIED tanpa isi file.
+        """
+        not_modified = self.file.not_modified(params[0], if_none_match)
+        if not_modified is not None:
+            return json.dumps(not_modified)
+
+        codec = select_codec(accept_encoding)
+        kind = f'v1-{codec}' if codec else 'v1'
+        key = self.file.cache_key(params[0], kind) if len(params) == 1 else None
+        if key is not None:
+            hasil = self.file.cache.get(key)
+            if hasil is not None:
+                return hasil
+
+        result = self.file.get(params)
+
+        # Jika berhasil dan ada file_content dalam hasil
+        if result['status'] == 'OK' and 'file_content' in result:
+            file_content = result['file_content']
+            if codec and worth_compressing(params[0], file_content[:SAMPLE_SIZE], len(file_content), codec):
+                file_content = b''.join(iter_compress([file_content], codec, self.compress_level))
+                result['encoding'] = codec
+            # Encode file content ke base64 dan tambahkan ke response
+            file_content_base64 = base64.b64encode(file_content).decode()
+            result['data_file'] = file_content_base64
+            # Hapus file_content dari response karena sudah direpresentasikan sebagai base64
+            del result['file_content']
+
+        hasil = json.dumps(result)
+        if key is not None and result['status'] == 'OK':
+            self.file.cache.put(key, hasil, len(hasil))
+        return hasil
+
+    def mget_string(self, params):
+        """MGET protokol v1: isi setiap file yang berhasil dibuka di-encode base64 ke data_file entrinya"""
+        result = self.file.mget(params)
+        file_ranges = result.pop('file_ranges', None)
+        if file_ranges is None:
+            return result
+        with file_ranges:
+            parts = iter(file_ranges.parts())
+            for entry in result['data']['files']:
+                if entry['status'] != 'OK':
+                    continue
+                part = next(parts)
+                part.file_object.seek(part.offset)
+                entry['data_file'] = base64.b64encode(part.file_object.read(part.length)).decode()
+        return result
+
+    def get_frame(self, params, accept_encoding=None, if_none_match=None):
+        """
+        GET protokol v2. File kecil yang diminta utuh disimpan di cache
+        sebagai header dan payload bytes; selain itu isi file dikirim
+        langsung dari file (sendfile) sebagai FileRange.
+        Jika client menerima salah satu codec dan kompresi layak, rentang
+        file dikompresi per potongan (ke memori untuk file kecil, ke file
+        sementara untuk file besar) dan header respons memuat encoding.
+        Dengan if_none_match yang sama dengan ETag file dijawab NOT_MODIFIED
+        tanpa payload.
+        """
+        not_modified = self.file.not_modified(params[0], if_none_match)
+        if not_modified is not None:
+            return not_modified, b''
+
+        codec = select_codec(accept_encoding)
+        kind = f'v2-{codec}' if codec else 'v2'
+        key = self.file.cache_key(params[0], kind) if len(params) == 1 else None
+        if key is not None:
+            cached = self.file.cache.get(key)
+            if cached is not None:
+                return dict(cached[0]), cached[1]
+
+        result = self.file.open_file(params)
+        file_range = result.pop('file_range', None)
+        if file_range is None:
+            return result, b''
+
+        if codec and not worth_compressing(params[0], read_sample(file_range.file_object, file_range.offset),
+                                           file_range.length, codec):
+            codec = None
+        if codec:
+            out = io.BytesIO() if key is not None else tempfile.TemporaryFile()
+            with file_range:
+                compress_file(file_range.file_object, out, codec, self.compress_level,
+                              file_range.offset, file_range.length)
+            result['encoding'] = codec
+            if key is None:
+                # sendfile membaca langsung dari fd, isi buffer harus sudah tertulis
+                out.flush()
+                return result, FileRange(out, 0, out.tell())
+            payload = out.getvalue()
+        elif key is None:
+            return result, file_range
+        else:
+            with file_range:
+                payload = file_range.file_object.read(file_range.length)
+
+        self.file.cache.put(key, (dict(result), payload), len(payload))
+        return result, payload
+
+    def proses_frame(self, header, payload=b'', access=None):
+        """
+        Memproses request protokol versi 2 (binary framing)
+        - header: dict berisi 'command' dan 'params'
+        - payload: isi file mentah (UPLOAD), delta (PATCH) atau signature
+          (DELTA), berupa bytes atau iterable potongan bytes yang dibaca
+          langsung dari socket
+        Mengembalikan tuple (header_respons, payload_respons); payload_respons
+        berupa bytes, atau FileRange/FileRanges yang harus dikirim lalu
+        ditutup pemanggil
+        - access: AccessRecord request ini (opsional), diisi command, file dan status
+        """
+        command = self.command_label(header.get('command', ''))
+        if access is not None:
+            access.command = command
+            params = header.get('params')
+            if command not in NO_FILE_COMMANDS and isinstance(params, list) and params and isinstance(params[0], str):
+                # REPL: params[0] adalah operasi, nama file di params[1]
+                access.filename = params[1] if command == 'REPL' and len(params) > 1 else params[0]
+        started = time.perf_counter()
+        self.metrics.begin_request()
+        result = None
+        try:
+            result = self.handle_frame(header, payload)
+            return result
+        finally:
+            status = str(result[0].get('status')) if result is not None else 'EXCEPTION'
+            self.metrics.end_request(command, time.perf_counter() - started, status)
+            if access is not None:
+                access.status = status
+
+    def handle_frame(self, header, payload=b''):
+        try:
+            c_request = str(header.get('command', '')).upper()
+            params = header.get('params', [])
+            if not isinstance(params, list):
+                return INVALID_PARAMS.copy(), b''
+
+            logging.debug(f"memproses frame: {c_request}")
+
+            if self.read_only and c_request in WRITE_COMMANDS:
+                return READ_ONLY.copy(), b''
+
+            handler = self.frame_handlers.get(c_request)
+            if handler is None:
+                return UNKNOWN_REQUEST.copy(), b''
+            return handler(params, header, payload)
+
+        except (DeltaError, CompressionError) as e:
+            self.metrics.error(type(e).__name__)
+            return dict(status='ERROR', data=str(e)), b''
+        except Exception as e:
+            logging.error(f"Error: {str(e)}")
+            self.metrics.error(type(e).__name__)
+            return dict(status='ERROR', data=f'terjadi kesalahan: {str(e)}'), b''
+
+    def frame_list(self, params, header, payload):
+        return self.file.list(params), b''
+
+    def frame_get(self, params, header, payload):
+        if len(params) < 1:
+            return MISSING_FILENAME.copy(), b''
+        # params: [nama, offset, length], offset dan length opsional
+        return self.get_frame(params[:3], header.get('accept_encoding'), header.get('if_none_match'))
+
+    def frame_upload(self, params, header, payload):
+        if len(params) < 1:
+            return MISSING_FILENAME.copy(), b''
+        if header.get('encoding'):
+            # Payload dikompresi client, didekompresi sambil ditulis ke disk
+            payload = iter_decompress(self.file.iter_chunks(payload), check_codec(header['encoding']),
+                                      self.max_request_bytes)
+        return self.file.upload([params[0], payload]), b''
+
+    def frame_mget(self, params, header, payload):
+        # params: daftar nama file, payload respons: isi file yang OK disambung berurutan
+        result = self.file.mget(params)
+        return result, result.pop('file_ranges', None) or b''
+
+    def frame_mupload(self, params, header, payload):
+        # params: daftar [nama, ukuran], payload: isi semua file disambung berurutan
+        return self.file.mupload([params, payload]), b''
+
+    def frame_uploadhash(self, params, header, payload):
+        if len(params) < 2:
+            return MISSING_CHECKSUM.copy(), b''
+        return self.file.upload_hash(params[:2]), b''
+
+    def frame_signature(self, params, header, payload):
+        # Signature blok file di server, dikirim sebagai payload JSON
+        if len(params) < 1:
+            return MISSING_FILENAME.copy(), b''
+        result = self.file.signature(params[:1])
+        signature = result.pop('signature', None)
+        return result, encode_signature(signature) if signature is not None else b''
+
+    def frame_delta(self, params, header, payload):
+        # Payload request: signature salinan client, payload respons: delta
+        if len(params) < 1:
+            return MISSING_FILENAME.copy(), b''
+        signature = decode_signature(self.read_payload(payload, MAX_SIGNATURE_SIZE))
+        result = self.file.delta([params[0], signature])
+        delta_range = result.pop('delta_range', None)
+        return result, delta_range or b''
+
+    def frame_patch(self, params, header, payload):
+        # params: [nama, sha256, base_size, base_mtime, block_size], payload: delta
+        if len(params) < 5:
+            return MISSING_PARAMS.copy(), b''
+        return self.file.patch(params[:5] + [payload]), b''
+
+    def frame_delete(self, params, header, payload):
+        if len(params) < 1:
+            return MISSING_FILENAME.copy(), b''
+        return self.file.delete([params[0]]), b''
+
+    def frame_mdelete(self, params, header, payload):
+        return self.file.mdelete(params), b''
+
+    def frame_stats(self, params, header, payload):
+        return self.stats(), b''
+
+    def frame_mpbegin(self, params, header, payload):
+        # Upload multipart, params: [nama, ukuran file, ukuran part]
+        return self.file.multipart_begin(params[:3]), b''
+
+    def frame_mppart(self, params, header, payload):
+        # params: [id sesi, nomor part, sha256 part], payload: isi part
+        return self.file.multipart_part(params[:3] + [payload]), b''
+
+    def frame_mpstatus(self, params, header, payload):
+        return self.file.multipart_status(params[:1]), b''
+
+    def frame_mpcommit(self, params, header, payload):
+        # params: [id sesi, sha256 seluruh file]
+        return self.file.multipart_commit(params[:2]), b''
+
+    def frame_mpabort(self, params, header, payload):
+        return self.file.multipart_abort(params[:1]), b''
+
+    def frame_repl(self, params, header, payload):
+        # Perubahan dari server primary, params: [op, nama, sha256], payload: isi file (put)
+        return self.replicate(params, payload, header.get('seq')), b''
+
+    def replicate(self, params, payload, seq=None):
+        """
+        Menerapkan perubahan dari primary pada server replica (lihat file_replication)
+        - params: ['link', nama, sha256] (isi sudah ada di blob store, MISSING
+          jika belum), ['put', nama, sha256] dengan isi file di payload, atau
+          ['delete', nama]
+        """
+        if not self.read_only:
+            return dict(status='ERROR', data='Server ini bukan replica')
+        if len(params) < 2:
+            return dict(status='ERROR', data='Parameter tidak lengkap')
+        op, filename = params[0], params[1]
+        if op == 'delete':
+            result = self.file.delete([filename])
+            if result['status'] != 'OK' and self.file.is_valid_name(filename) \
+                    and not os.path.lexists(self.file.path(filename)):
+                # File memang sudah tidak ada di replica
+                result = dict(status='OK', data=f'File {filename} tidak ada')
+        elif op in ('link', 'put') and len(params) >= 3:
+            if op == 'link':
+                result = self.file.upload_hash([filename, params[2]])
+            else:
+                result = self.file.upload([filename, payload, params[2]])
+        else:
+            return dict(status='ERROR', data=f'Operasi replikasi {op} tidak dikenali')
+        if result['status'] == 'OK':
+            self.replication.applied_change(seq)
+        return result
+
+    def read_payload(self, payload, limit):
+        """Membaca payload frame ke memori, DeltaError jika melebihi limit byte"""
+        data = bytearray()
+        for chunk in self.file.iter_chunks(payload):
+            data.extend(chunk)
+            if len(data) > limit:
+                raise DeltaError(f'Payload melebihi batas {limit} bytes')
+        return bytes(data)
+
 if __name__=='__main__':
     # Konfigurasi logging
     logging.basicConfig(
@@ -0,0 +1,279 @@
+import os
+import time
+import socket
+import logging
+import threading
+from collections import OrderedDict
+from file_frame import SocketReader, FrameError, send_frame, send_file_frame, set_nodelay
+
+"""
+* file_replication menyalin perubahan file dari server primary ke satu
+  atau lebih server replica (python file_server.py PORT --replica) secara
+  asinkron, sehingga request baca (LIST/GET) bisa dibagi ke replica
+* primary mengirim keadaan terbaru file yang berubah, bukan urutan
+  operasinya: perubahan beruntun pada file yang sama digabung menjadi satu
+  pengiriman, dan file yang sudah tidak ada dikirim sebagai delete
+* setiap replica dilayani satu thread ReplicaLink dengan satu koneksi v2
+  persistent ke replica; isi file dikirim dengan command REPL: 'link' lebih
+  dulu (replica cukup membuat link ke blob jika isi yang sama sudah ada),
+  'put' beserta isi file jika belum ada, atau 'delete'
+* saat pertama terhubung, saat antrian penuh, dan berkala setiap
+  reconcile_interval detik, isi replica dibandingkan dengan LIST (nama dan
+  SHA-256) dan file yang berbeda dimasukkan ke antrian
+* lag per replica: jumlah file yang belum terkirim dan umur perubahan
+  tertua yang belum terkirim (detik), dilaporkan lewat STATS dan metrik
+"""
+
+# Jumlah file berbeda yang boleh mengantri per replica sebelum replica
+# disamakan ulang dengan LIST
+REPLICATION_QUEUE_SIZE = 10000
+# Jeda rekonsiliasi berkala dengan LIST replica (detik, 0 = hanya saat terhubung)
+RECONCILE_INTERVAL = 300
+# Jeda sebelum mencoba terhubung lagi ke replica yang gagal (detik)
+REPLICA_RETRY_DELAY = 2.0
+REPLICA_TIMEOUT = 60
+# Jumlah entri per halaman LIST saat rekonsiliasi (header frame dibatasi 64 KB)
+RECONCILE_PAGE_SIZE = 100
+
+
+class ReplicationError(Exception):
+    """Replica menjawab selain OK untuk satu file"""
+    pass
+
+
+def parse_address(value, default_host='127.0.0.1'):
+    """'HOST:PORT' atau 'PORT' menjadi tuple (host, port)"""
+    host, _, port = value.rpartition(':')
+    return (host or default_host, int(port))
+
+
+class ReplicaLink:
+    """
+    Pengirim perubahan ke satu replica, berjalan di thread sendiri
+    - interface: FileInterface primary
+    - address: (host, port) replica
+    """
+    def __init__(self, interface, address, queue_size=REPLICATION_QUEUE_SIZE,
+                 reconcile_interval=RECONCILE_INTERVAL):
+        self.interface = interface
+        self.address = address
+        self.queue_size = queue_size
+        self.reconcile_interval = reconcile_interval
+        # nama -> (seq perubahan terakhir, waktu perubahan tertua yang belum terkirim)
+        self.pending = OrderedDict()
+        self.cond = threading.Condition()
+        self.needs_reconcile = True
+        self.last_reconcile = 0.0
+        self.acked_seq = 0
+        self.replicated = 0
+        self.failed = 0
+        self.connection = None
+        self.reader = None
+        self.last_error = None
+        self.thread = None
+
+    def enqueue(self, name, seq, force=False):
+        with self.cond:
+            if name in self.pending:
+                # Posisi dan waktu tertua dipertahankan, seq diperbarui agar dikirim ulang jika sedang dikirim
+                self.pending[name] = (seq, self.pending[name][1])
+            elif len(self.pending) >= self.queue_size and not force:
+                # Replica terlalu tertinggal: antrian dibuang, disamakan ulang lewat LIST
+                self.pending.clear()
+                self.needs_reconcile = True
+            else:
+                self.pending[name] = (seq, time.time())
+            self.cond.notify()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name=f'replica-{self.address[0]}:{self.address[1]}',
+                                       daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                if self.needs_reconcile or (self.reconcile_interval and
+                                            time.time() - self.last_reconcile >= self.reconcile_interval):
+                    self.reconcile()
+                with self.cond:
+                    if not self.pending:
+                        self.cond.wait(self.reconcile_interval or None)
+                        continue
+                    name, queued = next(iter(self.pending.items()))
+                try:
+                    self.replicate(name, queued[0])
+                    self.replicated += 1
+                except ReplicationError as e:
+                    # Replica menolak file ini; dicoba lagi pada rekonsiliasi berikutnya
+                    logging.warning(f"Replikasi {name} ke {self.describe()} gagal: {e}")
+                    self.failed += 1
+                    self.last_error = str(e)
+                with self.cond:
+                    if self.pending.get(name) == queued:
+                        del self.pending[name]
+                    self.acked_seq = max(self.acked_seq, queued[0])
+            except (OSError, FrameError) as e:
+                if self.connection is not None or self.last_error != str(e):
+                    logging.warning(f"Koneksi ke replica {self.describe()} gagal: {e}")
+                self.last_error = str(e)
+                self.disconnect()
+                time.sleep(REPLICA_RETRY_DELAY)
+            except Exception as e:
+                logging.error(f"Error replikasi ke {self.describe()}: {str(e)}")
+                self.last_error = str(e)
+                self.disconnect()
+                time.sleep(REPLICA_RETRY_DELAY)
+
+    def describe(self):
+        return f'{self.address[0]}:{self.address[1]}'
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = socket.create_connection(self.address, timeout=REPLICA_TIMEOUT)
+            set_nodelay(self.connection)
+            self.reader = SocketReader(self.connection)
+            logging.info(f"Terhubung ke replica {self.describe()}")
+        return self.connection
+
+    def disconnect(self):
+        if self.connection is not None:
+            self.connection.close()
+        self.connection = None
+        self.reader = None
+
+    def request(self, header, source=None, length=0):
+        """Mengirim satu frame ke replica dan membaca respons (header saja)"""
+        connection = self.connect()
+        if source is not None:
+            send_file_frame(connection, header, source, length)
+        else:
+            send_frame(connection, header)
+        response, payload_length = self.reader.read_header()
+        if response is None:
+            raise FrameError('Replica menutup koneksi tanpa respons')
+        self.reader.read_payload(payload_length)
+        if response.get('status') == 'BUSY':
+            time.sleep(float(response.get('retry_after', 1)))
+            raise FrameError('Replica sedang sibuk')
+        return response
+
+    def replicate(self, name, seq):
+        """Mengirim keadaan file name saat ini ke replica"""
+        try:
+            source = open(self.interface.path(name), 'rb')
+        except FileNotFoundError:
+            response = self.request(dict(command='REPL', params=['delete', name], seq=seq))
+            if response.get('status') != 'OK':
+                raise ReplicationError(response.get('data'))
+            return
+
+        # File yang sudah dibuka tetap versi yang sama walaupun diganti selama dikirim
+        with source:
+            st = os.fstat(source.fileno())
+            checksum = self.interface.etag(name, st, source)
+            response = self.request(dict(command='REPL', params=['link', name, checksum], seq=seq))
+            if response.get('status') == 'MISSING':
+                response = self.request(dict(command='REPL', params=['put', name, checksum], seq=seq),
+                                        source=source, length=st.st_size)
+            if response.get('status') != 'OK':
+                raise ReplicationError(response.get('data'))
+
+    def reconcile(self):
+        """Membandingkan isi replica (LIST) dengan indeks primary, file yang berbeda dimasukkan ke antrian"""
+        started = time.time()
+        remote = {}
+        params = [f'limit={RECONCILE_PAGE_SIZE}']
+        while True:
+            response = self.request(dict(command='LIST', params=params))
+            if response.get('status') != 'OK':
+                raise ReplicationError(f"LIST replica gagal: {response.get('data')}")
+            data = response['data']
+            for entry in data.get('files', []):
+                remote[entry['name']] = entry.get('checksum')
+            if not data.get('next_cursor'):
+                break
+            params = [f'limit={RECONCILE_PAGE_SIZE}', f"cursor={data['next_cursor']}"]
+
+        local = self.interface.index.snapshot()
+        seq = self.acked_seq
+        with self.cond:
+            self.needs_reconcile = False
+        differing = [name for name, entry in local.items()
+                     if not entry['checksum'] or remote.get(name) != entry['checksum']]
+        differing += [name for name in remote if name not in local]
+        for name in differing:
+            self.enqueue(name, seq, force=True)
+        self.last_reconcile = time.time()
+        logging.info(f"Replica {self.describe()}: {len(differing)} dari {len(local)} file perlu disalin "
+                     f"(rekonsiliasi {self.last_reconcile - started:.2f}s)")
+
+    def status(self, now):
+        with self.cond:
+            oldest = next(iter(self.pending.values()))[1] if self.pending else None
+            return dict(address=self.describe(), connected=self.connection is not None,
+                        pending=len(self.pending), lag_seconds=round(now - oldest, 3) if oldest else 0.0,
+                        acked_seq=self.acked_seq, replicated=self.replicated, failed=self.failed,
+                        last_reconcile=self.last_reconcile or None, last_error=self.last_error)
+
+
+class Replicator:
+    """
+    Replikasi di server primary: mendengarkan perubahan FileInterface dan
+    meneruskannya ke ReplicaLink setiap replica
+    """
+    def __init__(self, interface, addresses, reconcile_interval=RECONCILE_INTERVAL):
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.links = [ReplicaLink(interface, address, reconcile_interval=reconcile_interval)
+                      for address in addresses]
+        interface.change_listeners.append(self.changed)
+
+    def changed(self, op, name, checksum=None):
+        with self.lock:
+            self.seq += 1
+            seq = self.seq
+        for link in self.links:
+            link.enqueue(name, seq)
+
+    def start(self):
+        for link in self.links:
+            link.start()
+        logging.info(f"Replikasi ke {len(self.links)} replica: "
+                     f"{', '.join(link.describe() for link in self.links)}")
+
+    def status(self):
+        now = time.time()
+        return dict(role='primary', seq=self.seq, replicas=[link.status(now) for link in self.links])
+
+    def metrics(self):
+        """Gauge tambahan untuk endpoint Prometheus"""
+        replicas = self.status()['replicas']
+        return dict(replication_pending=('gauge', sum(r['pending'] for r in replicas)),
+                    replication_lag_seconds=('gauge', max((r['lag_seconds'] for r in replicas), default=0.0)),
+                    replication_replicas_connected=('gauge', sum(r['connected'] for r in replicas)))
+
+
+class ReplicaState:
+    """Keadaan server replica: perubahan terakhir yang diterima dari primary"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.applied = 0
+        self.last_seq = 0
+        self.last_applied = None
+
+    def applied_change(self, seq):
+        with self.lock:
+            self.applied += 1
+            if isinstance(seq, int):
+                self.last_seq = max(self.last_seq, seq)
+            self.last_applied = time.time()
+
+    def status(self):
+        with self.lock:
+            return dict(role='replica', applied=self.applied, last_seq=self.last_seq,
+                        last_applied=self.last_applied)
+
+    def metrics(self):
+        with self.lock:
+            return dict(replication_applied_total=('counter', self.applied))
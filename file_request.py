@@ -0,0 +1,149 @@
+import re
+import shlex
+from file_frame import MAGIC
+
+"""
+* file_request mengenali dan mengurai request yang masuk ke server tanpa
+  menyalin buffer koneksi dan tanpa mencoba json.loads pada setiap request
+* jenis request ditentukan dari awal buffer: prefix MAGIC berarti frame v2,
+  byte pertama yang bukan whitespace '{' berarti upload JSON v1, selain itu
+  command teks v1 yang diakhiri marker \\r\\n\\r\\n
+* marker akhir command teks dicari secara inkremental: MarkerScanner
+  mengingat posisi yang sudah dipindai sehingga setiap recv hanya memindai
+  byte yang baru diterima
+* akhir request JSON v1 yang dikirim tanpa marker dikenali JsonEndScanner:
+  kurung kurawal dan string JSON dilacak inkremental, tanpa json.loads
+  berulang pada buffer yang terus bertambah
+* command teks dipecah menjadi (COMMAND, params); parameter cukup dipisah
+  whitespace, shlex hanya dipakai jika request memuat kutip atau backslash
+"""
+
+REQUEST_MARKER = b"\r\n\r\n"
+# Whitespace yang sama dengan bytes.strip()
+NON_WHITESPACE = re.compile(rb'[^ \t\n\r\x0b\x0c]')
+# Karakter yang membuat request teks perlu diurai dengan shlex
+SHLEX_SPECIAL = re.compile(r'[\'"\\]')
+# Token request teks tanpa kutip/escape, dipisah whitespace yang sama dengan shlex
+TOKEN_PATTERN = re.compile(r'[^ \t\r\n]+')
+# Karakter yang menentukan struktur JSON di luar dan di dalam string
+JSON_STRUCTURE = re.compile(rb'[{}\[\]"]')
+JSON_STRING_SPECIAL = re.compile(rb'[\\"]')
+
+# Jenis request di awal buffer koneksi (lihat classify)
+FRAME_REQUEST = 'frame'
+JSON_REQUEST = 'json'
+TEXT_REQUEST = 'text'
+
+
+def classify(buffer):
+    """
+    Jenis request di awal buffer (bytearray): FRAME_REQUEST, JSON_REQUEST atau
+    TEXT_REQUEST. None jika belum cukup byte untuk menentukan (awal MAGIC yang
+    belum lengkap, atau buffer hanya berisi whitespace tanpa marker).
+    Request kosong (hanya whitespace diakhiri marker) dikenali sebagai
+    TEXT_REQUEST agar tetap dijawab ERROR seperti command yang tidak dikenal.
+    """
+    n = min(len(buffer), len(MAGIC))
+    if buffer[:n] == MAGIC[:n]:
+        return FRAME_REQUEST if n == len(MAGIC) else None
+    match = NON_WHITESPACE.search(buffer)
+    if match is None:
+        if REQUEST_MARKER in buffer:
+            return TEXT_REQUEST
+        # Whitespace dibuang, kecuali awal marker yang terpotong di akhir buffer
+        keep = next((k for k in range(len(REQUEST_MARKER) - 1, 0, -1) if buffer.endswith(REQUEST_MARKER[:k])), 0)
+        del buffer[:len(buffer) - keep]
+        return None
+    return JSON_REQUEST if buffer[match.start()] == ord('{') else TEXT_REQUEST
+
+
+class MarkerScanner:
+    """
+    Pencari marker akhir command teks v1 di buffer koneksi. Posisi yang sudah
+    dipindai disimpan di antara pemanggilan, sehingga setelah setiap recv hanya
+    byte baru (ditambah 3 byte terakhir sebelumnya, untuk marker yang
+    terpotong) yang dipindai, berapa kali pun buffer diisi.
+    """
+    __slots__ = ('scanned',)
+
+    def __init__(self):
+        self.scanned = 0
+
+    def find(self, buffer):
+        """Posisi marker di buffer, -1 jika belum ada (pemindaian dilanjutkan pada pemanggilan berikutnya)"""
+        end = buffer.find(REQUEST_MARKER, self.scanned)
+        if end < 0:
+            self.scanned = max(0, len(buffer) - len(REQUEST_MARKER) + 1)
+        else:
+            # Marker ditemukan: request dibuang dari buffer, pemindaian berikutnya dari awal
+            self.scanned = 0
+        return end
+
+    def take(self, buffer):
+        """Command teks pertama di buffer (tanpa marker) yang dibuang dari buffer, None jika belum lengkap"""
+        end = self.find(buffer)
+        if end < 0:
+            return None
+        command = bytes(buffer[:end]).decode('utf-8')
+        del buffer[:end + len(REQUEST_MARKER)]
+        return command
+
+
+class JsonEndScanner:
+    """
+    Pencari akhir objek JSON request upload v1 di buffer koneksi, untuk
+    client yang tidak mengirim marker setelah JSON. Kedalaman kurung dan
+    status string disimpan di antara pemanggilan, sehingga setiap byte
+    hanya dipindai sekali walaupun isinya sudah dipindah dari buffer.
+    """
+    __slots__ = ('depth', 'in_string', 'escape')
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+
+    def feed(self, data, start=0):
+        """Posisi tepat setelah '}' penutup objek di data[start:], -1 jika belum ditemukan"""
+        pos = start
+        while True:
+            if self.escape:
+                if pos >= len(data):
+                    return -1
+                self.escape = False
+                pos += 1
+            elif self.in_string:
+                match = JSON_STRING_SPECIAL.search(data, pos)
+                if match is None:
+                    return -1
+                pos = match.end()
+                if data[match.start()] == ord('\\'):
+                    self.escape = True
+                else:
+                    self.in_string = False
+            else:
+                match = JSON_STRUCTURE.search(data, pos)
+                if match is None:
+                    return -1
+                pos = match.end()
+                char = data[match.start()]
+                if char == ord('"'):
+                    self.in_string = True
+                elif char in b'{[':
+                    self.depth += 1
+                else:
+                    self.depth -= 1
+                    if self.depth == 0:
+                        return pos
+
+
+def split_command(request):
+    """
+    Memecah command teks v1 menjadi (COMMAND huruf besar, list parameter).
+    Tanpa kutip/escape hasilnya sama dengan shlex.split, tanpa biaya shlex.
+    ValueError jika kutip tidak ditutup.
+    """
+    tokens = shlex.split(request) if SHLEX_SPECIAL.search(request) else TOKEN_PATTERN.findall(request)
+    if not tokens:
+        return '', []
+    return tokens[0].upper(), tokens[1:]
@@ -2,9 +2,26 @@ import socket
 import threading
 import logging
 import time
-import sys
 import json
+import argparse
+import queue
+import select
+import selectors
 from file_protocol import FileProtocol
+from file_index import INDEX_RESCAN_INTERVAL
+from file_cache import CACHE_MAX_BYTES
+from file_multipart import SESSION_TTL
+from file_replication import Replicator, ReplicaState, RECONCILE_INTERVAL, parse_address
+from file_watch import (WATCH_QUEUE_SIZE, WATCH_SYNC_INTERVAL, WATCH_HEARTBEAT, encode_message, events_message,
+                        overflow_message)
+from file_compress import DEFAULT_COMPRESS_LEVEL
+from file_frame import (SocketReader, FrameError, encode_header, send_frame, send_header, send_file, set_nodelay,
+                        PROTOCOL_VERSION)
+from file_request import classify, MarkerScanner, FRAME_REQUEST, JSON_REQUEST, TEXT_REQUEST
+from file_admission import (AdmissionControl, AdmissionError, AdmittedSocketReader, BusyResponder,
+                            MAX_COMMAND_SIZE, linger_close, rejection_kind)
+from file_metrics import start_metrics_endpoint
+from file_logging import AccessRecord, setup_logging
 
 # Konfigurasi logging
 logging.basicConfig(
@@ -15,90 +32,577 @@ logging.basicConfig(
 
 fp = FileProtocol()
 
-class ProcessTheClient(threading.Thread):
+# Timeout socket selama sebuah request sedang diterima/dikirim
+REQUEST_TIMEOUT = 60
+# Lama koneksi persistent boleh idle di antara request
+IDLE_TIMEOUT = 30
+# Lama pesan terakhir boleh tertahan sebelum koneksi WATCH yang terlalu lambat ditutup
+WATCH_CLOSE_GRACE = 5
+
+class ClientSession:
+    """
+    Status satu koneksi persistent (keep-alive): buffer byte yang sudah
+    diterima tetapi belum diproses dan versi protokol yang dipakai.
+    Session dapat berpindah antar thread handler di antara request.
+    """
     def __init__(self, connection, address):
         self.connection = connection
         self.address = address
+        self.reader = SocketReader(connection)
+        # None = belum diketahui, 2 = sudah beralih ke frame v2
+        self.version = None
+        self.requests = 0
+        # Byte diterima yang sudah dicatat ke metrik
+        self.received_counted = 0
+        fp.metrics.connection_opened()
+
+    def account_received(self):
+        """Mencatat byte yang diterima sejak pencatatan terakhir ke metrik, mengembalikan jumlahnya"""
+        received = self.reader.bytes_received - self.received_counted
+        fp.metrics.add_received(received)
+        self.received_counted += received
+        return received
+
+    def close(self):
+        fp.metrics.connection_closed()
+        self.connection.close()
+
+class ProcessTheClient(threading.Thread):
+    def __init__(self, connection, address, admission=None, session=None, watcher=None, idle_timeout=IDLE_TIMEOUT,
+                 streamer=None):
+        self.connection = connection
+        self.address = address
+        self.session = session or ClientSession(connection, address)
+        # Tanpa admission control, request tidak dibatasi
+        self.admission = admission or AdmissionControl()
+        # watcher: tempat memarkir koneksi idle agar thread handler bisa melayani koneksi lain
+        self.watcher = watcher
+        # streamer: WatchStreamer yang mengambil alih koneksi WATCH
+        self.streamer = streamer
+        self.idle_timeout = idle_timeout
+        # Koneksi yang ditolak ditutup dengan linger agar respons penolakan sampai
+        self.rejected = False
+        self.parked = False
+        # AccessRecord request yang sedang dilayani
+        self.access = None
         threading.Thread.__init__(self)
         
     def run(self):
-        buffer = bytearray()
-        is_data_complete = False
         try:
-            while True:
-                data = self.connection.recv(4096)  # Memperbesar buffer untuk menerima file besar
-                if data:
-                    buffer.extend(data)
-                    # Cek apakah data sudah selesai (baik untuk format command atau JSON)
-                    if b"\r\n\r\n" in buffer:
-                        is_data_complete = True
-                        break
-                    # Deteksi JSON request (untuk upload file yang mungkin lebih besar)
-                    try:
-                        test_data = buffer.decode('utf-8')
-                        if '{' in test_data and '}' in test_data:
-                            json_start = test_data.find('{')
-                            json_end = test_data.rfind('}') + 1
-                            if json_start >= 0 and json_end > json_start:
-                                test_json = test_data[json_start:json_end]
-                                json.loads(test_json)  # Coba parse sebagai JSON
-                                is_data_complete = True
-                                break
-                    except:
-                        # Jika gagal parse, mungkin data belum lengkap, lanjutkan menerima
-                        pass
-                else:
-                    # Tidak ada data lagi
+            # Koneksi persistent: request dilayani berurutan sampai client menutup koneksi
+            while self.wait_for_request():
+                self.session.requests += 1
+                self.access = AccessRecord(self.address)
+                buffered = len(self.session.reader.buffer)
+                keep_alive = self.handle_request()
+                # Byte request ini: yang sudah ada di buffer + yang diterima - sisa milik request berikutnya
+                received = self.session.account_received()
+                self.access.bytes_in = buffered + received - len(self.session.reader.buffer)
+                self.access.emit()
+                if not keep_alive:
                     break
-                    
-            if is_data_complete:
-                # Proses data yang sudah lengkap
-                d = buffer.decode('utf-8')
-                
-                # Bersihkan terminasi jika ada
-                if "\r\n\r\n" in d:
-                    d = d.split("\r\n\r\n")[0]
-                
-                logging.info(f"Menerima data dari {self.address}: Command/data size {len(d)} bytes")
-                
-                # Proses string menggunakan FileProtocol
-                hasil = fp.proses_string(d)
-                
-                # Pastikan hasil diakhiri dengan marker
-                if not hasil.endswith("\r\n\r\n"):
-                    hasil = hasil + "\r\n\r\n"
-                    
-                logging.info(f"Mengirim respons ke {self.address}: Hasil size {len(hasil)} bytes")
-                self.connection.sendall(hasil.encode())
                 
         except Exception as e:
             logging.error(f"Error saat memproses client {self.address}: {str(e)}")
+            fp.metrics.error(type(e).__name__)
+        finally:
+            self.session.account_received()
+            if self.parked:
+                return
+            logging.info(f"Koneksi dari {self.address} ditutup setelah {self.session.requests} request")
+            fp.metrics.connection_closed()
+            if self.rejected:
+                linger_close(self.connection)
+            else:
+                self.connection.close()
+
+    def wait_for_request(self):
+        """
+        Menunggu awal request berikutnya. False jika client menutup koneksi,
+        idle terlalu lama, atau koneksi diparkir di watcher.
+        """
+        reader = self.session.reader
+        if reader.buffer:
+            return True
+        if self.watcher is not None:
+            readable, _, _ = select.select([self.connection], [], [], 0)
+            if not readable:
+                self.watcher.park(self.session)
+                self.parked = True
+                return False
+
+        self.connection.settimeout(self.idle_timeout)
+        try:
+            return reader.fill()
+        except socket.timeout:
+            logging.info(f"Koneksi dari {self.address} idle lebih dari {self.idle_timeout} detik")
+            return False
         finally:
-            logging.info(f"Koneksi dari {self.address} ditutup")
-            self.connection.close()
+            self.connection.settimeout(REQUEST_TIMEOUT)
+
+    def handle_request(self):
+        """Memproses satu request; False jika koneksi harus ditutup setelahnya"""
+        reader = self.session.reader
+        buffer = reader.buffer
+        while self.session.version != PROTOCOL_VERSION:
+            # Jenis request dikenali dari awal buffer tanpa menyalinnya
+            kind = classify(buffer)
+            # Client protokol v2 langsung mengirim frame biner
+            if kind == FRAME_REQUEST:
+                self.session.version = PROTOCOL_VERSION
+                break
+            # Request JSON (upload) diproses secara streaming langsung dari socket
+            elif kind == JSON_REQUEST:
+                return self.serve_json_upload()
+            elif kind == TEXT_REQUEST:
+                return self.serve_command()
+            if not reader.fill():
+                return False
+        return self.serve_frame()
+
+    def read_command(self):
+        """Membaca request teks protokol v1 sampai marker, None jika koneksi terputus"""
+        reader = self.session.reader
+        # Hanya byte yang baru diterima yang dipindai
+        scanner = MarkerScanner()
+        while True:
+            d = scanner.take(reader.buffer)
+            if d is not None:
+                return d
+            if len(reader.buffer) > MAX_COMMAND_SIZE:
+                raise AdmissionError(dict(status='ERROR', data='Request terlalu besar'))
+            if not reader.fill():
+                # Tidak ada data lagi
+                return None
+
+    def serve_command(self):
+        """Melayani satu request teks protokol v1 (LIST/GET/DELETE/HELLO)"""
+        try:
+            d = self.read_command()
+        except AdmissionError as e:
+            fp.metrics.error(rejection_kind(e.response))
+            self.send_response(json.dumps(e.response))
+            self.rejected = True
+            return False
+        if d is None:
+            return False
+
+        logging.debug(f"Menerima data dari {self.address}: Command/data size {len(d)} bytes")
+        params = fp.watch_params(d)
+        if params is not None:
+            return self.serve_watch(params, version=1)
+        
+        # Proses string menggunakan FileProtocol
+        hasil = fp.proses_string(d, self.access)
+        
+        hasil = self.send_response(hasil)
+
+        # Setelah HELLO berhasil, koneksi beralih ke protokol v2
+        if self.is_upgrade(d, hasil):
+            self.session.version = PROTOCOL_VERSION
+        return True
+
+    def send_response(self, hasil):
+        """Mengirim respons protokol v1, dipastikan diakhiri dengan marker"""
+        if not hasil.endswith("\r\n\r\n"):
+            hasil = hasil + "\r\n\r\n"
+
+        logging.debug(f"Mengirim respons ke {self.address}: Hasil size {len(hasil)} bytes")
+        data = hasil.encode()
+        self.connection.sendall(data)
+        self.account_sent(len(data))
+        return hasil
+
+    def account_sent(self, size):
+        fp.metrics.add_sent(size)
+        if self.access is not None:
+            self.access.bytes_out += size
+
+    def serve_json_upload(self):
+        """Melayani request JSON protokol v1 tanpa menampung seluruh isinya di memori"""
+        logging.debug(f"Menerima request JSON dari {self.address}")
+        session = self.session
+        try:
+            reader = AdmittedSocketReader(self.connection, self.admission, session.reader.buffer)
+        except AdmissionError as e:
+            fp.metrics.error(rejection_kind(e.response))
+            self.rejected = True
+            self.send_response(json.dumps(e.response))
+            return False
+
+        try:
+            hasil = fp.proses_upload_stream(reader, self.access)
+        finally:
+            reader.release()
+            # Byte upload diterima lewat reader terpisah, dicatat di session
+            session.reader.bytes_received += reader.bytes_received
+        if reader.rejection:
+            # Upload dihentikan karena melebihi batas, kirim alasan penolakannya
+            fp.metrics.error(rejection_kind(reader.rejection))
+            self.rejected = True
+            self.send_response(json.dumps(reader.rejection))
+            return False
+        # Sisa byte setelah request ini milik request berikutnya
+        session.reader.buffer = reader.buffer
+        self.send_response(hasil)
+        return True
+
+    def is_upgrade(self, request, hasil):
+        """Cek apakah request HELLO menghasilkan kesepakatan protokol v2"""
+        parts = request.split()
+        if not parts or parts[0].upper() != 'HELLO':
+            return False
+        try:
+            response = json.loads(hasil.split("\r\n\r\n")[0])
+            return response.get('status') == 'OK' and response['data']['version'] == PROTOCOL_VERSION
+        except (ValueError, KeyError, TypeError):
+            return False
+
+    def serve_frame(self):
+        """Melayani satu request protokol v2"""
+        reader = self.session.reader
+        try:
+            header, payload_length = reader.read_header()
+            if header is None:
+                return False
+        except FrameError as e:
+            logging.error(f"Frame tidak valid dari {self.address}: {str(e)}")
+            fp.metrics.error('FrameError')
+            send_frame(self.connection, dict(status='ERROR', data=str(e)))
+            return False
+
+        logging.debug(f"Menerima frame dari {self.address}: {header.get('command')} payload {payload_length} bytes")
+        try:
+            # Panjang payload sudah diketahui, tolak sebelum payload dibaca
+            self.admission.check_size(payload_length)
+            self.admission.admit(payload_length)
+        except AdmissionError as e:
+            logging.warning(f"Frame dari {self.address} ditolak: {e.response['status']}")
+            fp.metrics.error(rejection_kind(e.response))
+            self.rejected = True
+            send_frame(self.connection, e.response)
+            return False
+
+        params = fp.watch_params(header)
+        try:
+            # Payload dibaca bertahap oleh handler (misalnya upload langsung ke disk)
+            payload = reader.iter_payload(payload_length)
+            if params is None:
+                result, result_payload = fp.proses_frame(header, payload, self.access)
+            # Buang sisa payload yang tidak terpakai agar frame berikutnya tetap sinkron
+            for _ in payload:
+                pass
+        finally:
+            self.admission.release(payload_length)
+        if params is not None:
+            return self.serve_watch(params, PROTOCOL_VERSION)
+        self.send_result(result, result_payload)
+        return True
+
+    def serve_watch(self, params, version):
+        """
+        Melayani WATCH: mengirim respons lalu menyerahkan koneksi ke
+        WatchStreamer yang mengalirkan event, sehingga thread handler
+        langsung bebas. False jika koneksi sudah diserahkan.
+        """
+        if self.streamer is None:
+            result, subscription = dict(status='ERROR', data='WATCH tidak didukung server ini'), None
+        else:
+            result, subscription = fp.open_watch(params, self.streamer.wake, self.access)
+        data = encode_message(result, version)
+        self.connection.sendall(data)
+        self.account_sent(len(data))
+        if subscription is None:
+            return True
+        self.streamer.add(self.session, subscription, version)
+        self.parked = True
+        return False
+
+    def send_result(self, result, result_payload):
+        """Mengirim respons frame; payload berupa file dikirim dengan sendfile"""
+        if isinstance(result_payload, bytes):
+            logging.debug(f"Mengirim frame ke {self.address}: payload {len(result_payload)} bytes")
+            self.account_sent(send_frame(self.connection, result, result_payload))
+            return
+
+        # result_payload berupa FileRange (rentang satu file) atau FileRanges
+        # (MGET: beberapa file disambung dalam satu payload)
+        with result_payload:
+            parts = result_payload.parts()
+            logging.debug(f"Mengirim frame ke {self.address}: {len(parts)} file {result_payload.length} bytes")
+            header = encode_header(result, result_payload.length)
+            # Header ditahan kernel (MSG_MORE) sampai isi file ikut dikirim
+            send_header(self.connection, header, result_payload.length > 0)
+            for part in parts:
+                if part.length:
+                    send_file(self.connection, part.file_object, part.offset, part.length)
+            self.account_sent(len(header) + result_payload.length)
+
+class IdleConnectionWatcher(threading.Thread):
+    """
+    Menampung koneksi keep-alive yang sedang idle di antara request tanpa
+    memakai thread handler. Begitu request berikutnya mulai masuk, session
+    dikembalikan ke antrian pool; session yang idle melewati idle_timeout ditutup.
+    """
+    def __init__(self, sessions, idle_timeout=IDLE_TIMEOUT):
+        threading.Thread.__init__(self, name='idle-watcher', daemon=True)
+        self.sessions = sessions
+        self.idle_timeout = idle_timeout
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.Lock()
+        self.incoming = []
+        # socketpair untuk membangunkan select() saat ada session baru diparkir
+        self.wakeup_receiver, self.wakeup_sender = socket.socketpair()
+        self.wakeup_receiver.setblocking(False)
+        self.selector.register(self.wakeup_receiver, selectors.EVENT_READ)
+
+    def park(self, session):
+        with self.lock:
+            self.incoming.append(session)
+        self.wakeup_sender.send(b'\0')
+
+    def run(self):
+        while True:
+            for key, _ in self.selector.select(timeout=1.0):
+                if key.fileobj is self.wakeup_receiver:
+                    try:
+                        self.wakeup_receiver.recv(4096)
+                    except BlockingIOError:
+                        pass
+                    continue
+                # Request berikutnya mulai masuk, kembalikan ke pool handler
+                session = key.data[0]
+                self.selector.unregister(session.connection)
+                self.sessions.put(session)
+
+            with self.lock:
+                incoming, self.incoming = self.incoming, []
+            for session in incoming:
+                deadline = time.monotonic() + self.idle_timeout
+                self.selector.register(session.connection, selectors.EVENT_READ, (session, deadline))
+
+            now = time.monotonic()
+            for key in list(self.selector.get_map().values()):
+                if key.data is None or key.data[1] >= now:
+                    continue
+                session = key.data[0]
+                logging.info(f"Koneksi dari {session.address} idle lebih dari {self.idle_timeout} detik, ditutup")
+                self.selector.unregister(session.connection)
+                session.close()
+
+class WatchStream:
+    """Satu koneksi WATCH di WatchStreamer: byte yang belum terkirim dan waktu kirim terakhir"""
+    def __init__(self, session, subscription, version):
+        self.session = session
+        self.subscription = subscription
+        self.version = version
+        self.output = b''
+        self.last_sent = time.monotonic()
+        self.events = selectors.EVENT_READ
+        # Batas waktu mengirim sisa pesan sebelum koneksi client lambat ditutup
+        self.closing_at = None
+
+class WatchStreamer(threading.Thread):
+    """
+    Mengalirkan event WATCH ke semua koneksi yang berlangganan dari satu
+    thread dengan socket non-blocking, sehingga koneksi WATCH hanya berupa
+    socket idle dan tidak memakai thread handler. Event berikutnya diambil
+    dari Subscription hanya setelah pesan sebelumnya terkirim; client yang
+    tidak membaca membuat antrian Subscription penuh dan koneksinya diputus.
+    """
+    def __init__(self, feed, heartbeat=WATCH_HEARTBEAT):
+        threading.Thread.__init__(self, name='watch-streamer', daemon=True)
+        self.feed = feed
+        self.heartbeat = heartbeat
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.Lock()
+        self.incoming = []
+        self.streams = set()
+        self.woken = False
+        # socketpair untuk membangunkan select() saat ada event atau langganan baru
+        self.wakeup_receiver, self.wakeup_sender = socket.socketpair()
+        self.wakeup_receiver.setblocking(False)
+        self.wakeup_sender.setblocking(False)
+        self.selector.register(self.wakeup_receiver, selectors.EVENT_READ)
+
+    def wake(self):
+        # Satu byte cukup membangunkan select() untuk banyak event sekaligus
+        with self.lock:
+            if self.woken:
+                return
+            self.woken = True
+        try:
+            self.wakeup_sender.send(b'\0')
+        except BlockingIOError:
+            pass
+
+    def add(self, session, subscription, version):
+        with self.lock:
+            self.incoming.append(WatchStream(session, subscription, version))
+        self.wake()
+
+    def run(self):
+        while True:
+            for key, _ in self.selector.select(timeout=1.0):
+                if key.fileobj is self.wakeup_receiver:
+                    with self.lock:
+                        self.woken = False
+                    try:
+                        self.wakeup_receiver.recv(4096)
+                    except BlockingIOError:
+                        pass
+                    continue
+                if key.data in self.streams:
+                    self.receive(key.data)
+
+            with self.lock:
+                incoming, self.incoming = self.incoming, []
+            for stream in incoming:
+                stream.session.connection.setblocking(False)
+                self.selector.register(stream.session.connection, stream.events, stream)
+                self.streams.add(stream)
+                logging.info(f"Koneksi dari {stream.session.address} berlangganan WATCH "
+                             f"(prefix '{stream.subscription.prefix}')")
+
+            now = time.monotonic()
+            for stream in list(self.streams):
+                self.pump(stream, now)
+
+    def receive(self, stream):
+        """Client tidak mengirim apa pun selama WATCH; EOF atau data apa pun mengakhiri langganan"""
+        try:
+            stream.session.connection.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            pass
+        self.close(stream, 'ditutup client')
+
+    def pump(self, stream, now):
+        """Mengirim pesan berikutnya sebanyak yang bisa diterima socket tanpa menunggu"""
+        subscription = stream.subscription
+        if subscription.overflowed and stream.closing_at is None:
+            # Alasan pemutusan dikirim setelah pesan yang tertahan, paling lama WATCH_CLOSE_GRACE detik
+            fp.metrics.error('watch_overflow')
+            stream.output += encode_message(overflow_message(), stream.version)
+            stream.closing_at = now + WATCH_CLOSE_GRACE
+        elif not stream.output and stream.closing_at is None:
+            events = subscription.take()
+            if events or now - stream.last_sent >= self.heartbeat:
+                stream.output = encode_message(events_message(events), stream.version)
+        if stream.output:
+            try:
+                sent = stream.session.connection.send(stream.output)
+            except BlockingIOError:
+                sent = 0
+            except OSError:
+                self.close(stream, 'koneksi terputus')
+                return
+            if sent:
+                fp.metrics.add_sent(sent)
+                stream.output = stream.output[sent:]
+                stream.last_sent = now
+        if stream.closing_at is not None and (not stream.output or now >= stream.closing_at):
+            self.close(stream, 'antrian event penuh')
+            return
+        # Tunggu socket bisa ditulis lagi hanya selama masih ada byte yang tertahan
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if stream.output else 0)
+        if events != stream.events:
+            stream.events = events
+            self.selector.modify(stream.session.connection, events, stream)
+
+    def close(self, stream, reason):
+        self.streams.discard(stream)
+        self.selector.unregister(stream.session.connection)
+        self.feed.unsubscribe(stream.subscription)
+        logging.info(f"Langganan WATCH dari {stream.session.address} selesai ({reason}) "
+                     f"setelah {stream.subscription.delivered} event")
+        stream.session.close()
+
+class HandlerWorker(threading.Thread):
+    """Thread tetap dalam pool handler, melayani session dari antrian satu per satu"""
+    def __init__(self, sessions, admission, watcher, streamer=None):
+        self.sessions = sessions
+        self.admission = admission
+        self.watcher = watcher
+        self.streamer = streamer
+        threading.Thread.__init__(self, daemon=True)
+
+    def run(self):
+        while True:
+            session = self.sessions.get()
+            # Handler dijalankan langsung di thread pool ini, bukan di thread baru
+            ProcessTheClient(session.connection, session.address, self.admission,
+                             session=session, watcher=self.watcher, idle_timeout=self.watcher.idle_timeout,
+                             streamer=self.streamer).run()
 
 class Server(threading.Thread):
-    def __init__(self, ipaddress='0.0.0.0', port=7777):
+    """
+    Server file berbasis thread
+    - pool_size: jumlah thread handler tetap (0 = satu thread baru per koneksi)
+    - queue_size: jumlah koneksi baru yang boleh menunggu handler; koneksi
+      berikutnya langsung mendapat respons BUSY
+    - admission: AdmissionControl untuk batas byte request
+    - idle_timeout: lama koneksi persistent boleh idle di antara request
+    """
+    def __init__(self, ipaddress='0.0.0.0', port=7777, backlog=128, reuse_port=False, listen_socket=None,
+                 pool_size=64, queue_size=128, admission=None, idle_timeout=IDLE_TIMEOUT):
         self.ipinfo = (ipaddress, port)
+        self.backlog = backlog
         self.the_clients = []
-        self.my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.pool_size = pool_size
+        self.queue_size = queue_size
+        self.idle_timeout = idle_timeout
+        # Antrian session untuk pool handler: koneksi baru (dibatasi queue_size)
+        # dan koneksi keep-alive yang kembali dari watcher
+        self.sessions = queue.Queue()
+        self.admission = admission or AdmissionControl()
+        self.busy_responder = BusyResponder(self.admission)
+        self.watcher = IdleConnectionWatcher(self.sessions, idle_timeout)
+        self.streamer = WatchStreamer(fp.watch)
+        # listen_socket: socket yang sudah di-bind dan listen (model pre-fork)
+        self.is_bound = listen_socket is not None
+        if listen_socket is not None:
+            self.my_socket = listen_socket
+        else:
+            self.my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if reuse_port:
+                # Beberapa proses worker bind ke port yang sama, kernel membagi koneksi
+                self.my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         threading.Thread.__init__(self)
+
+    def start_pool(self):
+        for _ in range(self.pool_size):
+            HandlerWorker(self.sessions, self.admission, self.watcher, self.streamer).start()
+        self.busy_responder.start()
+        self.watcher.start()
+        logging.info(f"Pool handler: {self.pool_size} thread, antrian {self.queue_size} koneksi")
         
     def run(self):
         logging.info(f"Server berjalan di ip address {self.ipinfo}")
-        self.my_socket.bind(self.ipinfo)
-        self.my_socket.listen(5)  # Meningkatkan backlog untuk mendukung lebih banyak koneksi
+        if not self.is_bound:
+            self.my_socket.bind(self.ipinfo)
+            self.my_socket.listen(self.backlog)
+        self.streamer.start()
+        if self.pool_size:
+            self.start_pool()
         while True:
             try:
                 self.connection, self.client_address = self.my_socket.accept()
+                set_nodelay(self.connection)
                 logging.info(f"Koneksi baru dari {self.client_address}")
                 
+                if self.pool_size:
+                    self.dispatch(self.connection, self.client_address)
+                    continue
+
                 # Set timeout untuk koneksi klien
-                self.connection.settimeout(60)  # 60 detik timeout
+                self.connection.settimeout(REQUEST_TIMEOUT)
                 
                 # Buat thread untuk memproses klien
-                clt = ProcessTheClient(self.connection, self.client_address)
+                clt = ProcessTheClient(self.connection, self.client_address, self.admission,
+                                       idle_timeout=self.idle_timeout, streamer=self.streamer)
                 clt.start()
                 self.the_clients.append(clt)
                 
@@ -107,25 +611,163 @@ class Server(threading.Thread):
                 
             except Exception as e:
                 logging.error(f"Error dalam server loop: {str(e)}")
+
+    def dispatch(self, connection, address):
+        """Menyerahkan koneksi ke pool handler, atau menolaknya dengan BUSY jika antrian penuh"""
+        if self.sessions.qsize() >= self.queue_size:
+            fp.metrics.error('queue_full')
+            self.busy_responder.reject(connection, address)
+            return
+        connection.settimeout(REQUEST_TIMEOUT)
+        self.sessions.put(ClientSession(connection, address))
     
     def clean_finished_threads(self):
         """Membersihkan thread klien yang sudah selesai"""
         self.the_clients = [c for c in self.the_clients if c.is_alive()]
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='File Server')
+    parser.add_argument('port', nargs='?', default='7777', help='port server (default 7777)')
+    parser.add_argument('--mode', choices=['thread', 'async'], default='thread',
+                        help='engine server: thread per koneksi atau asyncio (default thread)')
+    parser.add_argument('--backlog', type=int, default=128, help='panjang antrian listen() (default 128)')
+    parser.add_argument('--io-threads', type=int, default=32,
+                        help='jumlah thread executor untuk akses disk pada mode async (default 32)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='jumlah proses worker yang berbagi port yang sama (default 1)')
+    parser.add_argument('--pool-size', type=int, default=64,
+                        help='jumlah thread handler pada mode thread, 0 = satu thread per koneksi (default 64)')
+    parser.add_argument('--queue-size', type=int, default=128,
+                        help='jumlah koneksi yang boleh menunggu handler sebelum dijawab BUSY (default 128)')
+    parser.add_argument('--max-inflight-bytes', type=int, default=0,
+                        help='total byte request yang diproses bersamaan, 0 = tanpa batas (default 0)')
+    parser.add_argument('--max-request-bytes', type=int, default=0,
+                        help='ukuran maksimum satu request, 0 = tanpa batas (default 0)')
+    parser.add_argument('--idle-timeout', type=float, default=IDLE_TIMEOUT,
+                        help=f'lama koneksi persistent boleh idle di antara request (default {IDLE_TIMEOUT} detik)')
+    parser.add_argument('--rescan-interval', type=float, default=INDEX_RESCAN_INTERVAL,
+                        help=f'jeda rescan indeks file untuk perubahan dari luar server, 0 = nonaktif '
+                             f'(default {INDEX_RESCAN_INTERVAL} detik)')
+    parser.add_argument('--cache-bytes', type=int, default=CACHE_MAX_BYTES,
+                        help=f'anggaran memori cache respons GET, 0 = nonaktif (default {CACHE_MAX_BYTES})')
+    parser.add_argument('--session-ttl', type=float, default=SESSION_TTL,
+                        help=f'lama sesi upload multipart boleh tidak aktif sebelum dihapus '
+                             f'(default {SESSION_TTL} detik)')
+    parser.add_argument('--compress-level', type=int, choices=range(1, 10), default=DEFAULT_COMPRESS_LEVEL,
+                        metavar='1-9',
+                        help=f'level kompresi respons GET, 1 = tercepat, 9 = terkecil (default {DEFAULT_COMPRESS_LEVEL})')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='INFO',
+                        help='level log server (default INFO)')
+    parser.add_argument('--log-file', default=None, help='file tujuan log, default stderr')
+    parser.add_argument('--log-sample', type=float, default=1.0,
+                        help='bagian record DEBUG yang ditulis, 0..1 (default 1.0 = semua)')
+    parser.add_argument('--replicate-to', action='append', default=[], metavar='HOST:PORT',
+                        help='jadikan server ini primary yang menyalin setiap perubahan file ke replica '
+                             'HOST:PORT secara asinkron, boleh diulang untuk beberapa replica')
+    parser.add_argument('--replica', action='store_true',
+                        help='jalankan sebagai replica: hanya melayani baca dan menerima perubahan dari primary')
+    parser.add_argument('--reconcile-interval', type=float, default=RECONCILE_INTERVAL,
+                        help=f'jeda penyamaan ulang isi replica dengan LIST, 0 = hanya saat terhubung '
+                             f'(default {RECONCILE_INTERVAL} detik)')
+    parser.add_argument('--watch-queue', type=int, default=WATCH_QUEUE_SIZE,
+                        help=f'jumlah event yang boleh menunggu per koneksi WATCH sebelum client lambat diputus '
+                             f'(default {WATCH_QUEUE_SIZE})')
+    parser.add_argument('--watch-sync-interval', type=float, default=WATCH_SYNC_INTERVAL,
+                        help=f'jeda pembacaan jurnal perubahan worker lain selama ada koneksi WATCH (mode --workers) '
+                             f'(default {WATCH_SYNC_INTERVAL} detik)')
+    parser.add_argument('--metrics-port', type=int, default=0,
+                        help='port lokal (127.0.0.1) endpoint metrik format Prometheus, 0 = nonaktif; '
+                             'dengan --workers N, worker ke-i memakai port + i (default 0)')
+    args = parser.parse_args(argv)
+
     # Ambil port dari argument jika ada
-    port = 7777  # Default port sesuai dengan client
-    if len(sys.argv) > 1:
-        try:
-            port = int(sys.argv[1])
-        except ValueError:
-            print("Format port tidak valid. Menggunakan port default 7777")
+    try:
+        args.port = int(args.port)
+    except ValueError:
+        print("Format port tidak valid. Menggunakan port default 7777")
+        args.port = 7777  # Default port sesuai dengan client
+    return args
+
+def build_admission(args):
+    return AdmissionControl(max_inflight_bytes=args.max_inflight_bytes, max_request_bytes=args.max_request_bytes)
+
+def build_server(args, reuse_port=False, listen_socket=None):
+    """Membuat Server (mode thread) sesuai argumen command line"""
+    admission = build_admission(args)
+    return Server(ipaddress='0.0.0.0', port=args.port, backlog=args.backlog,
+                  reuse_port=reuse_port, listen_socket=listen_socket,
+                  pool_size=args.pool_size, queue_size=args.queue_size, admission=admission,
+                  idle_timeout=args.idle_timeout)
+
+def start_metrics(args, worker_index=0):
+    """Mengisi keterangan server di metrik dan menjalankan endpoint --metrics-port"""
+    fp.metrics.info = dict(mode=args.mode, workers=args.workers, worker=worker_index,
+                           pool_size=args.pool_size if args.mode == 'thread' else None,
+                           io_threads=args.io_threads if args.mode == 'async' else None)
+    if args.metrics_port:
+        start_metrics_endpoint(args.metrics_port + worker_index, fp.prometheus)
+
+def start_replication(args):
+    """
+    Menjalankan pengirim replikasi (--replicate-to) di proses ini. Thread
+    tidak ikut terbawa fork, sehingga pada mode --workers setiap worker
+    menyalin perubahan yang ditulisnya sendiri.
+    """
+    if args.replicate_to:
+        fp.replication = Replicator(fp.file, [parse_address(address) for address in args.replicate_to],
+                                    reconcile_interval=args.reconcile_interval)
+        fp.replication.start()
+
+def run_server(args, reuse_port=False, listen_socket=None, worker_index=0):
+    """Menjalankan satu instance server di thread ini sampai dihentikan"""
+    start_metrics(args, worker_index)
+    start_replication(args)
+    if args.mode == 'async':
+        from file_server_async import AsyncServer
+        AsyncServer(fp, ipaddress='0.0.0.0', port=args.port, backlog=args.backlog, io_threads=args.io_threads,
+                    idle_timeout=args.idle_timeout, reuse_port=reuse_port, listen_socket=listen_socket,
+                    admission=build_admission(args)).run()
+    else:
+        build_server(args, reuse_port=reuse_port, listen_socket=listen_socket).run()
+
+def main():
+    args = parse_args()
+    # Log ditulis thread latar belakang agar handler tidak menunggu disk
+    setup_logging(getattr(logging, args.log_level), args.log_file, args.log_sample)
+    port = args.port
+    fp.file.index.rescan_interval = args.rescan_interval
+    fp.file.cache.resize(args.cache_bytes)
+    fp.file.sessions.ttl = args.session_ttl
+    fp.file.sessions.collect_garbage(force=True)
+    fp.watch.queue_size = args.watch_queue
+    fp.watch.sync_interval = args.watch_sync_interval
+    if args.replica and args.replicate_to:
+        logging.error("--replica tidak bisa digabung dengan --replicate-to")
+        return
+    if args.replica:
+        fp.replication = ReplicaState()
+        logging.info("Server berjalan sebagai replica (hanya baca)")
+    fp.compress_level = args.compress_level
+    fp.max_request_bytes = args.max_request_bytes
     
-    # Jalankan server
-    svr = Server(ipaddress='0.0.0.0', port=port)
-    logging.info(f"File Server akan berjalan di port {port}")
+    logging.info(f"File Server ({args.mode}) akan berjalan di port {port}")
     
     try:
+        if args.workers > 1:
+            from file_server_workers import WorkerSupervisor
+            # Indeks setiap worker langsung melihat upload/delete worker lain
+            fp.file.index.share_changes()
+            WorkerSupervisor(args, run_server).run()
+            return
+
+        if args.mode == 'async':
+            run_server(args)
+            return
+
+        # Jalankan server
+        start_metrics(args)
+        start_replication(args)
+        svr = build_server(args)
         svr.start()
         # Simpan main thread tetap hidup
         while True:
@@ -0,0 +1,574 @@
+import json
+import time
+import asyncio
+import logging
+import tempfile
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from file_frame import (SocketReader, FrameError, CHUNK_SIZE, PREFIX, PROTOCOL_VERSION,
+                        encode_header, decode_prefix, decode_header)
+from file_request import (classify, MarkerScanner, JsonEndScanner, FRAME_REQUEST, JSON_REQUEST, TEXT_REQUEST,
+                          REQUEST_MARKER)
+from file_admission import AdmissionControl, AdmissionError, MAX_COMMAND_SIZE, LINGER_TIMEOUT, rejection_kind
+from file_logging import AccessRecord
+from file_watch import WATCH_HEARTBEAT, encode_message, events_message, overflow_message
+
+"""
+* file_server_async adalah engine server alternatif berbasis asyncio
+* satu event loop melayani seluruh koneksi, sehingga koneksi yang idle
+  atau lambat tidak memakan satu thread per koneksi
+* pemrosesan FileProtocol (akses disk) dijalankan di thread pool executor,
+  command dan format pesan sama persis dengan server berbasis thread
+* isi request (payload frame, upload JSON) dibaca dari socket di event loop
+  dan ditampung dulu (RequestSpool); executor baru dipakai setelah request
+  lengkap, sehingga client yang lambat mengirim tidak menahan thread executor
+* batas --max-request-bytes/--max-inflight-bytes (AdmissionControl) berlaku
+  sama seperti mode thread: payload frame dicek dari panjangnya, upload JSON
+  dihitung per byte yang ditampung
+"""
+
+# Isi request sampai ukuran ini ditampung di memori; selebihnya ditulis ke
+# file sementara per potongan sebesar ini lewat executor
+SPOOL_MEMORY_BYTES = 256 * 1024
+
+
+class AsyncSocketReader(SocketReader):
+    """
+    Buffer baca untuk satu koneksi asyncio, hanya dibaca coroutine di event
+    loop lewat fill_async(); kode FileProtocol di executor membaca isi
+    request yang sudah ditampung (SpooledReader).
+    """
+    def __init__(self, stream, loop, timeout):
+        SocketReader.__init__(self, None)
+        self.stream = stream
+        self.loop = loop
+        self.timeout = timeout
+
+    async def fill_async(self, timeout=None):
+        data = await asyncio.wait_for(self.stream.read(CHUNK_SIZE), timeout or self.timeout)
+        if not data:
+            return False
+        self.bytes_received += len(data)
+        self.buffer.extend(data)
+        return True
+
+    def fill(self):
+        raise RuntimeError('AsyncSocketReader hanya dibaca di event loop (fill_async)')
+
+    async def read_exact_async(self, n):
+        while len(self.buffer) < n:
+            if not await self.fill_async():
+                raise FrameError('Koneksi terputus sebelum data lengkap diterima')
+        data = bytes(self.buffer[:n])
+        del self.buffer[:n]
+        return data
+
+    async def read_header_async(self):
+        if not self.buffer and not await self.fill_async():
+            return None, 0
+        header_length, payload_length = decode_prefix(await self.read_exact_async(PREFIX.size))
+        return decode_header(await self.read_exact_async(header_length)), payload_length
+
+
+class RequestSpool:
+    """
+    Penampung isi request yang dibaca di event loop sebelum diproses di
+    executor. Sampai SPOOL_MEMORY_BYTES isi disimpan di memori; selebihnya
+    ditulis ke file sementara lewat executor, sehingga thread executor hanya
+    menulis ke disk dan tidak pernah menunggu data dari client.
+    Dengan admission, setiap byte yang ditampung dipesan dari anggaran
+    server (AdmissionError jika melebihi batas) sampai close().
+    """
+    def __init__(self, handler, admission=None):
+        self.handler = handler
+        self.admission = admission
+        self.memory = bytearray()
+        self.file = None
+        self.size = 0
+        self.reserved = 0
+
+    async def write(self, data):
+        if self.admission is not None:
+            self.admission.check_size(self.size + len(data))
+            self.admission.admit(len(data))
+            self.reserved += len(data)
+        self.size += len(data)
+        self.memory.extend(data)
+        if len(self.memory) >= SPOOL_MEMORY_BYTES:
+            await self.flush()
+
+    async def flush(self):
+        if self.file is None:
+            self.file = await self.handler.in_executor(functools.partial(tempfile.TemporaryFile, dir='.'))
+        data = bytes(self.memory)
+        self.memory.clear()
+        await self.handler.in_executor(self.file.write, data)
+
+    async def finish(self):
+        """Isi yang ditampung: bytes jika muat di memori, selain itu file sementara (posisi di awal)"""
+        if self.file is None:
+            return bytes(self.memory)
+        if self.memory:
+            await self.flush()
+        await self.handler.in_executor(self.file.seek, 0)
+        return self.file
+
+    def close(self):
+        if self.admission is not None:
+            self.admission.release(self.reserved)
+            self.reserved = 0
+        if self.file is not None:
+            self.file.close()
+
+
+def iter_spooled(content):
+    """Potongan isi request hasil RequestSpool.finish() (bytes atau file sementara)"""
+    if isinstance(content, bytes):
+        if content:
+            yield content
+        return
+    while True:
+        chunk = content.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+class SpooledReader(SocketReader):
+    """SocketReader di atas request JSON yang sudah ditampung lengkap, dibaca di executor"""
+    def __init__(self, content):
+        SocketReader.__init__(self, None)
+        self.chunks = iter_spooled(content)
+
+    def fill(self):
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            return False
+        self.bytes_received += len(chunk)
+        self.buffer.extend(chunk)
+        return True
+
+
+class AsyncClientHandler:
+    """Melayani satu koneksi client di event loop (padanan ProcessTheClient)"""
+    def __init__(self, server, stream_reader, writer):
+        self.server = server
+        self.protocol = server.protocol
+        self.metrics = server.protocol.metrics
+        self.writer = writer
+        self.address = writer.get_extra_info('peername')
+        self.loop = asyncio.get_running_loop()
+        self.reader = AsyncSocketReader(stream_reader, self.loop, server.timeout)
+        self.admission = server.admission
+        # Koneksi yang ditolak ditutup setelah sisa request dibuang agar respons sampai
+        self.rejected = False
+        # None = belum diketahui, 2 = sudah beralih ke frame v2
+        self.version = None
+        self.received_counted = 0
+        # AccessRecord request yang sedang dilayani
+        self.access = None
+
+    def in_executor(self, func, *args):
+        """Menjalankan pekerjaan blocking (disk, FileProtocol) di thread pool"""
+        return self.loop.run_in_executor(self.server.executor, func, *args)
+
+    async def run(self):
+        requests = 0
+        try:
+            # Koneksi persistent: request dilayani berurutan sampai client menutup koneksi
+            while await self.wait_for_request():
+                requests += 1
+                self.access = AccessRecord(self.address)
+                buffered = len(self.reader.buffer)
+                keep_alive = await self.handle_request()
+                # Byte request ini: yang sudah ada di buffer + yang diterima - sisa milik request berikutnya
+                self.access.bytes_in = buffered + self.account_received() - len(self.reader.buffer)
+                self.access.emit()
+                if not keep_alive:
+                    break
+
+        except asyncio.TimeoutError:
+            logging.info(f"Koneksi dari {self.address} timeout")
+            self.metrics.error('timeout')
+        except Exception as e:
+            logging.error(f"Error saat memproses client {self.address}: {str(e)}")
+            self.metrics.error(type(e).__name__)
+        finally:
+            self.account_received()
+            logging.info(f"Koneksi dari {self.address} ditutup setelah {requests} request")
+            if self.rejected:
+                await self.linger()
+            self.writer.close()
+
+    async def linger(self):
+        """Membuang sisa request client yang ditolak (paling lama LINGER_TIMEOUT) sebelum koneksi ditutup"""
+        deadline = time.monotonic() + LINGER_TIMEOUT
+        try:
+            self.writer.write_eof()
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not await asyncio.wait_for(self.reader.stream.read(CHUNK_SIZE), remaining):
+                    break
+        except (OSError, asyncio.TimeoutError):
+            pass
+
+    def reject(self, response):
+        logging.warning(f"Request dari {self.address} ditolak: {response['status']}")
+        self.metrics.error(rejection_kind(response))
+        self.rejected = True
+
+    def account_received(self):
+        """Mencatat byte yang diterima sejak pencatatan terakhir ke metrik, mengembalikan jumlahnya"""
+        received = self.reader.bytes_received - self.received_counted
+        self.metrics.add_received(received)
+        self.received_counted += received
+        return received
+
+    def account_sent(self, size):
+        self.metrics.add_sent(size)
+        if self.access is not None:
+            self.access.bytes_out += size
+
+    async def wait_for_request(self):
+        """Menunggu awal request berikutnya, False jika client selesai atau idle terlalu lama"""
+        if self.reader.buffer:
+            return True
+        try:
+            return await self.reader.fill_async(self.server.idle_timeout)
+        except asyncio.TimeoutError:
+            logging.info(f"Koneksi dari {self.address} idle lebih dari {self.server.idle_timeout} detik")
+            return False
+
+    async def handle_request(self):
+        """Memproses satu request; False jika koneksi harus ditutup setelahnya"""
+        buffer = self.reader.buffer
+        while self.version != PROTOCOL_VERSION:
+            # Jenis request dikenali dari awal buffer tanpa menyalinnya
+            kind = classify(buffer)
+            # Client protokol v2 langsung mengirim frame biner
+            if kind == FRAME_REQUEST:
+                self.version = PROTOCOL_VERSION
+                break
+            # Request JSON (upload) diproses secara streaming langsung dari socket
+            elif kind == JSON_REQUEST:
+                return await self.serve_json_upload()
+            elif kind == TEXT_REQUEST:
+                return await self.serve_command()
+            if not await self.reader.fill_async():
+                return False
+        return await self.serve_frame()
+
+    async def serve_command(self):
+        """Melayani satu request teks protokol v1 (LIST/GET/DELETE/HELLO)"""
+        # Hanya byte yang baru diterima yang dipindai
+        scanner = MarkerScanner()
+        while True:
+            d = scanner.take(self.reader.buffer)
+            if d is not None:
+                break
+            if len(self.reader.buffer) > MAX_COMMAND_SIZE:
+                self.metrics.error('too_large')
+                await self.send_response(json.dumps(dict(status='ERROR', data='Request terlalu besar')))
+                return False
+            if not await self.reader.fill_async():
+                # Tidak ada data lagi
+                return False
+
+        logging.debug(f"Menerima data dari {self.address}: Command/data size {len(d)} bytes")
+        params = self.protocol.watch_params(d)
+        if params is not None:
+            return await self.serve_watch(params, version=1)
+        hasil = await self.in_executor(self.protocol.proses_string, d, self.access)
+        hasil = await self.send_response(hasil)
+        # Setelah HELLO berhasil, koneksi beralih ke protokol v2
+        if self.is_upgrade(d, hasil):
+            self.version = PROTOCOL_VERSION
+        return True
+
+    async def send_response(self, hasil):
+        """Mengirim respons protokol v1, dipastikan diakhiri dengan marker"""
+        if not hasil.endswith("\r\n\r\n"):
+            hasil = hasil + "\r\n\r\n"
+
+        logging.debug(f"Mengirim respons ke {self.address}: Hasil size {len(hasil)} bytes")
+        data = hasil.encode()
+        self.writer.write(data)
+        await self.writer.drain()
+        self.account_sent(len(data))
+        return hasil
+
+    def is_upgrade(self, request, hasil):
+        """Cek apakah request HELLO menghasilkan kesepakatan protokol v2"""
+        parts = request.split()
+        if not parts or parts[0].upper() != 'HELLO':
+            return False
+        try:
+            response = json.loads(hasil.split("\r\n\r\n")[0])
+            return response.get('status') == 'OK' and response['data']['version'] == PROTOCOL_VERSION
+        except (ValueError, KeyError, TypeError):
+            return False
+
+    async def serve_json_upload(self):
+        """Melayani request JSON protokol v1; request ditampung lengkap sebelum diproses"""
+        logging.debug(f"Menerima request JSON dari {self.address}")
+        spool = RequestSpool(self, self.admission)
+        try:
+            try:
+                content = await self.read_request_async(spool)
+            except AdmissionError as e:
+                self.reject(e.response)
+                await self.send_response(json.dumps(e.response))
+                return False
+            hasil = await self.in_executor(self.process_json_upload, content)
+        finally:
+            spool.close()
+        await self.send_response(hasil)
+        return True
+
+    def process_json_upload(self, content):
+        """Dijalankan di executor: upload JSON dibaca dari isi yang sudah ditampung"""
+        return self.protocol.proses_upload_stream(SpooledReader(content), self.access)
+
+    async def read_request_async(self, spool):
+        """
+        Menampung request v1 sampai marker (termasuk marker), sampai objek
+        JSON lengkap untuk client yang tidak mengirim marker (sama seperti
+        JsonUploadReader.is_complete), atau sampai client menutup koneksi.
+        Byte setelah akhir request tetap di buffer untuk request berikutnya.
+        """
+        buffer = self.reader.buffer
+        # Sisa byte yang disimpan di buffer untuk marker yang terpotong antar recv
+        keep = len(REQUEST_MARKER) - 1
+        json_end = JsonEndScanner()
+        # Posisi di buffer yang sudah dipindai untuk marker dan untuk akhir JSON
+        scanned = 0
+        parsed = 0
+        while True:
+            end = buffer.find(REQUEST_MARKER, scanned)
+            if end >= 0:
+                end += len(REQUEST_MARKER)
+                break
+            end = json_end.feed(buffer, parsed)
+            if end >= 0:
+                break
+            parsed = len(buffer)
+            if len(buffer) > SPOOL_MEMORY_BYTES:
+                await spool.write(buffer[:-keep])
+                del buffer[:-keep]
+                parsed = keep
+            scanned = max(0, len(buffer) - keep)
+            if not await self.reader.fill_async():
+                end = len(buffer)
+                break
+        await spool.write(buffer[:end])
+        del buffer[:end]
+        return await spool.finish()
+
+    async def read_payload_async(self, spool, length):
+        """Menampung payload frame sepanjang length yang dibaca di event loop"""
+        buffer = self.reader.buffer
+        while length > 0:
+            if not buffer and not await self.reader.fill_async():
+                raise FrameError('Koneksi terputus sebelum payload lengkap diterima')
+            take = min(length, len(buffer))
+            await spool.write(buffer[:take])
+            del buffer[:take]
+            length -= take
+        return await spool.finish()
+
+    async def discard_payload_async(self, length):
+        buffer = self.reader.buffer
+        while length > 0:
+            if not buffer and not await self.reader.fill_async():
+                raise FrameError('Koneksi terputus sebelum payload lengkap diterima')
+            take = min(length, len(buffer))
+            del buffer[:take]
+            length -= take
+
+    async def serve_frame(self):
+        """Melayani satu request protokol v2"""
+        try:
+            header, payload_length = await self.reader.read_header_async()
+            if header is None:
+                return False
+        except FrameError as e:
+            logging.error(f"Frame tidak valid dari {self.address}: {str(e)}")
+            self.metrics.error('FrameError')
+            await self.send_result(dict(status='ERROR', data=str(e)), b'')
+            return False
+
+        logging.debug(f"Menerima frame dari {self.address}: {header.get('command')} payload {payload_length} bytes")
+        try:
+            # Panjang payload sudah diketahui, tolak sebelum payload dibaca
+            self.admission.check_size(payload_length)
+            self.admission.admit(payload_length)
+        except AdmissionError as e:
+            self.reject(e.response)
+            await self.send_result(e.response, b'')
+            return False
+
+        params = self.protocol.watch_params(header)
+        spool = RequestSpool(self)
+        try:
+            if params is not None:
+                await self.discard_payload_async(payload_length)
+            else:
+                content = await self.read_payload_async(spool, payload_length)
+                result, result_payload = await self.in_executor(self.process_frame, header, content)
+        finally:
+            spool.close()
+            self.admission.release(payload_length)
+        if params is not None:
+            return await self.serve_watch(params, PROTOCOL_VERSION)
+        await self.send_result(result, result_payload)
+        return True
+
+    def process_frame(self, header, content):
+        """Dijalankan di executor: payload yang sudah ditampung dibaca bertahap oleh handler FileProtocol"""
+        return self.protocol.proses_frame(header, iter_spooled(content), self.access)
+
+    async def serve_watch(self, params, version):
+        """
+        Melayani WATCH: event dari Subscription dikirim di event loop sampai
+        client menutup koneksi atau antriannya penuh. Koneksi WATCH tidak
+        memakai thread; selalu False karena koneksi berakhir bersama langganan.
+        """
+        wakeup = asyncio.Event()
+        result, subscription = self.protocol.open_watch(
+            params, lambda: self.loop.call_soon_threadsafe(wakeup.set), self.access)
+        await self.write_message(result, version)
+        if subscription is None:
+            return True
+
+        logging.info(f"Koneksi dari {self.address} berlangganan WATCH (prefix '{subscription.prefix}')")
+        # Client tidak mengirim apa pun selama WATCH; selesai membaca berarti koneksi ditutup
+        closed = asyncio.ensure_future(self.reader.stream.read(CHUNK_SIZE))
+        reason = 'ditutup client'
+        try:
+            while not closed.done():
+                if subscription.overflowed:
+                    self.writer.write(encode_message(overflow_message(), version))
+                    self.metrics.error('watch_overflow')
+                    reason = 'antrian event penuh'
+                    break
+                events = subscription.take()
+                if events:
+                    await self.send_watch(events_message(events), version, subscription, wakeup, closed)
+                    continue
+                wakeup.clear()
+                if subscription.pending():
+                    continue
+                waiter = asyncio.ensure_future(wakeup.wait())
+                done, _ = await asyncio.wait([waiter, closed], timeout=WATCH_HEARTBEAT,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                if not done:
+                    # Heartbeat: pesan tanpa event agar koneksi mati terdeteksi
+                    await self.send_watch(events_message([]), version, subscription, wakeup, closed)
+        finally:
+            closed.cancel()
+            self.protocol.watch.unsubscribe(subscription)
+            logging.info(f"Langganan WATCH dari {self.address} selesai ({reason}) "
+                         f"setelah {subscription.delivered} event")
+        return False
+
+    async def send_watch(self, message, version, subscription, wakeup, closed):
+        """
+        Mengirim satu pesan WATCH. Menunggu drain() berhenti lebih awal jika
+        antrian Subscription penuh atau client menutup koneksi (dicek lagi
+        oleh serve_watch), sehingga client lambat tidak menahan langganan.
+        """
+        data = encode_message(message, version)
+        self.writer.write(data)
+        self.account_sent(len(data))
+        drain = asyncio.ensure_future(self.writer.drain())
+        while not drain.done():
+            wakeup.clear()
+            if subscription.overflowed or closed.done():
+                drain.cancel()
+                return
+            waiter = asyncio.ensure_future(wakeup.wait())
+            await asyncio.wait([drain, waiter, closed], return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+        drain.result()
+
+    async def write_message(self, message, version):
+        data = encode_message(message, version)
+        self.writer.write(data)
+        await self.writer.drain()
+        self.account_sent(len(data))
+
+    async def send_result(self, result, result_payload):
+        """Mengirim respons frame; payload berupa file dikirim dengan loop.sendfile"""
+        if isinstance(result_payload, bytes):
+            logging.debug(f"Mengirim frame ke {self.address}: payload {len(result_payload)} bytes")
+            data = encode_header(result, len(result_payload)) + result_payload
+            self.writer.write(data)
+            await self.writer.drain()
+            self.account_sent(len(data))
+            return
+
+        # result_payload berupa FileRange (rentang satu file) atau FileRanges
+        # (MGET: beberapa file disambung dalam satu payload)
+        with result_payload:
+            parts = result_payload.parts()
+            logging.debug(f"Mengirim frame ke {self.address}: {len(parts)} file {result_payload.length} bytes")
+            header = encode_header(result, result_payload.length)
+            self.writer.write(header)
+            await self.writer.drain()
+            for part in parts:
+                if part.length:
+                    await self.loop.sendfile(self.writer.transport, part.file_object, part.offset, part.length)
+            self.account_sent(len(header) + result_payload.length)
+
+
+class AsyncServer:
+    """
+    Server file berbasis asyncio sebagai alternatif Server (thread per koneksi)
+    - protocol: instance FileProtocol yang dipakai bersama
+    - backlog: panjang antrian koneksi pada listen()
+    - io_threads: jumlah thread executor untuk akses disk
+    - timeout / idle_timeout: batas waktu selama request dan di antara request
+    - reuse_port / listen_socket: untuk mode multi-proses (lihat file_server_workers)
+    - admission: AdmissionControl untuk batas byte request (--max-request-bytes, --max-inflight-bytes)
+    """
+    def __init__(self, protocol, ipaddress='0.0.0.0', port=7777, backlog=128, io_threads=32, timeout=60,
+                 idle_timeout=30, reuse_port=False, listen_socket=None, admission=None):
+        self.protocol = protocol
+        # Tanpa admission control, request tidak dibatasi
+        self.admission = admission or AdmissionControl()
+        self.ipinfo = (ipaddress, port)
+        self.backlog = backlog
+        self.idle_timeout = idle_timeout
+        self.reuse_port = reuse_port
+        self.listen_socket = listen_socket
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=io_threads, thread_name_prefix='file-io')
+        self.active_connections = 0
+
+    async def handle_client(self, stream_reader, writer):
+        self.active_connections += 1
+        self.protocol.metrics.connection_opened()
+        logging.info(f"Koneksi baru dari {writer.get_extra_info('peername')} (aktif: {self.active_connections})")
+        try:
+            await AsyncClientHandler(self, stream_reader, writer).run()
+        finally:
+            self.active_connections -= 1
+            self.protocol.metrics.connection_closed()
+
+    async def serve(self):
+        if self.listen_socket is not None:
+            server = await asyncio.start_server(self.handle_client, sock=self.listen_socket, backlog=self.backlog)
+        else:
+            server = await asyncio.start_server(self.handle_client, self.ipinfo[0], self.ipinfo[1],
+                                                backlog=self.backlog, reuse_address=True,
+                                                reuse_port=self.reuse_port or None)
+        logging.info(f"Server (asyncio) berjalan di ip address {self.ipinfo}")
+        async with server:
+            await server.serve_forever()
+
+    def run(self):
+        try:
+            asyncio.run(self.serve())
+        finally:
+            self.executor.shutdown(wait=False)
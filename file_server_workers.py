@@ -0,0 +1,112 @@
+import os
+import time
+import signal
+import socket
+import logging
+import multiprocessing
+from multiprocessing.connection import wait
+
+"""
+* file_server_workers menjalankan server dalam beberapa proses worker
+  sehingga pemrosesan JSON/base64 tidak lagi dibatasi satu GIL
+* setiap worker bind ke port yang sama dengan SO_REUSEPORT dan kernel
+  membagi koneksi masuk; jika SO_REUSEPORT tidak tersedia, supervisor
+  membuat satu socket listen yang diwarisi semua worker (pre-fork)
+* supervisor menjalankan ulang worker yang mati dan menghentikan
+  seluruh worker bersama-sama saat keluar
+"""
+
+# Worker yang mati lebih cepat dari ini dianggap crash saat start
+MIN_WORKER_UPTIME = 1.0
+RESTART_DELAY = 1.0
+SHUTDOWN_TIMEOUT = 5.0
+
+
+class WorkerSupervisor:
+    """
+    Supervisor untuk mode --workers N
+    - args: hasil parse_args() dari file_server
+    - run_server: fungsi run_server(args, reuse_port, listen_socket, worker_index)
+      yang menjalankan satu server di proses worker sampai dihentikan
+    """
+    def __init__(self, args, run_server):
+        self.args = args
+        self.run_server = run_server
+        self.workers = {}
+        self.running = False
+        self.listen_socket = None
+        self.reuse_port = hasattr(socket, 'SO_REUSEPORT')
+        # fork agar worker mewarisi FileProtocol dan direktori kerja files/
+        self.context = multiprocessing.get_context('fork')
+
+    def create_listen_socket(self):
+        """Socket listen bersama untuk model pre-fork"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(('0.0.0.0', self.args.port))
+        sock.listen(self.args.backlog)
+        return sock
+
+    def worker_main(self, index):
+        # Ctrl+C ditangani supervisor, worker dihentikan lewat SIGTERM
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        logging.info(f"Worker {index} (pid {os.getpid()}) berjalan")
+        self.run_server(self.args, reuse_port=self.reuse_port, listen_socket=self.listen_socket, worker_index=index)
+
+    def start_worker(self, index):
+        process = self.context.Process(target=self.worker_main, args=(index,), name=f'file-worker-{index}')
+        process.start()
+        self.workers[index] = (process, time.monotonic())
+
+    def stop(self, signum=None, frame=None):
+        self.running = False
+
+    def run(self):
+        if not self.reuse_port:
+            self.listen_socket = self.create_listen_socket()
+        logging.info(f"Supervisor menjalankan {self.args.workers} worker "
+                     f"({'SO_REUSEPORT' if self.reuse_port else 'pre-fork'}) di port {self.args.port}")
+
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        try:
+            for index in range(self.args.workers):
+                self.start_worker(index)
+            while self.running:
+                sentinels = {process.sentinel: index for index, (process, _) in self.workers.items()}
+                for sentinel in wait(list(sentinels), timeout=1.0):
+                    self.restart_worker(sentinels[sentinel])
+        except KeyboardInterrupt:
+            logging.info("Supervisor dihentikan oleh pengguna")
+        finally:
+            self.shutdown()
+
+    def restart_worker(self, index):
+        """Menjalankan ulang worker yang mati"""
+        process, started = self.workers[index]
+        process.join()
+        logging.warning(f"Worker {index} (pid {process.pid}) berhenti dengan exit code {process.exitcode}")
+        if not self.running:
+            return
+        # Hindari restart beruntun jika worker langsung crash saat start
+        if time.monotonic() - started < MIN_WORKER_UPTIME:
+            time.sleep(RESTART_DELAY)
+        self.start_worker(index)
+
+    def shutdown(self):
+        """Menghentikan seluruh worker bersama-sama"""
+        self.running = False
+        for process, _ in self.workers.values():
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        for process, _ in self.workers.values():
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                logging.warning(f"Worker pid {process.pid} tidak berhenti, dipaksa kill")
+                process.kill()
+                process.join()
+        if self.listen_socket is not None:
+            self.listen_socket.close()
+        logging.info("Seluruh worker dihentikan")
@@ -0,0 +1,187 @@
+import os
+import sys
+import hashlib
+import logging
+import argparse
+
+"""
+* file_storage memetakan nama file (logis, seperti yang dilihat client)
+  ke path fisik di bawah files/
+* FlatStorage: semua file langsung di files/ (layout lama)
+* ShardedStorage (default untuk direktori baru): file disimpan di
+  .shards/<2 hex>/<2 hex>/<nama>, dua level diambil dari hash nama,
+  sehingga setiap direktori tetap kecil berapa pun jumlah file dan
+  lookup path tidak bergantung pada jumlah file
+* layout yang dipakai dicatat di files/.layout; direktori lama tanpa
+  .layout tetap dibaca sebagai flat sampai dimigrasi dengan
+    python file_storage.py migrate
+"""
+
+LAYOUT_FILE = '.layout'
+SHARD_DIR = '.shards'
+# Jumlah level direktori shard, masing-masing 2 karakter hex (256 subdirektori)
+SHARD_LEVELS = 2
+
+
+def is_visible_name(name):
+    # File tersembunyi/internal (.blobs, .upload-*, .layout, ...) bukan file milik client
+    return not name.startswith('.')
+
+
+class FlatStorage:
+    """Layout flat: path fisik sama dengan nama file di files/"""
+    layout = 'flat'
+
+    def path(self, name):
+        return name
+
+    def prepare(self, name):
+        """Path fisik untuk menulis name (direktori induk sudah ada)"""
+        return name
+
+    def scan(self):
+        """Menghasilkan (nama, os.stat_result) untuk setiap file yang tersimpan"""
+        with os.scandir('.') as it:
+            for entry in it:
+                if not is_visible_name(entry.name):
+                    continue
+                try:
+                    if entry.is_file():
+                        yield entry.name, entry.stat()
+                except OSError:
+                    continue
+
+
+class ShardedStorage:
+    """
+    Layout sharded: file name disimpan di root/<h[0:2]>/<h[2:4]>/name, h adalah
+    hash BLAKE2b dari nama. Direktori shard dibuat saat pertama kali dipakai.
+    """
+    layout = 'sharded'
+
+    def __init__(self, root=SHARD_DIR, levels=SHARD_LEVELS):
+        self.root = root
+        self.levels = levels
+        # Direktori shard yang sudah pasti ada, agar makedirs tidak dipanggil setiap upload
+        self.known_dirs = set()
+
+    def shard(self, name):
+        digest = hashlib.blake2b(name.encode('utf-8', 'surrogateescape'), digest_size=8).hexdigest()
+        return os.path.join(self.root, *(digest[i * 2:i * 2 + 2] for i in range(self.levels)))
+
+    def path(self, name):
+        return os.path.join(self.shard(name), name)
+
+    def prepare(self, name):
+        directory = self.shard(name)
+        if directory not in self.known_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self.known_dirs.add(directory)
+        return os.path.join(directory, name)
+
+    def scan(self):
+        yield from self.scan_level(self.root, self.levels)
+
+    def scan_level(self, directory, levels):
+        try:
+            it = os.scandir(directory)
+        except FileNotFoundError:
+            return
+        with it:
+            for entry in it:
+                try:
+                    if levels:
+                        if entry.is_dir(follow_symlinks=False):
+                            yield from self.scan_level(entry.path, levels - 1)
+                    elif entry.is_file():
+                        yield entry.name, entry.stat()
+                except OSError:
+                    continue
+
+
+def read_layout():
+    """Layout yang tercatat di LAYOUT_FILE, None jika belum ada"""
+    try:
+        with open(LAYOUT_FILE) as fp:
+            return fp.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_layout(layout):
+    temp_name = LAYOUT_FILE + '.tmp'
+    with open(temp_name, 'w') as fp:
+        fp.write(layout + '\n')
+    os.replace(temp_name, LAYOUT_FILE)
+
+
+def has_flat_files():
+    return next(iter(FlatStorage().scan()), None) is not None
+
+
+def open_storage():
+    """
+    Storage untuk direktori kerja (files/) sesuai LAYOUT_FILE. Direktori
+    baru memakai layout sharded; direktori lama yang masih berisi file flat
+    tanpa LAYOUT_FILE tetap dibaca sebagai flat.
+    """
+    layout = read_layout()
+    if layout == ShardedStorage.layout:
+        if has_flat_files():
+            logging.warning("Storage: Ada file di luar shard, jalankan ulang: python file_storage.py migrate")
+        return ShardedStorage()
+    if layout == FlatStorage.layout:
+        return FlatStorage()
+    if layout is not None:
+        raise ValueError(f'Layout storage {layout} tidak dikenal')
+    if has_flat_files():
+        logging.warning("Storage: Direktori files/ memakai layout flat, "
+                        "migrasi ke layout sharded dengan: python file_storage.py migrate")
+        return FlatStorage()
+    write_layout(ShardedStorage.layout)
+    return ShardedStorage()
+
+
+def migrate_flat_to_sharded():
+    """
+    Memindahkan semua file flat di direktori kerja ke layout sharded dengan
+    rename (isi dan hard link ke blob tidak disalin). Aman dijalankan ulang
+    jika terputus. Server harus dalam keadaan berhenti.
+    Mengembalikan (jumlah file dipindah, jumlah file dilewati).
+    """
+    sharded = ShardedStorage()
+    moved = skipped = 0
+    for name, _ in list(FlatStorage().scan()):
+        target = sharded.prepare(name)
+        if os.path.lexists(target):
+            logging.warning(f"Storage: {name} sudah ada di {target}, file flat dibiarkan")
+            skipped += 1
+            continue
+        os.rename(name, target)
+        moved += 1
+        if moved % 10000 == 0:
+            logging.info(f"Storage: {moved} file dipindahkan")
+    write_layout(ShardedStorage.layout)
+    return moved, skipped
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S')
+    parser = argparse.ArgumentParser(description='Alat storage file server')
+    parser.add_argument('command', choices=['migrate', 'layout'],
+                        help='migrate: pindahkan layout flat ke sharded, layout: tampilkan layout yang dipakai')
+    parser.add_argument('--dir', default='files', help='direktori penyimpanan server (default files)')
+    args = parser.parse_args(argv)
+
+    os.chdir(args.dir)
+    if args.command == 'layout':
+        print(read_layout() or ('flat' if has_flat_files() else 'belum ada'))
+        return 0
+    moved, skipped = migrate_flat_to_sharded()
+    logging.info(f"Storage: Migrasi selesai, {moved} file dipindahkan, {skipped} dilewati")
+    return 1 if skipped else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
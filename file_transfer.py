@@ -0,0 +1,217 @@
+import sys
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+"""
+* file_transfer menjalankan banyak transfer file (unduh/unggah) untuk
+  client non-interaktif (python file_client_cli.py get/put/sync ...)
+* jumlah transfer yang berjalan bersamaan dibatasi ukuran thread pool;
+  setiap file tetap memakai jalur transfer biasa FileClientApplication
+  (rentang paralel, delta, multipart) di dalam thread pool tersebut
+* transfer yang gagal karena gangguan sementara (koneksi terputus, server
+  BUSY) diulang dengan jeda yang berlipat setiap percobaan (exponential
+  backoff dengan jitter); penolakan permanen dari server (ERROR, misalnya
+  nama file tidak valid atau replica hanya baca) langsung dinyatakan gagal
+* setiap file yang selesai dilaporkan satu baris (ukuran, durasi,
+  kecepatan; file yang sudah terbaru tanpa throughput), ditutup ringkasan
+  jumlah file dan throughput total; di
+  terminal ditampilkan juga baris kemajuan total yang diperbarui berkala
+"""
+
+# Jumlah transfer file yang berjalan bersamaan
+TRANSFER_WORKERS = 4
+# Jumlah percobaan ulang per file setelah percobaan pertama gagal
+TRANSFER_RETRIES = 3
+# Jeda sebelum percobaan ulang pertama (detik), berlipat dua setiap percobaan
+RETRY_BACKOFF = 0.5
+RETRY_BACKOFF_MAX = 30.0
+# Jeda pembaruan baris kemajuan total di terminal (detik)
+PROGRESS_INTERVAL = 1.0
+# Nilai kembali action untuk file yang sudah terbaru (berhasil, tanpa byte yang ditransfer)
+UNCHANGED = 'unchanged'
+
+
+def format_size(size):
+    """Ukuran byte dalam satuan yang mudah dibaca"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+
+
+def format_rate(size, seconds):
+    return f'{format_size(size / seconds)}/s' if seconds > 0 else '-'
+
+
+class Transfer:
+    """
+    Satu file yang akan ditransfer
+    - label: nama yang ditampilkan
+    - size: ukuran file (byte) untuk perhitungan throughput
+    - action: fungsi tanpa argumen, True jika berhasil (UNCHANGED jika file sudah
+      terbaru); False atau exception berarti gagal
+      (OSError dianggap gangguan sementara, sifat kegagalan lain diambil dari reason)
+    """
+    __slots__ = ('label', 'size', 'action')
+
+    def __init__(self, label, size, action):
+        self.label = label
+        self.size = size
+        self.action = action
+
+
+class TransferResult:
+    __slots__ = ('label', 'size', 'ok', 'attempts', 'elapsed', 'error', 'unchanged')
+
+    def __init__(self, label, size, ok, attempts, elapsed, error=None, unchanged=False):
+        self.label = label
+        self.size = size
+        self.ok = ok
+        self.attempts = attempts
+        self.elapsed = elapsed
+        self.error = error
+        self.unchanged = unchanged
+
+
+class TransferEngine:
+    """
+    Menjalankan Transfer di thread pool berukuran workers
+    - retries: jumlah percobaan ulang per file
+    - backoff: jeda sebelum percobaan ulang pertama (detik)
+    - reason: fungsi tanpa argumen yang mengembalikan (pesan error, sementara)
+      terakhir thread pemanggil atau None (FileClientApplication.last_error);
+      hanya kegagalan sementara yang diulang
+    - output: tujuan laporan (default stderr, stdout tetap bersih untuk data)
+    - quiet: hanya file yang gagal yang dilaporkan
+    """
+    def __init__(self, workers=TRANSFER_WORKERS, retries=TRANSFER_RETRIES, backoff=RETRY_BACKOFF, reason=None,
+                 output=None, quiet=False):
+        self.workers = max(1, workers)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.reason = reason
+        self.output = output or sys.stderr
+        self.quiet = quiet
+        self.lock = threading.Lock()
+        self.total = 0
+        self.finished = 0
+        self.transferred = 0
+        self.progress_shown = False
+
+    def report(self, line, always=False):
+        if self.quiet and not always:
+            return
+        with self.lock:
+            # Baris kemajuan total (tanpa newline) dihapus dulu agar tidak tertimpa
+            if self.progress_shown:
+                self.output.write('\r\033[K')
+                self.progress_shown = False
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def run(self, transfers, verb='transfer'):
+        """
+        Menjalankan semua transfer dan menunggu sampai selesai.
+        verb: kata kerja untuk laporan (misalnya 'diunduh').
+        Mengembalikan list TransferResult sesuai urutan transfers.
+        """
+        transfers = list(transfers)
+        self.total = len(transfers)
+        self.finished = 0
+        self.transferred = 0
+        if not transfers:
+            return []
+        started = time.monotonic()
+        done = threading.Event()
+        progress = None
+        if not self.quiet and self.output.isatty():
+            progress = threading.Thread(target=self.show_progress, args=(started, done), daemon=True)
+            progress.start()
+        executor = ThreadPoolExecutor(max_workers=min(self.workers, len(transfers)), thread_name_prefix='transfer')
+        try:
+            results = list(executor.map(lambda transfer: self.execute(transfer, verb), transfers))
+            executor.shutdown()
+        except BaseException:
+            # Ctrl+C: transfer yang belum dimulai dibatalkan, yang sedang berjalan tidak ditunggu
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            done.set()
+            if progress is not None:
+                progress.join()
+
+        elapsed = time.monotonic() - started
+        failed = sum(1 for result in results if not result.ok)
+        unchanged = sum(1 for result in results if result.unchanged)
+        self.report(f"Selesai: {len(results) - failed - unchanged} file {verb}, "
+                    f"{f'{unchanged} sudah terbaru, ' if unchanged else ''}{failed} gagal, "
+                    f"{format_size(self.transferred)} dalam {elapsed:.1f} detik "
+                    f"({format_rate(self.transferred, elapsed)})")
+        return results
+
+    def execute(self, transfer, verb):
+        """Menjalankan satu transfer beserta percobaan ulangnya (di thread pool)"""
+        started = time.monotonic()
+        attempts = 0
+        while True:
+            attempts += 1
+            error, transient = None, False
+            try:
+                outcome = transfer.action()
+                ok = bool(outcome)
+            except OSError as e:
+                logging.error(f"Transfer {transfer.label} gagal: {e}")
+                ok, error, transient = False, str(e), True
+            except Exception as e:
+                logging.error(f"Transfer {transfer.label} gagal: {e}")
+                ok, error = False, str(e)
+            if ok:
+                break
+            # Error terakhir thread ini selalu diambil agar tidak terbawa ke percobaan berikutnya
+            reason = self.reason() if self.reason else None
+            if error is None:
+                error, transient = reason or ('gagal', False)
+            # Penolakan permanen tidak akan berhasil walaupun diulang
+            if not transient or attempts > self.retries:
+                break
+            delay = min(RETRY_BACKOFF_MAX, self.backoff * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+            self.report(f"{transfer.label}: {error}, dicoba lagi dalam {delay:.1f} detik "
+                        f"({attempts}/{self.retries})", always=True)
+            time.sleep(delay)
+
+        elapsed = time.monotonic() - started
+        unchanged = ok and outcome == UNCHANGED
+        with self.lock:
+            self.finished += 1
+            position = self.finished
+            if ok and not unchanged:
+                self.transferred += transfer.size or 0
+        if unchanged:
+            self.report(f"[{position}/{self.total}] {transfer.label} sudah terbaru")
+            return TransferResult(transfer.label, transfer.size, True, attempts, elapsed, unchanged=True)
+        if ok:
+            self.report(f"[{position}/{self.total}] {transfer.label} {verb} "
+                        f"({format_size(transfer.size or 0)}, {elapsed:.1f} detik, "
+                        f"{format_rate(transfer.size or 0, elapsed)})")
+            return TransferResult(transfer.label, transfer.size, True, attempts, elapsed)
+        self.report(f"[{position}/{self.total}] GAGAL {transfer.label}: {error}"
+                    f"{f' (setelah {attempts} percobaan)' if attempts > 1 else ''}", always=True)
+        return TransferResult(transfer.label, transfer.size, False, attempts, elapsed, error)
+
+    def show_progress(self, started, done):
+        """Baris kemajuan total di terminal, diperbarui setiap PROGRESS_INTERVAL detik"""
+        while not done.wait(PROGRESS_INTERVAL):
+            elapsed = time.monotonic() - started
+            with self.lock:
+                self.output.write(f"\r\033[K{self.finished}/{self.total} file, {format_size(self.transferred)}, "
+                                  f"{format_rate(self.transferred, elapsed)}")
+                self.output.flush()
+                self.progress_shown = True
+        with self.lock:
+            if self.progress_shown:
+                self.output.write('\r\033[K')
+                self.output.flush()
+                self.progress_shown = False
@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from file_frame import encode_header, PROTOCOL_VERSION
+
+"""
+* file_watch menyediakan aliran event perubahan file untuk command WATCH,
+  sebagai pengganti LIST yang dipanggil berulang-ulang untuk mendeteksi
+  file baru
+* event berasal dari FileIndex: upload/delete lewat server langsung
+  memperbarui indeks, dan perubahan dari luar server tertangkap rescan
+  indeks berkala. Pada mode --workers event dibaca dari jurnal perubahan
+  bersama (FileIndex.sync), dijalankan berkala selama masih ada
+  pelanggan, sehingga setiap worker melihat semua perubahan dengan seq
+  (posisi di jurnal) yang sama
+* setiap pelanggan (satu koneksi WATCH) memiliki antrian event terbatas;
+  pelanggan yang terlalu lambat sehingga antriannya penuh diputus dan
+  harus menyamakan ulang dengan LIST setelah berlangganan lagi
+* event: {"event": created|modified|deleted, "name", "size", "mtime",
+  "etag" (None jika belum dihitung), "seq"}
+"""
+
+# Jumlah event yang boleh menunggu dikirim per pelanggan sebelum pelanggan diputus
+WATCH_QUEUE_SIZE = 1000
+# Jeda pembacaan jurnal perubahan worker lain selama ada pelanggan (detik)
+WATCH_SYNC_INTERVAL = 0.5
+# Jeda pengiriman pesan kosong ke pelanggan yang tidak menerima event (detik)
+WATCH_HEARTBEAT = 15.0
+# Jumlah event maksimum per pesan
+WATCH_BATCH_SIZE = 256
+
+
+def encode_message(message, version):
+    """Pesan WATCH dalam format koneksinya: frame v2 tanpa payload atau JSON + marker v1"""
+    if version == PROTOCOL_VERSION:
+        return encode_header(message)
+    return (json.dumps(message) + "\r\n\r\n").encode()
+
+
+def events_message(events):
+    return dict(status='EVENT', data=events)
+
+
+def overflow_message():
+    return dict(status='ERROR', data='Antrian event WATCH penuh karena client terlalu lambat, '
+                                     'berlangganan ulang lalu samakan dengan LIST')
+
+
+class Subscription:
+    """
+    Satu pelanggan WATCH
+    - prefix: hanya event untuk nama yang diawali prefix
+    - notify: dipanggil (tanpa argumen) setiap ada event baru atau pelanggan
+      diputus; tidak boleh memblok, cukup membangunkan pengirim
+    """
+    def __init__(self, prefix='', queue_size=WATCH_QUEUE_SIZE, notify=None):
+        self.prefix = prefix
+        self.queue_size = queue_size
+        self.notify = notify
+        self.lock = threading.Lock()
+        self.events = deque()
+        # True jika antrian pernah penuh: event berikutnya dibuang, pelanggan harus diputus
+        self.overflowed = False
+        self.delivered = 0
+
+    def offer(self, event):
+        if not event['name'].startswith(self.prefix):
+            return
+        with self.lock:
+            if self.overflowed:
+                return
+            if len(self.events) >= self.queue_size:
+                self.overflowed = True
+                self.events.clear()
+            else:
+                self.events.append(event)
+        if self.notify is not None:
+            self.notify()
+
+    def take(self, limit=WATCH_BATCH_SIZE):
+        """Mengambil paling banyak limit event yang menunggu"""
+        with self.lock:
+            count = min(limit, len(self.events))
+            events = [self.events.popleft() for _ in range(count)]
+        self.delivered += len(events)
+        return events
+
+    def pending(self):
+        with self.lock:
+            return bool(self.events) or self.overflowed
+
+
+class ChangeFeed:
+    """
+    Penyalur event perubahan FileIndex ke seluruh pelanggan WATCH di proses ini
+    - index: FileIndex yang diamati
+    - queue_size: batas antrian per pelanggan
+    - sync_interval: jeda pembacaan jurnal worker lain selama ada pelanggan
+    """
+    def __init__(self, index, queue_size=WATCH_QUEUE_SIZE, sync_interval=WATCH_SYNC_INTERVAL):
+        self.index = index
+        self.queue_size = queue_size
+        self.sync_interval = sync_interval
+        self.lock = threading.Lock()
+        self.subscriptions = set()
+        self.seq = 0
+        self.dropped = 0
+        self.syncer_pid = None
+        index.listeners.append(self.publish)
+
+    def subscribe(self, prefix='', notify=None):
+        # Event yang sudah ada di jurnal diteruskan dulu agar seq awal langganan terkini
+        self.index.sync()
+        subscription = Subscription(prefix, self.queue_size, notify)
+        with self.lock:
+            self.subscriptions.add(subscription)
+            self.seq = max(self.seq, self.index.position() or 0)
+        self.ensure_syncer()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+            if subscription.overflowed:
+                self.dropped += 1
+
+    def publish(self, event):
+        """
+        Listener FileIndex: hanya memasukkan event ke antrian pelanggan. Event
+        dari jurnal sudah membawa seq; event lain diberi nomor berikutnya.
+        """
+        with self.lock:
+            if 'seq' in event:
+                self.seq = max(self.seq, event['seq'])
+            else:
+                self.seq += 1
+                event['seq'] = self.seq
+            subscriptions = list(self.subscriptions)
+        for subscription in subscriptions:
+            subscription.offer(event)
+
+    def ensure_syncer(self):
+        """
+        Thread pembaca jurnal dijalankan sekali per proses (thread tidak ikut
+        terbawa fork), hanya jika indeks berbagi jurnal dengan worker lain
+        """
+        if not self.sync_interval or self.index.position() is None or self.syncer_pid == os.getpid():
+            return
+        with self.lock:
+            if self.syncer_pid == os.getpid():
+                return
+            self.syncer_pid = os.getpid()
+        threading.Thread(target=self.sync_loop, name='watch-sync', daemon=True).start()
+
+    def sync_loop(self):
+        while True:
+            time.sleep(self.sync_interval)
+            with self.lock:
+                if not self.subscriptions:
+                    continue
+            try:
+                # Satu stat jurnal; catatan baru worker lain diteruskan sebagai event
+                self.index.sync()
+            except Exception as e:
+                logging.error(f"ChangeFeed: Error reading change journal: {str(e)}")
+
+    def status(self):
+        with self.lock:
+            return dict(subscribers=len(self.subscriptions), seq=self.seq, dropped=self.dropped)
+
+    def metrics(self):
+        """Gauge/counter tambahan untuk endpoint Prometheus"""
+        status = self.status()
+        return dict(watch_subscribers=('gauge', status['subscribers']),
+                    watch_events_total=('counter', status['seq']),
+                    watch_dropped_total=('counter', status['dropped']))